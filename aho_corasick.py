@@ -0,0 +1,92 @@
+"""Small dependency-free Aho-Corasick automaton for multi-pattern substring search."""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+class AhoCorasick:
+    """Match many literal patterns against a text in a single left-to-right scan.
+
+    Patterns are added with an arbitrary hashable payload; :meth:`build` must be
+    called once after all patterns are added. Searching never allocates
+    substrings of the input, so the cost is linear in ``len(text)`` plus the
+    number of matches.
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Hashable]]] = [[]]
+        self._built = False
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, pattern: str, payload: Hashable) -> None:
+        """Register ``pattern``; matches report ``payload``. Empty patterns are ignored."""
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), payload))
+        self._count += 1
+        self._built = False
+
+    def build(self) -> "AhoCorasick":
+        """Compute failure links (BFS) and merge output lists along them."""
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int, Hashable]]:
+        """Yield ``(start, end, payload)`` for every occurrence, in order of end position."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for length, payload in out[node]:
+                    yield (i + 1 - length, i + 1, payload)
+
+    def find_payloads(self, text: str) -> Set[Hashable]:
+        """Return the set of payloads whose pattern occurs anywhere in ``text``."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[Hashable] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for _, payload in out[node]:
+                    found.add(payload)
+        return found
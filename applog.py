@@ -0,0 +1,139 @@
+"""Leveled logging for the assistant, built on the standard ``logging`` module.
+
+- Messages use lazy %-formatting (``log.debug("x=%s", x)``): below the active
+  level a call costs one cached ``isEnabledFor`` check and never formats.
+- Every record at or above the level also lands in a bounded in-memory ring
+  buffer (:func:`recent`) so the GUI/CLI can show the last lines on demand.
+- An optional file sink is written by a background thread via
+  ``QueueHandler``/``QueueListener``, so the request path never blocks on disk.
+- Console output tolerates terminals that cannot encode Vietnamese.
+
+Configuration comes from ``ASSISTANT_LOG_LEVEL`` (default ``INFO``) and
+``ASSISTANT_LOG_FILE`` (unset = no file sink), or from :func:`configure`.
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Union
+
+LOGGER_NAME = "assistant"
+_FORMAT = "%(asctime)s %(levelname)-5s %(name)s: %(message)s"
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last ``capacity`` records; formatting happens only when read."""
+
+    def __init__(self, capacity: int = 1000) -> None:
+        super().__init__()
+        self._records: Deque[logging.LogRecord] = deque(maxlen=capacity)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._records.append(record)
+
+    def lines(self, limit: Optional[int] = None) -> List[str]:
+        records = list(self._records)
+        if limit is not None:
+            records = records[-limit:]
+        return [self.format(r) for r in records]
+
+    def clear(self) -> None:
+        self._records.clear()
+
+
+class SafeStreamHandler(logging.StreamHandler):
+    """StreamHandler that degrades to replacement characters instead of failing."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record)
+            try:
+                self.stream.write(msg + self.terminator)
+            except UnicodeEncodeError:
+                enc = getattr(self.stream, "encoding", None) or "utf-8"
+                self.stream.write(msg.encode(enc, errors="replace").decode(enc, errors="replace") + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+_configured = False
+_config_lock = threading.Lock()
+_ring: Optional[RingBufferHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _parse_level(level: Union[int, str, None]) -> int:
+    if level is None:
+        level = os.environ.get("ASSISTANT_LOG_LEVEL", "INFO")
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    return value if isinstance(value, int) else logging.INFO
+
+
+def configure(level: Union[int, str, None] = None, ring_size: int = 1000,
+              file_path: Optional[str] = None, console: bool = True) -> logging.Logger:
+    """(Re)configure the ``assistant`` logger tree; safe to call more than once."""
+    global _configured, _ring, _listener
+    with _config_lock:
+        root = logging.getLogger(LOGGER_NAME)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+        root.setLevel(_parse_level(level))
+        root.propagate = False
+        formatter = logging.Formatter(_FORMAT)
+
+        _ring = RingBufferHandler(ring_size)
+        _ring.setFormatter(formatter)
+        root.addHandler(_ring)
+
+        if console:
+            stream = SafeStreamHandler(sys.stdout)
+            stream.setFormatter(formatter)
+            root.addHandler(stream)
+
+        file_path = file_path or os.environ.get("ASSISTANT_LOG_FILE") or None
+        if file_path:
+            file_handler = logging.FileHandler(file_path, encoding="utf-8")
+            file_handler.setFormatter(formatter)
+            q: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+            root.addHandler(logging.handlers.QueueHandler(q))
+            _listener = logging.handlers.QueueListener(q, file_handler, respect_handler_level=True)
+            _listener.start()
+
+        _configured = True
+        return root
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """Logger under the ``assistant`` tree (``assistant.<name>``), configuring on first use."""
+    if not _configured:
+        configure()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def set_level(level: Union[int, str]) -> None:
+    get_logger().setLevel(_parse_level(level))
+
+
+def recent(limit: Optional[int] = None) -> List[str]:
+    """Formatted lines from the in-memory ring buffer, oldest first."""
+    return _ring.lines(limit) if _ring is not None else []
+
+
+def shutdown() -> None:
+    """Flush and stop the background file sink."""
+    global _listener
+    with _config_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
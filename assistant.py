@@ -1,31 +1,36 @@
 import os
 import re
+import asyncio
+import contextvars
+import functools
 import importlib
 import datetime
 import threading
 import concurrent.futures
 from functools import lru_cache
-from typing import Dict, Callable, List, Tuple, Optional, Any
-import unicodedata
+from typing import Dict, Callable, List, NamedTuple, Tuple, Optional, Any, Union
 import time
-import sys
 
-# Lazy loading for heavy libraries
-_word_tokenize = None
-_word_tokenize_lock = threading.Lock()
-
-def get_word_tokenize():
-    global _word_tokenize
-    if _word_tokenize is None:
-        with _word_tokenize_lock:
-            if _word_tokenize is None:
-                try:
-                    from underthesea import word_tokenize as wt
-                    _word_tokenize = wt
-                except ImportError:
-                    _word_tokenize = lambda text: text.lower().split()
-    return _word_tokenize
+import feature_registry
+import process_tier
+import response_cache
+import scheduler
+from deadline import Deadline, DeadlineExceeded, deadline_scope, resolve as resolve_deadline
+from routing import get_route_table
+from fuzzy_index import FuzzyIndex
+from ttl_cache import MISSING, TTLCache
+from taught_store import get_taught_store
+from tracing import request_scope, span
+from pipeline import Pipeline, RequestContext, ResolvedFeature, Stage
+from applog import get_logger
+import vi_tokenizer
+import warmup
+from normalization import (NormalizedCommand, fold as _normalize_for_match, repair_mojibake,
+                           normalize_command as _intern_command, strip_diacritics as _strip_diacritics)
+
+log = get_logger("dispatch")
 
+# Lazy loading for heavy libraries
 _fuzz = None
 _fuzz_lock = threading.Lock()
 
@@ -52,100 +57,70 @@ feature_loading_lock = threading.Lock()
 features_loaded = threading.Event()
 basic_features_loaded = False  # Flag để đánh dấu khi tính năng cơ bản đã được tải
 
-# Thread pool for feature execution
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+# Request scheduler (scheduler.py): interactive commands go first; background
+# and batch work are capped so at least 4 workers always stay free for the user
+SCHEDULER_WORKERS = 10
+SCHEDULER_LIMITS = {scheduler.BACKGROUND: 2, scheduler.BATCH: 4}
+executor = scheduler.PriorityScheduler(SCHEDULER_WORKERS, SCHEDULER_LIMITS, name="assistant")
 
-
-def _debug(msg: str):
-    """Print debug messages safely without crashing on encoding issues."""
-    try:
-        enc = getattr(sys.stdout, "encoding", None) or "utf-8"
-        try:
-            sys.stdout.write(str(msg) + "\n")
-        except UnicodeEncodeError:
-            sys.stdout.write(str(msg).encode(enc, errors="replace").decode(enc, errors="replace") + "\n")
-    except Exception:
-        try:
-            print(str(msg))
-        except Exception:
-            pass
-
-def _safe_display(text: str) -> str:
-    """Return text safe for display without mojibake: strip diacritics and non-ASCII control chars."""
-    try:
-        t = text if isinstance(text, str) else str(text)
-        # Remove combining marks (accents)
-        t = ''.join(c for c in unicodedata.normalize('NFD', t) if unicodedata.category(c) != 'Mn')
-        # Remove non-printable / non-ASCII (keep common whitespace)
-        import re as _re
-        t = _re.sub(r"[^\x09\x0A\x0D\x20-\x7E]", "", t)
-        # Normalize whitespace
-        t = _re.sub(r"\s+", " ", t).strip()
-        return t
-    except Exception:
-        try:
-            return (text or "").encode('ascii', errors='ignore').decode('ascii', errors='ignore')
-        except Exception:
-            return ""
+def get_scheduler_stats() -> Dict[str, Any]:
+    """Queue depth, running count and queue wait per priority class."""
+    return executor.stats()
 
 def load_features_async():
-    """Load features in a background thread at startup with optimized loading."""
+    """Register features from the manifest in a background thread, then warm them by priority.
+
+    Routing is available as soon as the manifest is read; each module is only
+    imported on its first dispatch or when the warmer reaches it. Modules that
+    changed since the manifest was generated are imported directly.
+    """
     def _load_features():
         global basic_features_loaded
+        lazy: List[feature_registry.LazyFeature] = []
         try:
             features_dir = os.path.join(os.path.dirname(__file__), "features")
-            feature_files = []
-            
-            essential_features = ["calculator.py", "system_info.py"]
-            important_features = ["weather.py", "reminder.py", "nlp_processor.py", "chitchat.py", "app_launcher.py"]
-            supplementary_features = ["ai_enhancements.py", "work_assistant.py", "gemini_bridge.py"]
-            
-            # Collect all feature files with priority ordering
-            for filename in os.listdir(features_dir):
-                if filename.endswith(".py") and filename != "__init__.py":
-                    # Phân loại tính năng theo mức độ ưu tiên
-                    if filename in essential_features:
-                        priority = 0  # Tải ngay lập tức
-                    elif filename in important_features:
-                        priority = 1  # Tải sau tính năng thiết yếu
-                    elif filename in supplementary_features:
-                        priority = 2  # Tải sau các tính năng quan trọng
-                    else:
-                        priority = 3  # Tải cuối cùng
-                    feature_files.append((priority, filename))
-            
-            # Sort by priority (highest first)
-            feature_files.sort(key=lambda x: x[0])
-            feature_files = [f[1] for f in feature_files]
-            
-            # Tải các tính năng thiết yếu trước
-            essential_batch = [f for f in feature_files if f in essential_features]
-            if essential_batch:
-                print("Loading essential features...")
-                _load_feature_batch(essential_batch, features_dir)
-                # Đánh dấu là đã tải các tính năng cơ bản
-                basic_features_loaded = True
-            
-            # Sau đó tải các tính năng quan trọng
-            important_batch = [f for f in feature_files if f in important_features]
-            if important_batch:
-                print("Loading important features...")
-                _load_feature_batch(important_batch, features_dir)
-            
-            # Cuối cùng tải các tính năng bổ sung
-            remaining_files = [f for f in feature_files if f not in essential_features and f not in important_features]
-            for i in range(0, len(remaining_files), 2):  # Tải 2 tính năng bổ sung mỗi lần
-                batch = remaining_files[i:i + 2]
-                print(f"Loading supplementary features: {batch}")
-                _load_feature_batch(batch, features_dir)
-                
+            entries, stale = feature_registry.load_manifest_entries(features_dir)
+
+            with feature_loading_lock:
+                for entry in entries:
+                    if not entry.get("handler"):
+                        continue
+                    lf = feature_registry.LazyFeature(
+                        entry["name"], entry["handler"],
+                        cost=entry.get("cost", "light"), priority=entry.get("priority", 3),
+                        serial=entry.get("serial", False), skip=entry.get("skip", ()),
+                        cpu_bound=entry.get("cpu_bound", False), cache=entry.get("cache"),
+                    )
+                    features[entry["name"]] = (lf, list(entry.get("keywords", [])), list(entry.get("patterns", [])))
+                    lazy.append(lf)
+                feature_registry.bump_generation()
+            # Đánh dấu là đã tải các tính năng cơ bản
+            basic_features_loaded = True
+
+            if stale:
+                log.info("Feature manifest out of date, loading directly: %s", stale)
+                stale.sort(key=feature_registry.feature_priority)
+                _load_feature_batch(stale, features_dir)
+                feature_registry.refresh_manifest_entries(stale, features_dir)
+            # Precompute the fuzzy phrase index for the fallback tier
+            _get_fuzzy_index()
         except Exception as e:
-            print(f"Error loading features: {e}")
+            log.error("Error loading features: %s", e)
         finally:
             # Đảm bảo đánh dấu là đã tải xong ngay cả khi có lỗi
             if not features_loaded.is_set():
                 features_loaded.set()
-    
+
+        # Warm light modules in the background so first dispatch rarely pays the import
+        executor.submit_as(scheduler.BACKGROUND, feature_registry.warm_features, lazy)
+        if TOKENIZER_BACKEND == "underthesea":
+            vi_tokenizer.warm_underthesea()
+        # Spawn and pre-warm process-tier workers (ASSISTANT_PROCESS_WORKERS)
+        try:
+            process_tier.start(lf.name for lf in lazy if lf.cpu_bound)
+        except Exception as e:
+            log.warning("Could not start process tier: %s", e)
+
     # Start feature loading in background thread
     loading_thread = threading.Thread(target=_load_features, daemon=True)
     loading_thread.start()
@@ -157,23 +132,7 @@ def _load_feature_batch(filenames: List[str], features_dir: str):
         module_name = filename[:-3]
         try:
             module = importlib.import_module(f"features.{module_name}")
-
-            # Find the appropriate function with priority
-            function = None
-            # Prefer explicit module-level handler names first, then getters
-            function_names = [
-                module_name,
-                "main",
-                "handle",
-                f"get_{module_name}"
-            ]
-            
-            for func_name in function_names:
-                if hasattr(module, func_name):
-                    func = getattr(module, func_name)
-                    if callable(func):
-                        function = func
-                        break
+            function = feature_registry.find_handler(module, module_name)
 
             if function:
                 # Get keywords and patterns with defaults
@@ -182,10 +141,11 @@ def _load_feature_batch(filenames: List[str], features_dir: str):
                 
                 with feature_loading_lock:
                     features[module_name] = (function, keywords, patterns)
+                    feature_registry.bump_generation()
                     
         except Exception as e:
             # Log error but continue loading other features
-            print(f"Failed to load feature {module_name}: {e}")
+            log.warning("Failed to load feature %s: %s", module_name, e)
 
 def get_greeting() -> str:
     """Returns a greeting message."""
@@ -289,551 +249,904 @@ basic_features = {
 # Initialize with basic features for immediate response
 features.update(basic_features)
 
+# Word segmentation: the built-in maximal-matching tokenizer is the default;
+# ASSISTANT_TOKENIZER=underthesea switches to underthesea once it has been
+# warmed in the background (builtin tokens are used until then).
+TOKENIZER_BACKEND = os.environ.get("ASSISTANT_TOKENIZER", "builtin").strip().lower()
+_tokenizer: Optional[vi_tokenizer.MaxMatchTokenizer] = None
+_tokenizer_generation = -1
+_tokenizer_lock = threading.Lock()
+
+def _get_tokenizer() -> vi_tokenizer.MaxMatchTokenizer:
+    """Tokenizer whose dictionary covers the current feature keywords/patterns and rule tokens."""
+    global _tokenizer, _tokenizer_generation
+    generation = feature_registry.registry_generation()
+    if _tokenizer is None or _tokenizer_generation != generation:
+        with _tokenizer_lock:
+            if _tokenizer is None or _tokenizer_generation != generation:
+                with feature_loading_lock:
+                    current_features = features.copy()
+                keywords: List[str] = []
+                patterns: List[str] = []
+                for _, kw, pat in current_features.values():
+                    keywords.extend(kw)
+                    patterns.extend(pat)
+                for rule in get_route_table(_normalize_for_match).rules:
+                    keywords.extend(rule.tokens)
+                _tokenizer = vi_tokenizer.MaxMatchTokenizer(vi_tokenizer.build_dictionary(keywords, patterns))
+                _tokenizer_generation = generation
+    return _tokenizer
+
 @lru_cache(maxsize=1024)  # Increased cache size for better performance
+def _tokenize_cached(text: str, generation: int, use_underthesea: bool) -> Tuple[str, ...]:
+    if use_underthesea:
+        tokens = vi_tokenizer.underthesea_tokenize(text)
+        if tokens is not None:
+            return tuple(tokens)
+    return tuple(_get_tokenizer().tokenize(text))
+
 def preprocess_text(text: str) -> List[str]:
     """
-    Preprocesses text using word tokenization with optimized caching.
+    Tokenizes lowercased text into words, cached per registry generation.
     """
-    tokenize = get_word_tokenize()
-    return tokenize(text.lower())
+    generation, use_ut = _tokenizer_key()
+    return list(_tokenize_cached(text.lower(), generation, use_ut))
+
+def _tokenizer_key() -> Tuple[int, bool]:
+    return (feature_registry.registry_generation(),
+            TOKENIZER_BACKEND == "underthesea" and vi_tokenizer.underthesea_state() == "ready")
+
+def normalize_command(command: str) -> NormalizedCommand:
+    """Raw/lower/accentless/tokens/repaired forms of ``command``, computed once and interned."""
+    return _intern_command(command, preprocess_text, _tokenizer_key())
+
+# Startup warmup (warmup.py): the most used commands by decayed usage are
+# tokenized, routed and have their feature imported, within a time/CPU budget
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _warm_feature_module(feature: ResolvedFeature) -> None:
+    if isinstance(feature.handler, feature_registry.LazyFeature):
+        feature.handler.resolve_async()  # imports the module and finds its coroutine twin
+
+_warmup = warmup.WarmupPlanner(
+    tokenize=lambda cmd: normalize_command(cmd),
+    route=lambda cmd, normalized: _resolve_feature(cmd, normalized),
+    load=_warm_feature_module,
+    top_n=int(_env_number("ASSISTANT_WARMUP_TOP", 20)),
+    time_budget=_env_number("ASSISTANT_WARMUP_BUDGET", 2.0),
+    cpu_budget=_env_number("ASSISTANT_WARMUP_CPU", 1.0),
+)
+
+def _run_warmup() -> None:
+    # Routing needs the registry; the manifest is read within milliseconds
+    features_loaded.wait(timeout=10.0)
+    _warmup.run()
+
+def get_warmup_stats() -> Dict[str, Any]:
+    """What the startup warmup covered and its hit rate on later requests."""
+    return _warmup.stats()
+
+# Routing cache: (command, registry generation) -> find_best_feature result.
+# Negative results are cached too; a registry change bumps the generation so
+# stale entries simply stop being reachable and age out of the LRU.
+ROUTING_CACHE_SIZE = 2048
+ROUTING_CACHE_TTL = 300.0  # seconds
+_routing_cache = TTLCache(maxsize=ROUTING_CACHE_SIZE, ttl=ROUTING_CACHE_TTL)
+
+# Response cache (response_cache.py): replies of idempotent handlers, per the
+# policy their feature declares. Keys include the registry generation.
+RESPONSE_CACHE_SIZE = int(_env_number("ASSISTANT_RESPONSE_CACHE_SIZE", 512))  # 0 disables
+_response_cache = response_cache.ResponseCache(
+    maxsize=max(1, RESPONSE_CACHE_SIZE), scope=feature_registry.registry_generation)
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """Size, evictions and hit rate of the response cache, with hits/misses per feature."""
+    return _response_cache.stats()
 
-def _strip_diacritics(s: str) -> str:
-    """Remove Vietnamese diacritics for accent-insensitive matching."""
+def clear_response_cache() -> None:
+    _response_cache.clear()
+
+# Fuzzy fallback index, rebuilt when the registry generation changes
+_FUZZY_SKIP = ("calculator", "system_info", "weather")  # already handled by the rule table
+_fuzzy_index: Optional[FuzzyIndex] = None
+_fuzzy_index_generation = -1
+_fuzzy_index_lock = threading.Lock()
+
+def _get_fuzzy_index(current_features: Optional[Dict[str, Tuple[Callable, List[str], List[str]]]] = None) -> FuzzyIndex:
+    global _fuzzy_index, _fuzzy_index_generation
+    generation = feature_registry.registry_generation()
+    if _fuzzy_index is None or _fuzzy_index_generation != generation:
+        with _fuzzy_index_lock:
+            if _fuzzy_index is None or _fuzzy_index_generation != generation:
+                if current_features is None:
+                    with feature_loading_lock:
+                        current_features = features.copy()
+                _fuzzy_index = FuzzyIndex(
+                    ((name, kw, pat) for name, (_, kw, pat) in current_features.items()),
+                    _normalize_for_match, skip=_FUZZY_SKIP,
+                )
+                _fuzzy_index_generation = generation
+    return _fuzzy_index
+
+def get_routing_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of the routing cache, for sizing under real traffic."""
+    stats = _routing_cache.stats()
+    stats["generation"] = feature_registry.registry_generation()
+    return stats
+
+def clear_routing_cache() -> None:
+    _routing_cache.clear()
+
+# Built-in handlers addressable from routing_rules.json via "handler"
+_builtin_handlers: Dict[str, Callable] = {
+    "show_help": show_help,
+    "get_time": get_time,
+    "open_notepad": open_notepad,
+    "open_application": open_application,
+}
+# Registry name of each built-in handler ("get_time" -> "time"); show_help has none
+_builtin_feature_names: Dict[str, str] = {func.__name__: name for name, (func, _, _) in basic_features.items()}
+# Built-ins are not feature modules, so their response-cache policies live here
+_builtin_cache_policies: Dict[str, response_cache.CachePolicy] = {
+    "get_time": response_cache.CachePolicy(60, time_varying=True),  # minute resolution
+    "show_help": response_cache.CachePolicy(300),  # the feature list bumps the generation
+}
+
+def _is_provider_configured(feature_name: str) -> bool:
     try:
-        return ''.join(c for c in unicodedata.normalize('NFD', s or '') if unicodedata.category(c) != 'Mn')
+        module = importlib.import_module(f"features.{feature_name}")
+        return bool(module.is_configured())
     except Exception:
-        return (s or '').lower()
+        return False
 
-def _normalize_for_match(s: str) -> str:
-    """Lowercase, strip diacritics and collapse whitespace for robust keyword checks."""
-    s = (s or '').lower()
-    s = _strip_diacritics(s)
+def _rule_guards_pass(rule, command: str) -> bool:
+    for guard in rule.requires:
+        if guard == "configured":
+            if not _is_provider_configured(rule.feature or ""):
+                return False
+        elif guard == "digit":
+            if not re.search(r'\d', command):
+                return False
+        else:
+            return False
+    return True
+
+def _route_by_rules(command: str, norm_cmd: str, tokens: List[str],
+                    current_features: Dict[str, Tuple[Callable, List[str], List[str]]]
+                    ) -> Optional[Tuple[Optional[str], Callable, float, str]]:
+    """Return the first rule (by priority) that matches and whose target is available."""
+    table = get_route_table(_normalize_for_match)
+    for rule, matched_token in table.matches(norm_cmd, tokens):
+        if rule.feature:
+            entry = current_features.get(rule.feature)
+            if entry is None:
+                continue
+            func = entry[0]
+            name = rule.feature
+        else:
+            func = _builtin_handlers.get(rule.handler or "")
+            if func is None:
+                continue
+            name = _builtin_feature_names.get(rule.handler or "")
+        if rule.requires and not _rule_guards_pass(rule, command):
+            continue
+        if rule.params == "empty":
+            params = ""
+        elif rule.params == "after_token" and matched_token is not None:
+            params = " ".join(tokens[tokens.index(matched_token) + 1:])
+        else:
+            params = command
+        return (name, func, 1.0, params)
+    return None
+
+def serial_feature(command: str) -> Optional[str]:
+    """Name of the ``batch_serial`` feature ``command`` routes to; None when it may run concurrently.
+
+    Router only (no pre-hooks), so asking has no side effects.
+    """
     try:
-        import re as _re
-        s = _re.sub(r"\s+", " ", s).strip()
+        name, handler, _, _ = _find_route(command, preprocess_text(command))
     except Exception:
-        s = s.strip()
-    return s
-
-# Pre-cache common commands for faster response
-_common_commands_cache = {}
-def _precache_common_commands():
-    """Pre-cache processing for common commands."""
-    common_commands = [
-        "mấy giờ rồi", "thời gian", "giờ", 
-        "mở notepad", "mở ghi chú",
-        "thời tiết", "nhiệt độ", "hệ thống",
-        "tính toán", "cộng", "trừ", "nhân", "chia"
-    ]
-    for cmd in common_commands:
-        _common_commands_cache[cmd] = preprocess_text(cmd)
-
-# Cache for feature matching results
-_feature_match_cache = {}
-_feature_match_cache_lock = threading.Lock()
-
-def find_best_feature(command: str, tokens: List[str]) -> Tuple[Optional[Callable], float, str]:
+        return None
+    if handler is None or not feature_registry.is_serial(handler):
+        return None
+    return name or getattr(handler, '__name__', '')
+
+def find_best_feature(command: str, tokens: List[str],
+                      normalized: Optional[NormalizedCommand] = None) -> Tuple[Optional[Callable], float, str]:
     """
     Optimized feature matching with priority-based lookup.
     """
+    return _find_route(command, tokens, normalized)[1:]
+
+def _find_route(command: str, tokens: List[str], normalized: Optional[NormalizedCommand] = None
+                ) -> Tuple[Optional[str], Optional[Callable], float, str]:
+    """(feature name, handler, confidence, params); the name is None for unmatched commands."""
     # Check if features are loaded, wait briefly if not
     if not features_loaded.is_set():
         # Wait max 100ms for features to load
         features_loaded.wait(timeout=0.1)
 
+    # Fast-path cache for repeated lookups (including "no feature" results)
+    cache_key = (command, feature_registry.registry_generation())
+    cached = _routing_cache.get(cache_key, None)
+    if cached is not None:
+        return cached
+
     with feature_loading_lock:
         current_features = features.copy()
 
-    # Fast-path cache for repeated lookups to reduce matching latency
+    result = _find_best_feature_uncached(command, tokens, current_features, normalized)
+    _routing_cache.put(cache_key, result)
+    return result
+
+def _find_best_feature_uncached(command: str, tokens: List[str],
+                                current_features: Dict[str, Tuple[Callable, List[str], List[str]]],
+                                normalized: Optional[NormalizedCommand] = None
+                                ) -> Tuple[Optional[str], Optional[Callable], float, str]:
+
+    # Mojibake is repaired before matching (mojibake.py); clean commands pass the pre-check untouched
+    repaired = repair_mojibake(command)
+    if repaired != command:
+        command, tokens, normalized = repaired, preprocess_text(repaired), None
+
+    # Normalized text for robust matching (accent-insensitive, whitespace-collapsed)
+    norm_cmd = normalized.accentless if normalized is not None else _normalize_for_match(command)
+
+    # Tiers 1-2: declarative rule table (routing_rules.json), one automaton scan
+    routed = _route_by_rules(command, norm_cmd, tokens, current_features)
+    if routed is not None:
+        return routed
+
+    # Tier 3: exact keyword, then batched fuzzy scoring over the precomputed phrase index
+    index = _get_fuzzy_index(current_features)
+    exact = index.exact_keyword(tokens)
+    if exact is not None and exact in current_features:
+        return (exact, current_features[exact][0], 1.0, command)
+
+    best = index.best_feature(command, threshold=0.7, fallback_scorer=get_fuzz().token_set_ratio)
+    if best is not None and best[0] in current_features:
+        return (best[0], current_features[best[0]][0], best[1], command)
+
+    return (None, None, 0, "")
+
+def _resolve_feature(command: str, normalized: NormalizedCommand) -> Optional[ResolvedFeature]:
+    name, func, confidence, params = _find_route(command, list(normalized.tokens), normalized)
+    if func is None:
+        return None
+    return ResolvedFeature(name, func, params, confidence)
+
+# --- Request stages shared by run_feature_async and dispatch ---
+
+_TAUGHT_PATH = os.path.join(os.path.dirname(__file__), 'taught.json')
+# Teach syntax: "day: <pattern> => <reply>" or "teach: ... => ..."
+_TEACH_PATTERN = re.compile(r"^(day|teach)\s*[:\-]?\s*(.+?)\s*(=>|->|:)\s*(.+)$", re.IGNORECASE)
+
+# Provider order when escalating a weak NLP answer vs. answering an unmatched
+# command; the user's preferred provider is always tried first.
+_ESCALATION_PROVIDERS = ("chatgpt", "gemini")
+_FALLBACK_PROVIDERS = ("gemini", "chatgpt")
+_PROVIDER_MODULES = {"chatgpt": "features.chatgpt_bridge", "gemini": "features.gemini_bridge"}
+
+
+def _record_turn(role: str, text: str) -> None:
+    """Record a turn into conversation memory (best-effort)."""
     try:
-        cache_key = ("/".join(tokens) or _normalize_for_match(command)) + f"|{len(current_features)}"
-        with _feature_match_cache_lock:
-            cached = _feature_match_cache.get(cache_key)
-        if cached:
-            return cached
+        from features.memory import get_memory  # type: ignore
+        get_memory().add_turn(role, text)
     except Exception:
         pass
 
-    # Normalized text for robust matching (accent-insensitive, whitespace-collapsed)
-    norm_cmd = _normalize_for_match(command)
+def _provider_history() -> Optional[List[Dict[str, str]]]:
+    try:
+        from features.memory import get_memory  # type: ignore
+        return get_memory().get_provider_history(8)
+    except Exception:
+        return None
+
+def _taught_reply(command: str, normalized: Optional[NormalizedCommand] = None) -> Optional[str]:
+    """Simple teach-and-reply feature: learn "day: X => Y" or answer a taught pattern."""
+    try:
+        store = get_taught_store(_TAUGHT_PATH)
+        try:
+            m = _TEACH_PATTERN.match(_strip_diacritics(command))
+            if m:
+                key = _normalize_for_match(m.group(2))
+                val = m.group(4).strip()
+                if key and val:
+                    store.teach(key, val)
+                    return f"Da hoc: khi thay '{key}' se tra loi: '{val}'"
+        except Exception:
+            pass
+
+        # If a taught pattern matches, answer immediately
+        return store.lookup(normalized.accentless if normalized is not None else _normalize_for_match(command))
+    except Exception:
+        return None
 
-    # Early: provider triggers (explicit user intent)
+def _coerce_result(result: Any) -> str:
+    # Ensure result is a string for downstream processing and logging
+    if isinstance(result, str):
+        return result
     try:
-        from features.gemini_bridge import is_configured as _gm_conf  # type: ignore
+        return str(result)
     except Exception:
-        _gm_conf = lambda: False  # type: ignore
+        return ""
+
+def _should_escalate(res: str) -> bool:
+    """True when the NLP feature produced a low-value answer worth asking a provider about."""
     try:
-        from features.chatgpt_bridge import is_configured as _cg_conf  # type: ignore
+        if not isinstance(res, str):
+            return True
+        r = res.strip().lower()
+        if not r:
+            return True
+        bad_starts = ["xin loi", "xin li", "khong the", "khong tim", "khong hieu", "da phan tich"]
+        if any(r.startswith(p) for p in bad_starts):
+            return True
+        # Heuristic: if result contains only meta like "Y dinh:" without content
+        if r.startswith("y dinh:") and ("|" in r or len(r) < 40):
+            return True
+        return False
     except Exception:
-        _cg_conf = lambda: False  # type: ignore
-
-    if ("gemini" in norm_cmd or "hoi gemini" in norm_cmd or "h?i gemini" in norm_cmd) and "gemini_bridge" in current_features and _gm_conf():
-        return (current_features["gemini_bridge"][0], 1.0, command)
-    if ("chatgpt" in norm_cmd or "hoi chatgpt" in norm_cmd or "h?i chatgpt" in norm_cmd) and "chatgpt_bridge" in current_features and _cg_conf():
-        return (current_features["chatgpt_bridge"][0], 1.0, command)
-
-    # Early: normalized help detection
-    _help_norm = [
-        "ban co the lam gi",
-        "ban co chuc nang gi",
-        "gioi thieu chuc nang",
-        "tro giup",
-        "huong dan",
-        "help"
-    ]
-    if any(p in norm_cmd for p in _help_norm):
-        return (show_help, 1.0, command)
-
-    # Early: time queries (avoid misrouting "mấy giờ" as app launch due to diacritics)
-    _time_norm = ["may gio", "gio", "thoi gian"]
-    if any(w in norm_cmd for w in _time_norm):
-        return (get_time, 1.0, "")
-
-    # Early: normalized app-launch intent to prefer app_launcher
-    if "app_launcher" in current_features:
-        _launch_norm = ["may", "mo", "chay", "khoi dong", "khoi", "open", "launch", "run", "ung dung", "app"]
-        if any(w in norm_cmd for w in _launch_norm):
-            return (current_features["app_launcher"][0], 1.0, command)
-
-    # Early: route general questions.
-    # First let NLP handle; only escalate to providers if NLP is unavailable or later deemed insufficient
-    q_words = ["la gi", "la ai", "o dau", "bao nhieu", "the nao", "tai sao", "khi nao", "ai la"]
-    if ("?" in command) or any(q in norm_cmd for q in q_words):
-        if "nlp_processor" in current_features:
-            return (current_features["nlp_processor"][0], 1.0, command)
-        # If NLP not available, fall back to preferred/provider later
-
-    # Help/intro phrases (substring match; robust to tokenization)
-    help_phrases = [
-        "bạn có thể làm gì",
-        "bạn có chức năng gì",
-        "giới thiệu chức năng",
-        "trợ giúp",
-        "hướng dẫn",
-        "help"
-    ]
-    if any(p in command.lower() for p in help_phrases):
-        return (show_help, 1.0, command)
-
-    # Tier 1: Fast keyword matching for built-in commands
-    if any(word in tokens for word in ["giờ", "thời gian"]):
-        return (get_time, 1.0, "")
-    if any(word in tokens for word in ["notepad", "ghi", "chú"]):
-        return (open_notepad, 1.0, "")
-    if any(word in tokens for word in ["mở", "khởi động", "chạy"]):
-        for keyword in ["mở", "khởi động", "chạy"]:
-            if keyword in tokens:
-                keyword_index = tokens.index(keyword)
-                app_name = " ".join(tokens[keyword_index + 1:])
-                return (open_application, 1.0, app_name)
-    
-    # Prefer dedicated app launcher when user intends to open an app
-    launch_words = [
-        "mở", "mo", "chạy", "chay", "khởi", "khoi", "khởi động", "khoi dong",
-        "open", "launch", "run", "ứng", "ung", "dụng", "dung", "app"
-    ]
-    if "app_launcher" in current_features and any(w in tokens for w in launch_words):
-        return (current_features["app_launcher"][0], 1.0, command)
-
-    # Tier 2: Feature-specific matching
-    # Reminder feature (events/notes) — prioritize before generic 'thong tin'
-    if "reminder" in current_features:
-        reminder_words = ["nh��_c", "nh��_c nh��Y", "l��<ch", "s��� ki���n", "h��1n", "reminder", "calendar", "ghi chA�", "ghi chu", "su kien"]
-        if any(w in tokens for w in reminder_words):
-            return (current_features["reminder"][0], 1.0, command)
+        return False
+
+def _decorate_result(name: Optional[str], feature: Callable, result: str) -> str:
+    """Inject panel markers for GUI if applicable."""
+    try:
+        if name == 'system_info':
+            return f"[[PANEL:SYSTEM_INFO]]{result}"
+        if getattr(feature, '__name__', '') == 'get_time':
+            return f"[[PANEL:CLOCK]]{result}"
+        if name == 'reminder':
+            return f"[[PANEL:NOTES]]{result}"
+    except Exception:
+        pass
+    return result
+
+def _enhance(result: str, command: str, success: bool) -> str:
+    try:
+        from features.ai_enhancements import enhance_with_ai
+        return enhance_with_ai(result, command, success)
+    except ImportError:
+        return result  # AI features not available
+
+def _configured_providers(order: Tuple[str, ...]) -> List[Tuple[str, Any]]:
+    """(name, bridge module) for each configured provider, preferred provider first."""
+    try:
+        from features.provider_prefs import get_default_provider  # type: ignore
+        preferred = get_default_provider()
+    except Exception:
+        preferred = None
+    names = list(order)
+    if preferred in names:
+        names.remove(preferred)
+        names.insert(0, preferred)
+    found = []
+    for name in names:
         try:
-            norm_cmd2 = _normalize_for_match(command)
-            if any(p in norm_cmd2 for p in ["su kien", "ghi chu", "lich", "nhac nho", "calendar", "event"]):
-                return (current_features["reminder"][0], 1.0, command)
+            module = importlib.import_module(_PROVIDER_MODULES[name])
+            if module.is_configured():
+                found.append((name, module))
         except Exception:
             pass
-    # System info feature
-    if "system_info" in current_features and any(word in tokens for word in ["hệ thống", "thông tin", "máy tính", "system"]):
-        return (current_features["system_info"][0], 1.0, "")
-    
-    # Weather feature
-    if "weather" in current_features and any(word in tokens for word in ["thời tiết", "weather", "nhiệt độ", "độ ẩm", "dự báo"]):
-        return (current_features["weather"][0], 1.0, command)
-        
-    # Reminder feature
-    if "reminder" in current_features and any(word in tokens for word in ["nhắc", "nhắc nhở", "lịch", "sự kiện", "hẹn", "reminder", "calendar"]):
-        return (current_features["reminder"][0], 1.0, command)
-        
-    # NLP Processor feature
-    if "nlp_processor" in current_features and any(word in tokens for word in ["hiểu", "phân tích", "ngôn ngữ", "nlp", "xử lý", "lời nói", "cảm xúc", "ý định", "xóa", "hủy", "delete", "remove"]):
-        return (current_features["nlp_processor"][0], 1.0, command)
-
-    # Calculator feature with optimized matching
-    if "calculator" in current_features:
-        calc_func, _, _ = current_features["calculator"]
-        has_nums = bool(re.search(r'\d', command))
-        has_math_op = any(op in tokens for op in ["cộng", "trừ", "nhân", "chia", "tính", "+", "-", "*", "/"])
-        if has_nums and has_math_op:
-            return (calc_func, 1.0, command)
-
-    # Tier 3: Fuzzy matching fallback with optimized scoring
-    best_score = 0.7  # Higher threshold for better accuracy
-    best_feature = None
-    
-    for feature_name, (func, keywords, patterns) in current_features.items():
-        if feature_name in ["calculator", "system_info", "weather"]:
-            continue  # Already handled above
+    return found
 
-        # Combine all matching phrases
-        all_phrases = keywords + patterns
-        if not all_phrases:
+def _escalate(command: str, deadline: Deadline) -> Optional[str]:
+    """Ask the first configured provider that gives a non-empty answer."""
+    for name, module in _configured_providers(_ESCALATION_PROVIDERS):
+        try:
+            alt = getattr(module, f"ask_{name}")(command, deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception:
             continue
+        if isinstance(alt, str) and alt.strip():
+            return alt
+    return None
+
+# --- Speculative escalation (opt-in: SPECULATIVE_ESCALATION in assistant_config.json) ---
+# For question-shaped commands routed to the NLP processor, the provider
+# request starts together with the handler; it is cancelled when the NLP
+# answer is good enough and used as soon as it arrives otherwise.
+
+_QUESTION_MARKERS = (
+    "la gi", "la ai", "ai la", "tai sao", "vi sao", "the nao", "bao nhieu", "o dau",
+    "khi nao", "co phai", "nghia la", "what", "who", "why", "how", "when", "where",
+)
+_speculation_stats = {"started": 0, "used": 0, "cancelled": 0, "skipped": 0}
+_speculation_lock = threading.Lock()
+_speculation_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+# A cancelled blocking request keeps its worker until the provider returns, so
+# a new speculation is skipped rather than queued behind abandoned ones
+SPECULATION_WORKERS = 2
+_speculation_slots = threading.BoundedSemaphore(SPECULATION_WORKERS)
+
+def _count_speculation(outcome: str) -> None:
+    with _speculation_lock:
+        _speculation_stats[outcome] += 1
+
+def get_speculation_stats() -> Dict[str, int]:
+    """How many speculative provider requests were started, used, cancelled and skipped."""
+    with _speculation_lock:
+        return dict(_speculation_stats)
+
+def _is_question(command: str) -> bool:
+    nc = normalize_command(command)
+    if nc.lower.endswith("?"):
+        return True
+    text = f" {nc.accentless} "
+    return any(f" {m} " in text for m in _QUESTION_MARKERS)
+
+def _should_speculate(command: str, name: Optional[str]) -> bool:
+    if name != 'nlp_processor':
+        return False
+    try:
+        from features.provider_prefs import get_speculative_escalation  # type: ignore
+        return get_speculative_escalation() and _is_question(command)
+    except Exception:
+        return False
+
+def _get_speculation_pool() -> concurrent.futures.ThreadPoolExecutor:
+    # Separate from ``executor``: the handler already holds one of its workers
+    global _speculation_pool
+    if _speculation_pool is None:
+        with _speculation_lock:
+            if _speculation_pool is None:
+                _speculation_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=SPECULATION_WORKERS, thread_name_prefix="speculate")
+    return _speculation_pool
+
+class _Speculation:
+    """A provider escalation running alongside the handler."""
+    __slots__ = ("deadline", "future", "settled")
 
-        # Optimized scoring: check if any keyword matches exactly first
-        exact_match = any(keyword in tokens for keyword in keywords if keyword)
-        if exact_match:
-            return (func, 1.0, command)
+    def __init__(self, deadline: Deadline, future: Any) -> None:
+        self.deadline = deadline
+        self.future = future
+        self.settled = False
 
-        # Fallback to fuzzy matching
-        score = get_fuzz().token_set_ratio(command.lower(), " ".join(all_phrases)) / 100.0
-        
-        if score > best_score:
-            best_score = score
-            best_feature = func
+    def cancel(self) -> None:
+        if self.settled:
+            return
+        self.settled = True
+        self.deadline.cancel()  # a request already on the wire stops at its next check
+        if not self.future.cancel() and self.future.done() and not self.future.cancelled():
+            self.future.exception()  # mark a failure as retrieved (asyncio would log it)
+        _count_speculation("cancelled")
 
-    if best_feature:
-        _ret = (best_feature, best_score, command)
+    def _used(self) -> None:
+        self.settled = True
+        _count_speculation("used")
+
+    def result(self, timeout: Optional[float]) -> Optional[str]:
         try:
-            with _feature_match_cache_lock:
-                _feature_match_cache[cache_key] = _ret
+            alt = self.future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            self.cancel()
+            raise DeadlineExceeded("request deadline exceeded") from None
+        self._used()
+        return alt
+
+    async def result_async(self) -> Optional[str]:
+        alt = await self.future
+        self._used()
+        return alt
+
+def _start_speculation(command: str, name: Optional[str], deadline: Deadline) -> Optional[_Speculation]:
+    if not _should_speculate(command, name):
+        return None
+    if not _speculation_slots.acquire(blocking=False):
+        _count_speculation("skipped")  # _stage_escalate still escalates a weak answer
+        return None
+    spec_dl = deadline.child(None)
+    ctx = contextvars.copy_context()
+    try:
+        future = _get_speculation_pool().submit(ctx.run, _escalate, command, spec_dl)
+    except BaseException:
+        _speculation_slots.release()
+        raise
+    future.add_done_callback(lambda _: _speculation_slots.release())
+    _count_speculation("started")
+    return _Speculation(spec_dl, future)
+
+def _suggestion_reply(command: str) -> str:
+    # Nothing configured: suggest close patterns from the fuzzy index
+    suggestions = _get_fuzzy_index().suggest(
+        command, limit=3, cutoff=60, fallback_scorer=get_fuzz().partial_ratio)
+    if suggestions:
+        suggestion_text = "\n".join(f"- {s}" for s in suggestions)
+        return f"Xin lỗi, tôi không hiểu. Có phải bạn muốn nói:\n{suggestion_text}"
+    return "Xin lỗi, tôi không hiểu yêu cầu của bạn. Hãy thử diễn đạt theo cách khác."
+
+def _fallback_reply(command: str, deadline: Deadline) -> str:
+    """Answer an unmatched command via a configured provider, else suggest patterns."""
+    providers = _configured_providers(_FALLBACK_PROVIDERS)
+    if providers:
+        hist = _provider_history()
+        for name, module in providers:
+            try:
+                log.debug("No feature found, falling back to %s", name)
+                return getattr(module, f"ask_{name}")(command, history=hist, deadline=deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception:
+                continue
+    return _suggestion_reply(command)
+
+def _error_reply(command: str, e: Exception) -> str:
+    error_msg = f"Có lỗi xảy ra: {str(e)}"
+    # Record failed command for AI learning
+    error_msg = _enhance(error_msg, command, False)
+    log.debug("Returning error: %s", error_msg)
+    return error_msg
+
+# --- Request outcome counters: timeouts are kept apart from errors ---
+
+TIMEOUT_REPLY = "Timeout: Không thể xử lý yêu cầu"
+_request_stats = {"completed": 0, "errors": 0, "timeouts": 0, "cancelled": 0}
+_request_stats_lock = threading.Lock()
+
+def _count_request(outcome: str) -> None:
+    with _request_stats_lock:
+        _request_stats[outcome] += 1
+
+def get_request_stats() -> Dict[str, int]:
+    """Counts of completed, failed, timed-out and cancelled requests since startup."""
+    with _request_stats_lock:
+        return dict(_request_stats)
+
+def _handler_kwargs(handler: Callable, params: str, deadline: Deadline) -> Dict[str, Any]:
+    # Handlers that declare a ``deadline`` parameter get it explicitly; the
+    # rest can still read it through deadline.current_deadline(). Handlers
+    # that declare ``normalized`` get the interned NormalizedCommand of params.
+    kwargs: Dict[str, Any] = {}
+    if feature_registry.accepts_deadline(handler):
+        kwargs["deadline"] = deadline
+    if feature_registry.accepts_normalized(handler):
+        kwargs["normalized"] = normalize_command(params or "")
+    return kwargs
+
+def _process_tier_target(feature: Callable) -> Optional[Tuple[str, str]]:
+    # (module, handler) when the feature is CPU-bound and the process tier is on
+    if not process_tier.enabled() or not feature_registry.is_cpu_bound(feature):
+        return None
+    return feature_registry.handler_location(feature)
+
+def _call_handler(feature: Callable, params: str, deadline: Deadline) -> Any:
+    target = _process_tier_target(feature)
+    if target is not None:
+        try:
+            return process_tier.call(*target, params, deadline)
+        except process_tier.TierUnavailable as e:
+            log.debug("Process tier unavailable, running in-process: %s", e)
+    return feature(params, **_handler_kwargs(feature, params, deadline))
+
+def _cache_target(feature: ResolvedFeature) -> Optional[Tuple[str, response_cache.CachePolicy]]:
+    # (cache name, policy) when the routed handler's replies may be cached
+    if RESPONSE_CACHE_SIZE <= 0:
+        return None
+    handler = feature.handler
+    builtin = getattr(handler, "__name__", "")
+    if _builtin_handlers.get(builtin) is handler:
+        policy = _builtin_cache_policies.get(builtin)
+        return (builtin, policy) if policy is not None else None
+    policy = feature_registry.cache_policy(handler)
+    if policy is None or not feature.name:
+        return None
+    return feature.name, policy
+
+# --- Request pipeline (pipeline.py): pre-hooks -> router -> prepare -> handler -> post ---
+
+def _stage_tokenize(ctx: RequestContext) -> None:
+    log.debug("Processing command: %r", ctx.command)
+    _warmup.note_request(ctx.command)
+    ctx.normalized = normalize_command(ctx.command)
+
+def _stage_remember_command(ctx: RequestContext) -> None:
+    # Record user turn into conversation memory
+    _record_turn('user', ctx.command)
+
+def _stage_taught(ctx: RequestContext) -> None:
+    reply = _taught_reply(ctx.command, ctx.normalized)
+    if reply is not None:
+        ctx.answer(reply)
+
+def _stage_route(ctx: RequestContext) -> None:
+    ctx.feature = _resolve_feature(ctx.command, ctx.normalized)
+    if ctx.feature is not None:
+        log.debug("Found feature %s (confidence %s)", ctx.feature.name, ctx.feature.confidence)
+
+def _stage_nlp_context(ctx: RequestContext) -> None:
+    # Inject external conversation context into the NLP processor
+    hist = _provider_history()
+    if hist is not None:
+        try:
+            from features.nlp_processor import set_nlp_context_window  # type: ignore
+            set_nlp_context_window(hist)
         except Exception:
             pass
-        return _ret
 
-    return (None, 0, "")
+def _stage_cache_lookup(ctx: RequestContext) -> None:
+    if ctx.feature is None:
+        return
+    target = _cache_target(ctx.feature)
+    if target is None:
+        return
+    ctx.state["cache"] = target
+    cached = _response_cache.get(target[0], target[1], ctx.feature.params)
+    if cached is not MISSING:
+        log.debug("Response cache hit for %s", target[0])
+        ctx.supply(cached)
+
+def _stage_speculate(ctx: RequestContext) -> None:
+    spec = _start_speculation(ctx.command, ctx.feature_name, ctx.deadline)
+    if spec is not None:
+        ctx.state["speculation"] = spec
+        ctx.on_finish(spec.cancel)  # no-op once its answer was used
+
+def _stage_handler(ctx: RequestContext) -> None:
+    ctx.deadline.check()
+    if ctx.feature is None:
+        with span("fallback"):
+            ctx.result = _coerce_result(_fallback_reply(ctx.command, ctx.deadline))
+        ctx.success = False
+        return
+    feature = ctx.feature
+    ctx.result = _coerce_result(_call_handler(feature.handler, feature.params, ctx.deadline))
+    log.debug("Feature result: %.200s", ctx.result)
+    ctx.deadline.check()
+
+def _stage_cache_store(ctx: RequestContext) -> None:
+    # Store the handler's own reply (before decoration and suggestions)
+    target = ctx.state.get("cache")
+    if target is not None and not ctx.handled and ctx.success and ctx.feature is not None:
+        _response_cache.put(target[0], target[1], ctx.feature.params, ctx.result)
+
+def _stage_decorate(ctx: RequestContext) -> None:
+    if ctx.feature is not None:
+        ctx.result = _decorate_result(ctx.feature.name, ctx.feature.handler, ctx.result)
 
-def run_feature_async(command: str, callback: Callable[[str], None]):
+def _stage_escalate(ctx: RequestContext) -> None:
+    # If NLP handled but returned low-value output, escalate to provider
+    if not _should_escalate(ctx.result):
+        return
+    spec = ctx.state.get("speculation")
+    alt = spec.result(ctx.deadline.remaining()) if spec is not None else _escalate(ctx.command, ctx.deadline)
+    if alt:
+        ctx.result = alt
+
+def _stage_enhance(ctx: RequestContext) -> None:
+    # Unmatched commands are recorded as failures for AI learning
+    ctx.result = _enhance(ctx.result, ctx.command, ctx.success)
+
+def _stage_remember_reply(ctx: RequestContext) -> None:
+    if not ctx.success:
+        log.debug("Fallback result: %.50s", ctx.result)
+        # Record assistant turn into conversation memory
+        _record_turn('assistant', ctx.result)
+
+def _handle_command(command: str, deadline: Deadline) -> str:
+    """Synchronous request pipeline: route, run the handler, escalate/fallback, enhance."""
+    return _pipeline.run(RequestContext(command, deadline))
+
+def run_feature_async(command: str, callback: Callable[[str], None],
+                      deadline: Union[Deadline, float, None] = None,
+                      priority: Optional[str] = None):
     """
     Run feature asynchronously with callback for GUI integration.
     Enhanced with AI capabilities.
-    """
-    def _process_command():
-        try:
-            print(f"DEBUG: Processing command: '{command}'")
-            tokens = preprocess_text(command)
 
-            # Record user turn into conversation memory
-            try:
-                from features.memory import get_memory  # type: ignore
-                get_memory().add_turn('user', command)
-            except Exception:
-                pass
+    ``deadline`` (a Deadline or absolute ``time.monotonic()`` timestamp) is
+    propagated to the handler, provider calls and web search; when it passes
+    the worker stops at the next check and the callback gets TIMEOUT_REPLY.
+    ``priority`` is the scheduler class (default: the caller's, interactive
+    unless set with ``scheduler.priority_scope``).
+    """
+    dl = Deadline.coerce(deadline)
 
-            # --- Simple teach-and-reply feature ---
-            try:
-                taught_path = os.path.join(os.path.dirname(__file__), 'taught.json')
-                import json as _json
-                taught = {}
-                if os.path.exists(taught_path):
-                    try:
-                        with open(taught_path, 'r', encoding='utf-8', errors='replace') as f:
-                            data = _json.load(f)
-                        if isinstance(data, dict):
-                            taught = {str(k): str(v) for k, v in data.items()}
-                    except Exception:
-                        taught = {}
-
-                # Teach syntax: "day: <pattern> => <reply>" or "teach: ... => ..."
-                try:
-                    teach_pat = re.compile(r"^(day|teach)\s*[:\-]?\s*(.+?)\s*(=>|->|:)\s*(.+)$", re.IGNORECASE)
-                    m = teach_pat.match(_strip_diacritics(command))
-                    if m:
-                        key = _normalize_for_match(m.group(2))
-                        val = m.group(4).strip()
-                        if key and val:
-                            taught[key] = val
-                            try:
-                                with open(taught_path, 'w', encoding='utf-8') as f:
-                                    _json.dump(taught, f, ensure_ascii=False, indent=2)
-                            except Exception:
-                                pass
-                            result = f"Da hoc: khi thay '{key}' se tra loi: '{val}'"
-                            callback(result)
-                            return
-                except Exception:
-                    pass
-
-                # If a taught pattern matches, answer immediately
-                try:
-                    norm_cmd_quick = _normalize_for_match(command)
-                    for k, v in taught.items():
-                        if k and k in norm_cmd_quick:
-                            callback(v)
-                            return
-                except Exception:
-                    pass
-            except Exception:
-                pass
-            feature, confidence, params = find_best_feature(command, tokens)
-            
-            if feature:
-                print(f"DEBUG: Found feature: {getattr(feature, '__name__', 'unknown')} with confidence {confidence}")
-                # If NLP feature selected, inject external context into NLP processor
-                try:
-                    with feature_loading_lock:
-                        _map = features.copy()
-                    chosen_name = None
-                    for _name, (_func, _, _) in _map.items():
-                        if _func is feature:
-                            chosen_name = _name
-                            break
-                    if chosen_name == 'nlp_processor':
-                        try:
-                            from features.memory import get_memory  # type: ignore
-                            from features.nlp_processor import set_nlp_context_window  # type: ignore
-                            hist = get_memory().get_provider_history(8)
-                            set_nlp_context_window(hist)
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-                result = feature(params)
-                # Ensure result is a string for downstream processing and logging
-                if not isinstance(result, str):
-                    try:
-                        result = str(result)
-                    except Exception:
-                        result = ""
-                print(f"DEBUG: Feature result: {result}")
-                # If NLP handled but returned low-value output, escalate to provider
-                try:
-                    with feature_loading_lock:
-                        current_features = features.copy()
-                    selected_name = None
-                    for name, (func, _, _) in current_features.items():
-                        if func is feature:
-                            selected_name = name
-                            break
-                    def _should_escalate(cmd: str, res: str) -> bool:
-                        try:
-                            if not isinstance(res, str):
-                                return True
-                            r = res.strip().lower()
-                            if not r:
-                                return True
-                            bad_starts = ["xin loi", "xin li", "khong the", "khong tim", "khong hieu", "da phan tich"]
-                            if any(r.startswith(p) for p in bad_starts):
-                                return True
-                            # Heuristic: if result contains only meta like "Y dinh:" without content
-                            if r.startswith("y dinh:") and ("|" in r or len(r) < 40):
-                                return True
-                            return False
-                        except Exception:
-                            return False
-                    # Inject panel markers for GUI if applicable
-                    try:
-                        if selected_name == 'system_info':
-                            result = f"[[PANEL:SYSTEM_INFO]]{result}"
-                        elif getattr(feature, '__name__', '') == 'get_time':
-                            result = f"[[PANEL:CLOCK]]{result}"
-                        elif selected_name == 'reminder':
-                            result = f"[[PANEL:NOTES]]{result}"
-                    except Exception:
-                        pass
-
-                    if selected_name == 'nlp_processor' and _should_escalate(command, result):
-                        # Ask via preferred provider
-                        def _provider_answer(cmd: str) -> Optional[str]:
-                            try:
-                                from features.provider_prefs import get_default_provider  # type: ignore
-                                preferred = get_default_provider()
-                            except Exception:
-                                preferred = None
-                            # Safe gemini symbols
-                            try:
-                                from features.gemini_bridge import ask_gemini, is_configured as is_gemini_configured  # type: ignore
-                            except Exception:
-                                ask_gemini = None  # type: ignore
-                                def is_gemini_configured(): return False  # type: ignore
-                            # Try preferred first
-                            if preferred == 'chatgpt':
-                                try:
-                                    from features.chatgpt_bridge import ask_chatgpt, is_configured as is_cg  # type: ignore
-                                    if is_cg():
-                                        return ask_chatgpt(cmd)
-                                except Exception:
-                                    pass
-                            if preferred == 'gemini' and ask_gemini and is_gemini_configured():
-                                try:
-                                    return ask_gemini(cmd)
-                                except Exception:
-                                    pass
-                            # Otherwise try any configured
-                            try:
-                                from features.chatgpt_bridge import ask_chatgpt, is_configured as is_cg  # type: ignore
-                                if is_cg():
-                                    return ask_chatgpt(cmd)
-                            except Exception:
-                                pass
-                            if ask_gemini and is_gemini_configured():
-                                try:
-                                    return ask_gemini(cmd)
-                                except Exception:
-                                    pass
-                            return None
-                        alt = _provider_answer(command)
-                        if isinstance(alt, str) and alt.strip():
-                            result = alt
-                except Exception:
-                    pass
-                # Enhance with AI if available
-                try:
-                    from features.ai_enhancements import enhance_with_ai
-                    result = enhance_with_ai(result, command, True)
-                except ImportError:
-                    pass  # AI features not available
-                # Return early for handled feature to avoid running global fallback block
-                try:
-                    callback(result)
-                finally:
-                    return
-            else:
-                # Fallback path when no feature matched
-                # Safe defaults for provider symbols
-                ask_gemini = None
-                def is_gemini_configured():  # type: ignore
-                    return False
-                try:
-                    from features.gemini_bridge import ask_gemini as _ask_gemini, is_configured as _is_gemini_configured  # type: ignore
-                    ask_gemini = _ask_gemini
-                    is_gemini_configured = _is_gemini_configured  # type: ignore
-                except Exception:
-                    pass
-            # Use preferred provider for fallback when nothing matched
-            try:
-                from features.provider_prefs import get_default_provider  # type: ignore
-                preferred = get_default_provider()
-            except Exception:
-                preferred = None
-            used = False
-            if preferred == "chatgpt":
-                try:
-                    from features.chatgpt_bridge import ask_chatgpt, is_configured as is_cg  # type: ignore
-                    if is_cg():
-                        print("DEBUG: No feature found. Falling back to ChatGPT (preferred).")
-                        try:
-                            from features.memory import get_memory  # type: ignore
-                            hist = get_memory().get_provider_history(8)
-                        except Exception:
-                            hist = None
-                        result = ask_chatgpt(command, history=hist)
-                        used = True
-                except Exception:
-                    pass
-            elif preferred == "gemini":
-                try:
-                    if is_gemini_configured():
-                        print("DEBUG: No feature found. Falling back to Gemini (preferred).")
-                        try:
-                            from features.memory import get_memory  # type: ignore
-                            hist = get_memory().get_provider_history(8)
-                        except Exception:
-                            hist = None
-                        result = ask_gemini(command, history=hist)
-                        used = True
-                except Exception:
-                    pass
-            if not used:
-                if is_gemini_configured():
-                    print("DEBUG: No feature found. Falling back to Gemini.")
-                    try:
-                        from features.memory import get_memory  # type: ignore
-                        hist = get_memory().get_provider_history(8)
-                    except Exception:
-                        hist = None
-                    result = ask_gemini(command, history=hist)
-                else:
-                    try:
-                        from features.chatgpt_bridge import ask_chatgpt, is_configured as is_cg  # type: ignore
-                        if is_cg():
-                            print("DEBUG: No feature found. Falling back to ChatGPT.")
-                            try:
-                                from features.memory import get_memory  # type: ignore
-                                hist = get_memory().get_provider_history(8)
-                            except Exception:
-                                hist = None
-                            result = ask_chatgpt(command, history=hist)
-                            used = True
-                    except Exception:
-                        pass
-                    else:
-                        # Original fallback logic
-                        suggestions = []
-                        with feature_loading_lock:
-                            for _, (_, keywords, patterns) in features.items():
-                                for pattern in patterns:
-                                    if get_fuzz().partial_ratio(command, pattern) > 60:
-                                        suggestions.append(pattern)
-                                        break
-                        
-                        if suggestions:
-                            suggestion_text = "\n".join(f"- {s}" for s in suggestions[:3])
-                            result = f"Xin lỗi, tôi không hiểu. Có phải bạn muốn nói:\n{suggestion_text}"
-                        else:
-                            result = "Xin lỗi, tôi không hiểu yêu cầu của bạn. Hãy thử diễn đạt theo cách khác."
-                # except ImportError:
-                    # Fallback if gemini_bridge doesn't exist
-                    result = "Xin lỗi, tôi không hiểu yêu cầu của bạn. Hãy thử diễn đạt theo cách khác."
-
-                # Enhance error response with AI
-                try:
-                    from features.ai_enhancements import enhance_with_ai
-                    result = enhance_with_ai(result, command, False)
-                except ImportError:
-                    pass
-            
-            # Đảm bảo callback được gọi trong luồng chính của GUI
-            try:
-                prev = result
-                result = result if isinstance(result, str) else str(result)
-                safe = result
-                try:
-                    safe = _safe_display(result)
-                except Exception:
-                    pass
-                _debug(f"DEBUG: Calling callback with result: {safe[:50]}..." if len(safe) > 50 else f"DEBUG: Calling callback with result: {safe}")
-            except Exception:
-                pass
-            # Record assistant turn into conversation memory
-            try:
-                from features.memory import get_memory  # type: ignore
-                get_memory().add_turn('assistant', result if isinstance(result, str) else str(result))
-            except Exception:
-                pass
-            callback(result)
-        except Exception as e:
-            error_msg = f"Có lỗi xảy ra: {str(e)}"
-            # Record failed command for AI learning
-            try:
-                from features.ai_enhancements import enhance_with_ai
-                error_msg = enhance_with_ai(error_msg, command, False)
-            except ImportError:
-                pass
-            _debug(f"DEBUG: About to call callback with error: {error_msg}")
-            callback(error_msg)
-            _debug("DEBUG: Callback finished.")
-    
     # Submit to thread pool and ensure callback runs in main thread
     def _safe_process():
         try:
-            _process_command()
+            with deadline_scope(dl), request_scope():
+                try:
+                    result = _handle_command(command, dl)
+                    _count_request("timeouts" if dl.expired() else "completed")
+                except DeadlineExceeded:
+                    _count_request("timeouts")
+                    result = TIMEOUT_REPLY
+                except Exception as e:
+                    _count_request("errors")
+                    result = _error_reply(command, e)
+            callback(result)
         except Exception as e:
-            print(f"ERROR in _safe_process: {e}")
+            log.exception("Callback failed in _safe_process: %s", e)
             # Đảm bảo callback vẫn được gọi ngay cả khi có lỗi
             callback(f"Có lỗi xảy ra: {str(e)}")
-            print("DEBUG: Error callback called from _safe_process")
     
-    executor.submit(_safe_process)
+    executor.submit_as(priority or scheduler.current_priority(), _safe_process)
+
+# --- Native asyncio entry point ---
+
+def _run_sync(loop: asyncio.AbstractEventLoop, func: Callable, *args) -> "asyncio.Future":
+    # run_in_executor does not carry context variables; copy them so the
+    # request deadline is visible inside the worker thread.
+    ctx = contextvars.copy_context()
+    return loop.run_in_executor(executor, functools.partial(ctx.run, func, *args))
+
+async def _ask_provider_async(name: str, module: Any, command: str, **kwargs) -> Any:
+    ask_async = getattr(module, f"ask_{name}_async", None)
+    if ask_async is not None:
+        return await ask_async(command, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await _run_sync(loop, lambda: getattr(module, f"ask_{name}")(command, **kwargs))
+
+async def _escalate_async(command: str, deadline: Deadline) -> Optional[str]:
+    loop = asyncio.get_running_loop()
+    providers = await _run_sync(loop, _configured_providers, _ESCALATION_PROVIDERS)
+    for name, module in providers:
+        try:
+            alt = await _ask_provider_async(name, module, command, deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            continue
+        if isinstance(alt, str) and alt.strip():
+            return alt
+    return None
+
+async def _fallback_reply_async(command: str, deadline: Deadline) -> str:
+    loop = asyncio.get_running_loop()
+    providers = await _run_sync(loop, _configured_providers, _FALLBACK_PROVIDERS)
+    if providers:
+        hist = _provider_history()
+        for name, module in providers:
+            try:
+                log.debug("No feature found, falling back to %s", name)
+                return await _ask_provider_async(name, module, command, history=hist, deadline=deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception:
+                continue
+    return await _run_sync(loop, _suggestion_reply, command)
+
+async def _stage_speculate_async(ctx: RequestContext) -> None:
+    loop = asyncio.get_running_loop()
+    if await _run_sync(loop, _should_speculate, ctx.command, ctx.feature_name):
+        spec_dl = ctx.deadline.child(None)
+        spec = _Speculation(spec_dl, asyncio.ensure_future(_escalate_async(ctx.command, spec_dl)))
+        _count_speculation("started")
+        ctx.state["speculation"] = spec
+        ctx.on_finish(spec.cancel)  # cancels in-flight provider I/O unless its answer was used
+
+async def _stage_handler_async(ctx: RequestContext) -> None:
+    loop = asyncio.get_running_loop()
+    ctx.deadline.check()
+    if ctx.feature is None:
+        with span("fallback"):
+            ctx.result = _coerce_result(await _fallback_reply_async(ctx.command, ctx.deadline))
+        ctx.success = False
+        return
+    feature = ctx.feature
+    func = feature.handler
+    target = _process_tier_target(func)
+    if target is not None:
+        try:
+            ctx.result = _coerce_result(await process_tier.call_async(
+                *target, feature.params, ctx.deadline, functools.partial(_run_sync, loop)))
+            ctx.deadline.check()
+            return
+        except process_tier.TierUnavailable as e:
+            log.debug("Process tier unavailable, running in-process: %s", e)
+    if isinstance(func, feature_registry.LazyFeature) and not func.loaded:
+        # First use imports the module: keep that off the event loop
+        handler = await _run_sync(loop, _async_variant, func)
+    else:
+        handler = _async_variant(func)
+    if handler is not None:
+        result = await handler(feature.params, **_handler_kwargs(handler, feature.params, ctx.deadline))
+    else:
+        result = await _run_sync(loop, _call_handler, func, feature.params, ctx.deadline)
+    ctx.result = _coerce_result(result)
+    log.debug("Feature result: %.200s", ctx.result)
+    ctx.deadline.check()
+
+async def _stage_escalate_async(ctx: RequestContext) -> None:
+    if not _should_escalate(ctx.result):
+        return
+    spec = ctx.state.get("speculation")
+    alt = await spec.result_async() if spec is not None else await _escalate_async(ctx.command, ctx.deadline)
+    if alt:
+        ctx.result = alt
+
+def _async_variant(func: Callable) -> Optional[Callable]:
+    try:
+        return feature_registry.async_variant(func)
+    except Exception:
+        return None  # the sync call will surface the import error
 
-def run_feature(command: str) -> str:
+_pipeline = Pipeline(
+    pre_hooks=[
+        Stage("tokenize", _stage_tokenize),
+        Stage("memory", _stage_remember_command),
+        Stage("taught", _stage_taught),
+    ],
+    router=Stage("route", _stage_route),
+    prepare=[
+        Stage("response_cache", _stage_cache_lookup, blocking=False),
+        Stage("nlp_context", _stage_nlp_context, only_for=["nlp_processor"]),
+        Stage("speculate", _stage_speculate, _stage_speculate_async, only_for=["nlp_processor"]),
+    ],
+    handler=Stage("handler", _stage_handler, _stage_handler_async),
+    post_processors=[
+        Stage("cache_store", _stage_cache_store, blocking=False),
+        Stage("decorate", _stage_decorate, blocking=False),
+        Stage("escalate", _stage_escalate, _stage_escalate_async, only_for=["nlp_processor"]),
+        Stage("enhance", _stage_enhance),
+        Stage("remember_reply", _stage_remember_reply),
+    ],
+    skip_lookup=lambda feature: feature_registry.skipped_stages(feature.handler),
+)
+
+def get_pipeline() -> Pipeline:
+    """The request pipeline; use ``skip(stage, feature)`` to turn stages off per feature."""
+    return _pipeline
+
+async def _dispatch(command: str, deadline: Deadline) -> str:
+    loop = asyncio.get_running_loop()
+    with deadline_scope(deadline), request_scope():
+        ctx = RequestContext(command, deadline)
+        # Pre-hooks and router are sync and cheap: one executor hop for all of them
+        await _run_sync(loop, _pipeline.route, ctx)
+        return await _pipeline.execute_async(ctx, functools.partial(_run_sync, loop))
+
+async def dispatch(command: str, *, deadline: Union[Deadline, float, None] = None,
+                   priority: Optional[str] = None) -> str:
+    """Process a command on the running event loop and return the reply.
+
+    Same pipeline as run_feature_async, but features that define a coroutine
+    twin ``<handler>_async`` (weather, the provider bridges, NLP web search)
+    are awaited natively; routing and sync handlers run on ``executor``.
+    ``deadline`` is a Deadline or an absolute ``time.monotonic()`` timestamp:
+    when it passes the request is cancelled and ``asyncio.TimeoutError`` is
+    raised. Cancelling the awaiting task cancels in-flight network I/O; a sync
+    handler already running in a worker thread sees the deadline cancelled and
+    stops at its next check (its HTTP timeouts are already capped by it).
+    ``priority`` is the scheduler class of the request's executor work.
+    """
+    dl = Deadline.coerce(deadline)
+    try:
+        with scheduler.priority_scope(priority or scheduler.current_priority()):
+            result = await asyncio.wait_for(_dispatch(command, dl), dl.remaining())
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        dl.cancel()
+        _count_request("timeouts")
+        raise asyncio.TimeoutError(f"request deadline exceeded: {command!r}") from None
+    except asyncio.CancelledError:
+        dl.cancel()
+        _count_request("cancelled")
+        raise
+    except Exception as e:
+        _count_request("errors")
+        return _error_reply(command, e)
+    _count_request("completed")
+    return result
+
+def run_feature(command: str, timeout: Optional[float] = 10.0,
+                deadline: Optional[Deadline] = None, priority: Optional[str] = None) -> str:
     """
     Synchronous version for backward compatibility.
+
+    Waits at most ``timeout`` seconds, bounded further by ``deadline`` (or the
+    deadline of the request this is called from, e.g. an automation step).
+    On timeout the request's deadline is cancelled so the worker releases its
+    thread instead of running on in the background.
     """
+    dl = resolve_deadline(deadline).child(timeout)
     result_event = threading.Event()
     result_container = [None]
     
@@ -841,20 +1154,151 @@ def run_feature(command: str) -> str:
         result_container[0] = result
         result_event.set()
     
-    run_feature_async(command, _callback)
-    result_event.wait(timeout=10.0)  # 10 second timeout
+    run_feature_async(command, _callback, deadline=dl, priority=priority)
+    if not result_event.wait(timeout=dl.remaining()):
+        dl.cancel()
     
-    return result_container[0] if result_container[0] is not None else "Timeout: Không thể xử lý yêu cầu"
+    return result_container[0] if result_container[0] is not None else TIMEOUT_REPLY
+
+# --- Bulk command API ---
+
+class BatchResult(NamedTuple):
+    command: str
+    result: str
+    feature: Optional[str]
+    status: str          # "ok", "error" or "timeout"
+    route_ms: float
+    run_ms: float
+    request_id: Optional[str] = None   # joins the item with its trace spans
+
+    @property
+    def total_ms(self) -> float:
+        return self.route_ms + self.run_ms
+
+def run_features_batch(commands: List[str], max_concurrency: int = 4,
+                       timeout: Optional[float] = 10.0, dedupe: bool = True,
+                       deadline: Optional[Deadline] = None,
+                       priority: str = scheduler.BATCH) -> List[BatchResult]:
+    """Run many commands at once and return one BatchResult per input, in order.
+
+    The batch is routed in a single pass on the calling thread (tokenization,
+    normalization and taught replies included), and the routed commands then
+    execute in up to ``max_concurrency`` lanes on the scheduler's ``priority``
+    class (batch by default), so a large replay or automation chain queues
+    behind interactive commands instead of delaying them. Commands routed to a
+    feature that declares ``batch_serial = True`` (reminders, tasks,
+    automation) keep their relative order and every occurrence runs; other
+    duplicate commands run once unless ``dedupe`` is False, and everything
+    else runs concurrently. Called from a scheduler worker, the jobs run
+    inline on that worker instead. Each command gets its own ``timeout``
+    second deadline, bounded by ``deadline`` (or the caller's).
+    """
+    parent = resolve_deadline(deadline)
+
+    # Route the whole batch in one pass; a repeated command reuses the first
+    # run unless it routed to a serial (stateful) feature, where every
+    # occurrence must run: "xem nhắc nhở" after "nhắc tôi ..." sees the new reminder
+    runs: List[str] = []
+    routes: List[Tuple[RequestContext, float]] = []
+    request_ids = []
+    slots: List[int] = []
+    first_run: Dict[str, int] = {}
+    for cmd in commands:
+        if dedupe and cmd in first_run:
+            slots.append(first_run[cmd])
+            continue
+        t0 = time.perf_counter()
+        ctx = RequestContext(cmd)
+        with request_scope(name="batch_route") as rid:
+            try:
+                _pipeline.route(ctx)
+            except Exception as e:
+                ctx.answer(_error_reply(cmd, e))
+        slots.append(len(runs))
+        if ctx.early or ctx.feature is None or not feature_registry.is_serial(ctx.feature.handler):
+            first_run[cmd] = len(runs)
+        runs.append(cmd)
+        routes.append((ctx, (time.perf_counter() - t0) * 1000.0))
+        request_ids.append(rid)
+
+    results: List[Optional[BatchResult]] = [None] * len(runs)
+
+    def _run_one(i: int) -> None:
+        cmd = runs[i]
+        ctx, route_ms = routes[i]
+        if ctx.early:
+            _count_request("completed")
+            results[i] = BatchResult(cmd, ctx.result, None, "ok", route_ms, 0.0, request_ids[i])
+            return
+        dl = parent.child(timeout)
+        ctx.deadline = dl
+        feature = ctx.feature
+        name = (feature.name or getattr(feature.handler, '__name__', None)) if feature is not None else None
+        t0 = time.perf_counter()
+        with deadline_scope(dl), request_scope(request_ids[i], name="batch_run"):
+            try:
+                result = _pipeline.execute(ctx)
+                status = "timeout" if dl.expired() else "ok"
+            except DeadlineExceeded:
+                result, status = TIMEOUT_REPLY, "timeout"
+            except Exception as e:
+                result, status = _error_reply(cmd, e), "error"
+        _count_request({"ok": "completed", "error": "errors", "timeout": "timeouts"}[status])
+        results[i] = BatchResult(cmd, result, name, status,
+                                 route_ms, (time.perf_counter() - t0) * 1000.0, request_ids[i])
+
+    def _run_group(indices: List[int]) -> None:
+        for i in indices:
+            _run_one(i)
+
+    # Serial features form one ordered job each; every other command is its own job
+    jobs: List[List[int]] = []
+    serial_jobs: Dict[str, List[int]] = {}
+    for i, (ctx, _) in enumerate(routes):
+        feature = ctx.feature
+        if not ctx.early and feature is not None and feature_registry.is_serial(feature.handler):
+            key = feature.name or getattr(feature.handler, '__name__', '')
+            if key not in serial_jobs:
+                serial_jobs[key] = []
+                jobs.append(serial_jobs[key])
+            serial_jobs[key].append(i)
+        else:
+            jobs.append([i])
+
+    # Each lane takes the next job until none are left
+    pending = iter(jobs)
+    pending_lock = threading.Lock()
+
+    def _lane() -> None:
+        while True:
+            with pending_lock:
+                job = next(pending, None)
+            if job is None:
+                return
+            _run_group(job)
+
+    lanes = max(1, min(int(max_concurrency), len(jobs)))
+    if scheduler.running_priority() is not None:
+        # Already on a scheduler worker (an interactive "tự động: ..." command, a
+        # chain inside a batch): blocking this slot on queued lanes can deadlock
+        # once every worker does the same, so run the jobs here, in order
+        _lane()
+    else:
+        futures = [executor.submit_as(priority, contextvars.copy_context().run, _lane)
+                   for _ in range(lanes)]
+        for fut in futures:
+            fut.result()
+
+    return [results[slot] for slot in slots]
 
 def initialize_assistant():
     """Initializes the assistant without blocking the UI thread.
 
     - Starts feature loading in a background thread.
-    - Runs precache of common commands in a separate daemon thread to avoid
-      heavy NLP imports (e.g., underthesea) from blocking the GUI startup.
+    - Warms the most used commands (warmup.py) as background work so their
+      routing and feature imports are ready before the user types them.
     """
     # Start loading features first (non-blocking)
     load_features_async()
 
-    # Run precache in background so any heavy imports don't block the UI
-    threading.Thread(target=_precache_common_commands, daemon=True).start()
+    executor.submit_as(scheduler.BACKGROUND, _run_warmup)
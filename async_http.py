@@ -0,0 +1,151 @@
+"""Minimal asyncio HTTP/1.1 client for the assistant's JSON APIs.
+
+Built on ``asyncio.open_connection`` so coroutine features (weather, provider
+bridges, web search) can await network I/O on the event loop without a worker
+thread and without extra dependencies. Only what those callers need is
+supported: one request per connection, identity or chunked bodies, JSON in
+and out.
+"""
+
+import asyncio
+import json
+import ssl
+import urllib.parse
+from typing import Any, Dict, Optional, Tuple
+
+from deadline import Deadline, DeadlineExceeded, resolve as resolve_deadline
+
+_ssl_context: Optional[ssl.SSLContext] = None
+
+
+def _get_ssl_context() -> ssl.SSLContext:
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+class HTTPError(Exception):
+    """Raised for malformed responses; carries the status code when known."""
+
+    def __init__(self, message: str, status: int = 0):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    parts = []
+    while True:
+        size_line = await reader.readline()
+        if not size_line:
+            raise HTTPError("connection closed inside chunked body")
+        size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            # Drain optional trailers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readline()
+
+
+async def _request(method: str, url: str, headers: Dict[str, str],
+                   body: Optional[bytes]) -> Tuple[int, bytes]:
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPError(f"unsupported url: {url}")
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port,
+        ssl=_get_ssl_context() if secure else None,
+        server_hostname=parts.hostname if secure else None,
+    )
+    try:
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: close",
+                 "Accept: application/json", "User-Agent: bot-assistant"]
+        for k, v in headers.items():
+            lines.append(f"{k}: {v}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8") + (body or b""))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise HTTPError(f"bad status line: {status_line!r}")
+        resp_headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            resp_headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in resp_headers.get("transfer-encoding", "").lower():
+            payload = await _read_chunked(reader)
+        elif "content-length" in resp_headers:
+            payload = await reader.readexactly(int(resp_headers["content-length"]))
+        else:
+            payload = await reader.read()
+        return status, payload
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+
+async def fetch_json(url: str, *, method: str = "GET", headers: Optional[Dict[str, str]] = None,
+                     payload: Optional[Dict[str, Any]] = None, timeout: float = 30.0,
+                     deadline: Optional[Deadline] = None) -> Tuple[int, Any]:
+    """Send one request and return ``(status, decoded JSON)``.
+
+    ``timeout`` is capped by the request deadline. Raises ``DeadlineExceeded``
+    when that deadline is what ran out, ``asyncio.TimeoutError`` after
+    ``timeout`` seconds otherwise, ``HTTPError`` for malformed responses and
+    ``ValueError`` when the body is not JSON. Cancelling the awaiting task
+    closes the connection.
+    """
+    dl = resolve_deadline(deadline)
+    timeout = dl.timeout(timeout)
+    hdrs = dict(headers or {})
+    body = None
+    if payload is not None:
+        body = json.dumps(payload).encode("utf-8")
+        hdrs.setdefault("Content-Type", "application/json")
+    try:
+        status, raw = await asyncio.wait_for(_request(method, url, hdrs, body), timeout)
+    except asyncio.TimeoutError:
+        dl.check()
+        raise
+    return status, json.loads(raw.decode("utf-8", errors="replace"))
+
+
+async def post_json(url: str, headers: Dict[str, str], payload: Dict[str, Any],
+                    timeout: float = 30.0, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Async counterpart of the bridges' ``_http_post``: errors come back as ``{"error": {...}}``.
+
+    An exhausted request deadline is raised (``DeadlineExceeded``), not folded
+    into the error payload, so callers can tell timeouts from API errors.
+    """
+    try:
+        status, data = await fetch_json(url, method="POST", headers=headers, payload=payload,
+                                        timeout=timeout, deadline=deadline)
+    except (asyncio.CancelledError, DeadlineExceeded):
+        raise
+    except asyncio.TimeoutError:
+        return {"error": {"message": f"timed out after {timeout}s"}}
+    except Exception as e:
+        return {"error": {"message": str(e)}}
+    if status >= 400 and not (isinstance(data, dict) and "error" in data):
+        return {"error": {"message": f"HTTP {status}"}}
+    return data
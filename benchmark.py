@@ -0,0 +1,473 @@
+"""Offline benchmark replaying recorded usage through the request pipeline.
+
+The corpus is built from ``assistant_data.json``: every command in
+``usage_patterns``, repeated by its (capped) weight, in a fixed shuffled
+order. It is replayed with no network and no side effects:
+
+- providers (ChatGPT/Gemini), Open-Meteo and the NLP web search are stubbed
+  with canned answers (optionally with a fixed latency)
+- reminders, tasks and AI usage records go to a temporary directory, and
+  nothing is launched (``os.startfile``)
+- the process tier is bypassed (its workers would not see the stubs)
+
+Two passes are measured:
+
+- latency: commands one at a time through the sync pipeline, giving
+  p50/p95/p99 per stage (``ctx.timings``), per feature and end to end
+- throughput: the whole corpus through :func:`assistant.dispatch` at several
+  concurrency levels (commands per second)
+
+By default the routing and response caches are bypassed (the routing cache
+is cleared before every request), so router and NLP changes show up; pass
+``--warm-caches`` to measure the cached path instead.
+
+Usage::
+
+    python benchmark.py --save-baseline     # record benchmark_baseline.json
+    python benchmark.py                     # exit code 1 on regression
+    python benchmark.py --intents           # NLP intent detectors: speed and accuracy
+
+A metric regresses when it is worse than the baseline by more than
+``--threshold`` (25% by default) and, for latencies, by more than
+``--min-delta`` ms, so sub-millisecond stages do not fail on noise. The
+baseline is machine-specific: record it on the machine that runs the check.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from unittest import mock
+
+from warmup import load_usage
+
+BASELINE_PATH = "benchmark_baseline.json"
+DEFAULT_LEVELS = (1, 2, 4, 8)
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 0.5
+
+# Labelled commands for --intents (accented, unaccented and mixed spellings)
+INTENT_SAMPLES: Tuple[Tuple[str, str], ...] = (
+    ("xin chào", "greeting"), ("hello", "greeting"), ("chao ban", "greeting"),
+    ("tạm biệt", "farewell"), ("bye", "farewell"),
+    ("cảm ơn bạn nhiều", "thanks"), ("cam on", "thanks"),
+    ("xin lỗi nhé", "apology"),
+    ("xem nhắc nhở", "list_reminder"), ("danh sách nhắc nhở", "list_reminder"),
+    ("xem nhac nho", "list_reminder"), ("kiểm tra lịch tuần này", "list_reminder"),
+    ("xóa nhắc nhở id 1756097951", "delete_reminder"), ("hủy lịch họp chiều nay", "delete_reminder"),
+    ("xoa nhac nho", "delete_reminder"),
+    ("nhắc tôi họp lúc 14h ngày mai", "reminder"), ("đặt báo thức lúc 6h sáng", "reminder"),
+    ("lên lịch họp nhóm thứ hai", "reminder"),
+    ("thủ đô của việt nam ở đâu", "question"), ("tại sao trời mưa", "question"),
+    ("i += 2 có nghĩa là gì trong lập trình", "question"), ("bao nhiêu ngày nữa đến tết", "question"),
+    ("python la gi", "question"), ("đâu là thủ đô của mỹ", "question"),
+    ("hãy mở trình duyệt", "command"), ("giúp tôi viết email", "command"),
+    ("tính 23 nhân 47", "command"), ("cài đặt chế độ tối", "command"),
+    ("ứng dụng của machine learning", "ai_enhancement"), ("tri tue nhan tao", "ai_enhancement"),
+)
+
+STUB_REPLY = "Câu trả lời mẫu (benchmark)."
+STUB_WEATHER = {"temp": 29.0, "humidity": 70, "code": 2}
+
+
+# --- corpus ---
+
+def load_corpus(data: Optional[Dict[str, Any]] = None, max_repeat: int = 5,
+                seed: int = 0) -> List[str]:
+    """Recorded commands, each repeated ceil(weight) times (at most ``max_repeat``)."""
+    data = load_usage() if data is None else data
+    corpus: List[str] = []
+    for cmd, weight in sorted((data.get("usage_patterns") or {}).items()):
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(cmd, str) and cmd.strip() and weight > 0:
+            corpus.extend([cmd] * max(1, min(max_repeat, math.ceil(weight))))
+    random.Random(seed).shuffle(corpus)
+    return corpus
+
+
+# --- stubbed environment ---
+
+class _StubProvider:
+    """Provider bridge answering every question with STUB_REPLY."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def ask_stub(self, command: str, **kwargs: Any) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return STUB_REPLY
+
+    async def ask_stub_async(self, command: str, **kwargs: Any) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return STUB_REPLY
+
+
+@contextmanager
+def sandbox(latency: float = 0.0, warm_caches: bool = False) -> Iterator[str]:
+    """Stub network access and redirect persistent state to a temporary directory."""
+    import assistant
+    import process_tier
+    import features.ai_enhancements as ai_enhancements
+    import features.chatgpt_bridge as chatgpt_bridge
+    import features.gemini_bridge as gemini_bridge
+    import features.memory as memory
+    import features.nlp_processor as nlp_processor
+    import features.provider_prefs as provider_prefs
+    import features.reminder as reminder
+    import features.voice as voice
+    import features.weather as weather
+    from taught_store import get_taught_store
+
+    provider = _StubProvider(latency)
+
+    def fetch_weather(lat, lon, deadline=None):
+        if latency:
+            time.sleep(latency)
+        return dict(STUB_WEATHER)
+
+    async def fetch_weather_async(lat, lon, deadline=None):
+        if latency:
+            await asyncio.sleep(latency)
+        return dict(STUB_WEATHER)
+
+    def search(self, query, deadline=None):
+        return provider.ask_stub(query)
+
+    async def search_async(self, query, deadline=None):
+        return await provider.ask_stub_async(query)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="assistant-bench-") as tmp, ExitStack() as stack:
+        patch = stack.enter_context
+        patch(mock.patch.object(assistant, "_configured_providers", lambda order: [("stub", provider)]))
+        patch(mock.patch.object(weather, "requests", True))  # "available": the fetch itself is stubbed
+        patch(mock.patch.object(weather, "_query_open_meteo", fetch_weather))
+        patch(mock.patch.object(weather, "_query_open_meteo_async", fetch_weather_async))
+        patch(mock.patch.dict(weather._weather_cache, clear=True))
+        patch(mock.patch.object(nlp_processor.EnhancedNLPProcessor, "_search_for_information", search))
+        patch(mock.patch.object(nlp_processor.EnhancedNLPProcessor, "_search_for_information_async",
+                                search_async))
+        # Usage learning still computes suggestions but records nothing
+        patch(mock.patch.object(ai_enhancements.AIAssistant, "record_command", lambda self, *a, **k: None))
+        # Conversation turns go to a throwaway memory, not user_data['conversations']
+        patch(mock.patch.object(memory, "_memory_singleton", memory.ConversationMemory(persist=False)))
+        # Learned intent patterns are frozen so every pass scores the same, and never saved
+        learned = nlp_processor.get_nlp_processor().learned_patterns
+        patch(mock.patch.object(learned, "path", None))
+        patch(learned.suspended())
+        patch(mock.patch.object(reminder, "REMINDER_FILE", os.path.join(tmp, "reminder_data.json")))
+        patch(mock.patch.object(reminder, "_reminder_manager", None))
+        # Taught replies and assistant_config.json writers (provider, voice, API keys);
+        # the config is copied so the replay still reads the user's settings
+        taught_path = os.path.join(tmp, "taught.json")
+        patch(mock.patch.object(assistant, "_TAUGHT_PATH", taught_path))
+        config_path = os.path.join(tmp, "assistant_config.json")
+        if os.path.exists(provider_prefs._config_path()):
+            shutil.copyfile(provider_prefs._config_path(), config_path)
+        for module in (provider_prefs, voice, chatgpt_bridge, gemini_bridge):
+            patch(mock.patch.object(module, "_config_path", lambda: config_path))
+        patch(mock.patch.object(os, "startfile", lambda *a, **k: None, create=True))
+        # Worker processes would not see these stubs
+        patch(mock.patch.object(process_tier, "enabled", lambda: False))
+        if not warm_caches:
+            patch(mock.patch.object(assistant, "RESPONSE_CACHE_SIZE", 0))
+        os.chdir(tmp)  # relative data files (tasks.json, ...)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+            get_taught_store(taught_path).flush()  # before the directory goes away
+
+
+# --- measurement ---
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """count and p50/p95/p99/max of ``values`` (ms)."""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))]
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": ordered[-1]}
+
+
+def _feature_label(ctx: Any) -> str:
+    if ctx.feature is None:
+        return "(fallback)" if not ctx.early else "(taught)"
+    return ctx.feature.name or getattr(ctx.feature.handler, "__name__", "(builtin)")
+
+
+def measure_latency(corpus: Sequence[str], repeat: int = 3, warm_caches: bool = False,
+                    timeout: float = 10.0) -> Dict[str, Any]:
+    """Run the corpus ``repeat`` times, one command at a time; percentiles in ms."""
+    import assistant
+    from deadline import Deadline, deadline_scope
+    from pipeline import RequestContext
+    from tracing import request_scope
+
+    pipeline = assistant.get_pipeline()
+    stages: Dict[str, List[float]] = {}
+    by_feature: Dict[str, List[float]] = {}
+    total: List[float] = []
+    errors = 0
+    for _ in range(repeat):
+        for cmd in corpus:
+            if not warm_caches:
+                assistant.clear_routing_cache()
+            dl = Deadline.after(timeout)
+            ctx = RequestContext(cmd, dl)
+            started = time.perf_counter()
+            try:
+                with deadline_scope(dl), request_scope():
+                    pipeline.run(ctx)
+            except Exception:
+                errors += 1
+            elapsed = (time.perf_counter() - started) * 1000.0
+            total.append(elapsed)
+            by_feature.setdefault(_feature_label(ctx), []).append(elapsed)
+            for name, ms in ctx.timings.items():
+                stages.setdefault(name, []).append(ms)
+    return {
+        "requests": len(total),
+        "errors": errors,
+        "total": percentiles(total),
+        "stages": {name: percentiles(v) for name, v in sorted(stages.items())},
+        "features": {name: percentiles(v) for name, v in sorted(by_feature.items())},
+    }
+
+
+def measure_throughput(corpus: Sequence[str], levels: Sequence[int] = DEFAULT_LEVELS,
+                       warm_caches: bool = False, timeout: float = 10.0) -> Dict[str, Dict[str, float]]:
+    """Commands per second through ``assistant.dispatch`` at each concurrency level."""
+    import assistant
+
+    async def replay(concurrency: int) -> Tuple[float, int]:
+        slots = asyncio.Semaphore(concurrency)
+        failures = 0
+
+        async def one(cmd: str) -> None:
+            nonlocal failures
+            async with slots:
+                if not warm_caches:
+                    assistant.clear_routing_cache()
+                try:
+                    await assistant.dispatch(cmd, deadline=timeout + time.monotonic())
+                except asyncio.TimeoutError:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(cmd) for cmd in corpus))
+        return time.perf_counter() - started, failures
+
+    out: Dict[str, Dict[str, float]] = {}
+    for level in levels:
+        elapsed, failures = asyncio.run(replay(level))
+        out[str(level)] = {
+            "commands": len(corpus),
+            "seconds": elapsed,
+            "per_second": len(corpus) / elapsed if elapsed > 0 else 0.0,
+            "timeouts": failures,
+        }
+    return out
+
+
+def run_benchmark(corpus: Optional[Sequence[str]] = None, repeat: int = 3,
+                  levels: Sequence[int] = DEFAULT_LEVELS, latency: float = 0.0,
+                  warm_caches: bool = False) -> Dict[str, Any]:
+    """Initialize the assistant, then run both passes inside :func:`sandbox`."""
+    import assistant
+    corpus = list(load_corpus() if corpus is None else corpus)
+    assistant.initialize_assistant()
+    assistant.features_loaded.wait(timeout=10.0)
+    with sandbox(latency, warm_caches):
+        # One untimed pass imports every routed feature module
+        measure_latency(corpus, repeat=1, warm_caches=True)
+        report = {
+            "corpus": len(corpus),
+            "repeat": repeat,
+            "warm_caches": warm_caches,
+            "latency": measure_latency(corpus, repeat, warm_caches),
+            "throughput": measure_throughput(corpus, levels, warm_caches),
+        }
+    return report
+
+
+def measure_intents(samples: Sequence[Tuple[str, str]] = INTENT_SAMPLES,
+                    rounds: int = 200) -> Dict[str, Dict[str, float]]:
+    """Accuracy (top intent == label) and µs per call of each NLP intent detector.
+
+    - ``compiled``: the compiled intent engine (detect_enhanced_intent)
+    - ``fallback``: the keyword heuristics used when the engine was unreachable
+    - ``combined``: _detect_intent_robust, what analysis actually uses
+    """
+    from features.nlp_processor import EnhancedNLPProcessor
+    proc = EnhancedNLPProcessor()  # fresh: no learned patterns
+    detectors = {
+        "compiled": proc.detect_enhanced_intent,
+        "fallback": proc._heuristic_intent,
+        "combined": proc._detect_intent_robust,
+    }
+    texts = [proc._enhance_command(text) for text, _ in samples]
+    out: Dict[str, Dict[str, float]] = {}
+    for name, detect in detectors.items():
+        correct = 0
+        for text, (_, label) in zip(texts, samples):
+            scores = detect(text)
+            top = max(scores.items(), key=lambda kv: kv[1])[0] if scores else "unknown"
+            correct += top == label
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                detect(text)
+        elapsed = time.perf_counter() - started
+        out[name] = {
+            "accuracy": correct / len(samples) if samples else 0.0,
+            "us_per_call": elapsed / (rounds * len(texts)) * 1e6 if texts else 0.0,
+        }
+    return out
+
+
+def format_intents(results: Dict[str, Dict[str, float]], samples: int) -> str:
+    lines = [f"Intent detectors ({samples} labelled commands):"]
+    for name, stats in results.items():
+        lines.append(f"  {name:<10} accuracy={stats['accuracy']:6.1%}  {stats['us_per_call']:8.1f} µs/call")
+    return "\n".join(lines)
+
+
+# --- baseline ---
+
+def _latency_metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    lat = report.get("latency", {})
+    metrics = {f"total.{q}": lat.get("total", {}).get(q, 0.0) for q in ("p50", "p95", "p99")}
+    for group in ("stages", "features"):
+        for name, pct in lat.get(group, {}).items():
+            metrics[f"{group}.{name}.p95"] = pct.get("p95", 0.0)
+    return metrics
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD,
+            min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> List[str]:
+    """Human-readable regressions of ``report`` against ``baseline`` (empty list = pass)."""
+    problems: List[str] = []
+    current = _latency_metrics(report)
+    for name, old in sorted(_latency_metrics(baseline).items()):
+        new = current.get(name)
+        if new is None:
+            continue
+        if new > old * (1.0 + threshold) and new - old > min_delta_ms:
+            problems.append(f"{name}: {old:.2f} ms -> {new:.2f} ms")
+    old_tp = baseline.get("throughput", {})
+    for level, stats in sorted(report.get("throughput", {}).items(), key=lambda kv: int(kv[0])):
+        old = old_tp.get(level, {}).get("per_second")
+        new = stats.get("per_second", 0.0)
+        if old and new < old * (1.0 - threshold):
+            problems.append(f"throughput@{level}: {old:.1f}/s -> {new:.1f}/s")
+    return problems
+
+
+def read_baseline(path: str = BASELINE_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lat = report["latency"]
+    lines = [f"Corpus: {report['corpus']} commands x {report['repeat']} "
+             f"({lat['requests']} requests, {lat['errors']} errors, "
+             f"caches {'warm' if report['warm_caches'] else 'bypassed'})"]
+
+    def row(name: str, pct: Dict[str, float]) -> str:
+        return (f"  {name:<22} n={pct['count']:<5} p50={pct['p50']:8.2f}  p95={pct['p95']:8.2f}"
+                f"  p99={pct['p99']:8.2f}  max={pct['max']:8.2f}")
+
+    lines.append(row("total", lat["total"]))
+    lines.append("Stages (ms):")
+    lines.extend(row(name, pct) for name, pct in lat["stages"].items())
+    lines.append("Features (ms, end to end):")
+    lines.extend(row(name, pct) for name, pct in lat["features"].items())
+    lines.append("Throughput:")
+    for level, stats in report["throughput"].items():
+        lines.append(f"  concurrency {level:>3}: {stats['per_second']:8.1f} commands/s"
+                     f" ({stats['seconds']:.2f}s, {stats['timeouts']} timeouts)")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline assistant benchmark (recorded usage, stubbed I/O)")
+    parser.add_argument("--repeat", type=int, default=3, help="latency passes over the corpus")
+    parser.add_argument("--levels", default=",".join(map(str, DEFAULT_LEVELS)),
+                        help="comma-separated concurrency levels for the throughput pass")
+    parser.add_argument("--max-repeat", type=int, default=5, help="cap on copies of one recorded command")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency of stubbed I/O")
+    parser.add_argument("--warm-caches", action="store_true", help="keep routing and response caches on")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_MS)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    parser.add_argument("--intents", action="store_true", help="only compare the NLP intent detectors")
+    args = parser.parse_args(argv)
+
+    if args.intents:
+        print(format_intents(measure_intents(), len(INTENT_SAMPLES)))
+        return 0
+
+    baseline_path = os.path.abspath(args.baseline)
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    report = run_benchmark(load_corpus(max_repeat=args.max_repeat), args.repeat, levels,
+                           args.latency_ms / 1000.0, args.warm_caches)
+    print(format_report(report))
+    if json_path:
+        write_report(report, json_path)
+    if args.save_baseline:
+        write_report(report, baseline_path)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    baseline = read_baseline(baseline_path)
+    if baseline is None:
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+        return 0
+    if baseline.get("warm_caches") != report["warm_caches"]:
+        print("Baseline was recorded with different cache settings; not comparing.")
+        return 0
+    problems = compare(report, baseline, args.threshold, args.min_delta)
+    if problems:
+        print(f"Regressions (> {args.threshold:.0%} worse than baseline):")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
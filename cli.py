@@ -1,5 +1,7 @@
 import sys
-import assistant
+
+# The assistant is imported where it is used so that --send (thin client,
+# see daemon_client.py) starts with the stdlib only.
 
 
 def safe_print(text: str):
@@ -13,7 +15,99 @@ def safe_print(text: str):
             sys.stdout.write(text.encode("utf-8", errors="replace").decode(enc, errors="replace") + "\n")
 
 
+def run_batch(path: str, max_concurrency: int = 4) -> int:
+    """Run every non-empty line of a file ('-' for stdin) as one batch and print timings."""
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        commands = [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    import assistant
+    assistant.initialize_assistant()
+    assistant.features_loaded.wait(timeout=10.0)
+    results = assistant.run_features_batch(commands, max_concurrency=max_concurrency)
+    for item in results:
+        safe_print(f"[{item.status} {item.total_ms:.1f}ms] {item.command} -> {item.result}")
+    return 0
+
+
+def export_trace(path: str) -> None:
+    """Dump recorded pipeline spans: Chrome trace JSON, or JSONL for *.jsonl paths."""
+    import tracing
+    if path.endswith(".jsonl"):
+        n = tracing.export_jsonl(path)
+    else:
+        n = tracing.export_chrome_trace(path)
+    safe_print(f"Wrote {n} spans to {path}")
+    for stage, st in sorted(tracing.summarize().items(), key=lambda kv: -kv[1]["p95"]):
+        safe_print(f"  {stage:12s} n={int(st['count']):5d} p50={st['p50']:.2f}ms p95={st['p95']:.2f}ms p99={st['p99']:.2f}ms")
+
+
+def send(commands, path=None) -> int:
+    """Thin client: run commands on the resident daemon, printing each result as it arrives.
+
+    Falls back to an in-process run (cold start) only when no daemon is
+    listening; any later error is reported instead, so no command runs twice.
+    """
+    import daemon_client
+    # Results stream back as they finish; print them in input order
+    ready = {}
+    next_index = 0
+    try:
+        for event in daemon_client.send_commands(commands, path):
+            ready[event.get("index")] = event.get("result")
+            while next_index in ready:
+                safe_print(str(ready.pop(next_index)))
+                next_index += 1
+    except (FileNotFoundError, ConnectionRefusedError):
+        # Raised by connect(): nothing was sent to a daemon
+        sys.stderr.write("No assistant daemon running (start one with --daemon); running locally.\n")
+    except (OSError, RuntimeError, ValueError) as e:
+        # Timeout or broken stream after the request was sent: the daemon may have run the commands
+        sys.stderr.write(f"Assistant daemon error after {next_index} of {len(commands)} results: {e}\n")
+        return 1
+    else:
+        if next_index < len(commands):
+            sys.stderr.write(f"Assistant daemon closed the connection after {next_index} of {len(commands)} results.\n")
+            return 1
+        return 0
+    import assistant
+    assistant.initialize_assistant()
+    assistant.features_loaded.wait(timeout=10.0)
+    for cmd in commands:
+        safe_print(str(assistant.run_feature(cmd)))
+    return 0
+
+
 def main():
+    args = sys.argv[1:]
+    trace_path = None
+    if "--trace" in args:
+        i = args.index("--trace")
+        trace_path = args[i + 1] if i + 1 < len(args) else "assistant_trace.json"
+        del args[i:i + 2]
+    try:
+        if len(args) >= 2 and args[0] == "--batch":
+            concurrency = int(args[2]) if len(args) > 2 else 4
+            return run_batch(args[1], concurrency)
+        if args and args[0] == "--daemon":
+            import daemon
+            return daemon.serve(args[1] if len(args) > 1 else None)
+        if len(args) >= 2 and args[0] == "--send":
+            # --send "cmd" ["cmd" ...]; "-" reads one command per line from stdin
+            commands = args[1:]
+            if commands == ["-"]:
+                commands = [line.strip() for line in sys.stdin if line.strip()]
+            return send(commands)
+        return repl()
+    finally:
+        if trace_path:
+            export_trace(trace_path)
+
+
+def repl():
+    import assistant
     safe_print("Assistant CLI: gõ 'exit' để thoát.")
     assistant.initialize_assistant()
     try:
@@ -0,0 +1,239 @@
+"""Resident assistant daemon serving requests over a Unix domain socket.
+
+The daemon initializes and warms the assistant once, then serves requests
+from any number of concurrent connections, so a shell call costs a socket
+round trip instead of a cold start::
+
+    python cli.py --daemon            # serve (foreground)
+    python cli.py --send "mấy giờ rồi"  # thin client
+
+Protocol: newline-delimited JSON (UTF-8) in both directions. A connection may
+send several requests; they run concurrently and their events interleave,
+tagged with the request ``id``.
+
+Requests::
+
+    {"id": 1, "command": "mấy giờ rồi", "timeout": 10}
+    {"id": 2, "commands": ["thời tiết", "tính 2 + 3"]}
+    {"id": 3, "op": "ping" | "stats"}
+
+Responses are streamed, one event per line. Each command gets a ``result``
+event as soon as it finishes (batches complete out of order; ``index``
+gives the position), then a final ``done``. As in ``run_features_batch``,
+commands routed to a ``batch_serial`` feature (reminders, tasks) run one
+after another in request order::
+
+    {"id": 2, "event": "result", "index": 1, "command": "tính 2 + 3",
+     "status": "ok", "result": "...", "ms": 1.8}
+    {"id": 2, "event": "done", "count": 2, "ms": 120.4}
+
+Malformed requests get ``{"event": "error", "error": "..."}``. The client
+lives in daemon_client.py (stdlib only, cheap to start); the assistant is
+imported by :func:`serve`.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from daemon_client import (DEFAULT_TIMEOUT, MAX_LINE, default_socket_path, encode_event,
+                           ensure_private_dir, ping, private_dir)
+
+
+class AssistantDaemon:
+    """Serve assistant requests on a Unix socket with the asyncio dispatch path."""
+
+    def __init__(self, path: Optional[str] = None, max_concurrency: int = 8):
+        self.path = path or default_socket_path()
+        self.max_concurrency = max_concurrency
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._stats = {"connections": 0, "requests": 0, "commands": 0, "errors": 0}
+
+    async def start(self) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("the assistant daemon needs Unix domain sockets")
+        if os.path.dirname(os.path.abspath(self.path)) == private_dir():
+            ensure_private_dir(private_dir())  # the temp dir itself is world-writable
+        self._claim_path()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Local user only, from the moment the socket is bound
+        umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle_connection, self.path, limit=MAX_LINE)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+
+    def _claim_path(self) -> None:
+        # A leftover socket file from a crashed daemon is removed; a live one is not
+        if not os.path.exists(self.path):
+            return
+        if ping(self.path, timeout=0.5):
+            raise RuntimeError(f"an assistant daemon is already listening on {self.path}")
+        os.unlink(self.path)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        import assistant
+        return {**self._stats, "requests_by_outcome": assistant.get_request_stats(),
+                "scheduler": assistant.get_scheduler_stats(), "warmup": assistant.get_warmup_stats(),
+                "response_cache": assistant.get_response_cache_stats()}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._stats["connections"] += 1
+        write_lock = asyncio.Lock()
+        tasks: List[asyncio.Task] = []
+
+        async def send(event: Dict[str, Any]) -> None:
+            async with write_lock:
+                writer.write(encode_event(event))
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await send({"event": "error", "error": "request line too long"})
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    tasks.append(asyncio.ensure_future(self._handle_line(line, send)))
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()  # client went away: stop its in-flight commands
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_line(self, line: bytes, send) -> None:
+        try:
+            req = json.loads(line.decode("utf-8"))
+            if not isinstance(req, dict):
+                raise ValueError("request must be a JSON object")
+        except (ValueError, UnicodeDecodeError) as e:
+            self._stats["errors"] += 1
+            await send({"event": "error", "error": f"invalid request: {e}"})
+            return
+        self._stats["requests"] += 1
+        rid = req.get("id")
+        op = req.get("op")
+        if op == "ping":
+            await send({"id": rid, "event": "pong", "pid": os.getpid()})
+            return
+        if op == "stats":
+            await send({"id": rid, "event": "stats", "stats": self.stats()})
+            return
+        if op is not None:
+            await send({"id": rid, "event": "error", "error": f"unknown op {op!r}"})
+            return
+        commands = req.get("commands")
+        if commands is None and isinstance(req.get("command"), str):
+            commands = [req["command"]]
+        if not isinstance(commands, list) or not all(isinstance(c, str) for c in commands):
+            self._stats["errors"] += 1
+            await send({"id": rid, "event": "error", "error": "expected 'command' or 'commands'"})
+            return
+        try:
+            timeout = float(req.get("timeout", DEFAULT_TIMEOUT))
+        except (TypeError, ValueError):
+            timeout = DEFAULT_TIMEOUT
+        started = time.perf_counter()
+        chains = await self._plan_chains(commands)
+        await asyncio.gather(*(self._run_chain(rid, chain, commands, timeout, send) for chain in chains))
+        await send({"id": rid, "event": "done", "count": len(commands),
+                    "ms": (time.perf_counter() - started) * 1000.0})
+
+    async def _plan_chains(self, commands: List[str]) -> List[List[int]]:
+        """Command indices grouped like run_features_batch: one ordered chain per serial feature."""
+        import assistant
+        if len(commands) < 2:
+            return [[i] for i in range(len(commands))]
+        loop = asyncio.get_running_loop()
+        keys = await loop.run_in_executor(assistant.executor, lambda: [assistant.serial_feature(c) for c in commands])
+        chains: List[List[int]] = []
+        serial: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            if key is None:
+                chains.append([i])
+            elif key in serial:
+                serial[key].append(i)
+            else:
+                serial[key] = [i]
+                chains.append(serial[key])
+        return chains
+
+    async def _run_chain(self, rid: Any, chain: List[int], commands: List[str], timeout: float, send) -> None:
+        for index in chain:
+            await self._run_command(rid, index, commands[index], timeout, send)
+
+    async def _run_command(self, rid: Any, index: int, command: str, timeout: float, send) -> None:
+        import assistant
+        from deadline import Deadline
+        async with self._slots:
+            started = time.perf_counter()
+            try:
+                result, status = await assistant.dispatch(command, deadline=Deadline.after(timeout)), "ok"
+            except asyncio.TimeoutError:
+                result, status = assistant.TIMEOUT_REPLY, "timeout"
+            except Exception as e:
+                result, status = f"Có lỗi xảy ra: {e}", "error"
+        self._stats["commands"] += 1
+        await send({"id": rid, "event": "result", "index": index, "command": command, "status": status,
+                    "result": str(result), "ms": (time.perf_counter() - started) * 1000.0})
+
+
+def serve(path: Optional[str] = None, max_concurrency: int = 8) -> int:
+    """Initialize and warm the assistant, then serve until interrupted."""
+    import assistant
+    from applog import get_logger
+    log = get_logger("daemon")
+    assistant.initialize_assistant()
+    assistant.features_loaded.wait(timeout=10.0)
+    daemon = AssistantDaemon(path, max_concurrency)
+
+    async def _main() -> None:
+        await daemon.start()
+        log.info("Assistant daemon listening on %s", daemon.path)
+        await daemon.serve_forever()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(serve(sys.argv[1] if len(sys.argv) > 1 else None))
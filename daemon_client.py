@@ -0,0 +1,115 @@
+"""Thin client for the resident assistant daemon (daemon.py).
+
+Stdlib only and no assistant import, so a shell call costs interpreter start
+plus one socket round trip. See daemon.py for the protocol.
+"""
+
+import json
+import os
+import socket
+import stat
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional
+
+SOCKET_ENV = "ASSISTANT_SOCKET"
+MAX_LINE = 1 << 20  # bytes per request line
+DEFAULT_TIMEOUT = 10.0
+
+
+def _uid() -> Optional[int]:
+    return os.getuid() if hasattr(os, "getuid") else None
+
+
+def private_dir() -> str:
+    """Per-user 0700 directory under the temp dir, used without ``$XDG_RUNTIME_DIR``."""
+    return os.path.join(tempfile.gettempdir(), f"assistant-{_uid() or 0}")
+
+
+def default_socket_path() -> str:
+    """``$ASSISTANT_SOCKET``, else a socket in ``$XDG_RUNTIME_DIR`` or :func:`private_dir`."""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        return os.path.join(base, f"assistant-{_uid() or 0}.sock")
+    return os.path.join(private_dir(), "assistant.sock")
+
+
+def ensure_private_dir(path: str) -> None:
+    """Create ``path`` with mode 0700, or refuse one another user could control."""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    uid = _uid()
+    if not stat.S_ISDIR(st.st_mode) or (uid is not None and st.st_uid != uid) or st.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by the current user with mode 0700")
+
+
+def check_owner(path: str) -> None:
+    """Raise PermissionError when the socket at ``path`` belongs to another user."""
+    uid = _uid()
+    if uid is not None and os.stat(path).st_uid != uid:
+        raise PermissionError(f"{path} belongs to another user; not connecting")
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _connect(path: str, timeout: Optional[float]) -> socket.socket:
+    check_owner(path)  # FileNotFoundError when no daemon ever listened here
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def request(req: Dict[str, Any], path: Optional[str] = None,
+            timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Send one request and yield its events as they arrive, ending after ``done``.
+
+    Raises OSError when no daemon is listening, PermissionError when the
+    socket belongs to another user.
+    """
+    path = path or default_socket_path()
+    if timeout is None:
+        timeout = float(req.get("timeout", DEFAULT_TIMEOUT)) + 5.0
+    with _connect(path, timeout) as sock:
+        sock.sendall(encode_event(req))
+        buf = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                event = json.loads(line.decode("utf-8"))
+                yield event
+                if event.get("event") in ("done", "pong", "stats", "error"):
+                    return
+
+
+def ping(path: Optional[str] = None, timeout: float = 1.0) -> bool:
+    """True when a daemon answers on ``path``."""
+    try:
+        return any(e.get("event") == "pong" for e in request({"op": "ping"}, path, timeout))
+    except (OSError, ValueError):
+        return False
+
+
+def send_commands(commands: List[str], path: Optional[str] = None,
+                  timeout: float = DEFAULT_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """Stream ``result`` events for ``commands`` from the daemon."""
+    for event in request({"id": 1, "commands": commands, "timeout": timeout}, path):
+        if event.get("event") == "error":
+            raise RuntimeError(event.get("error"))
+        if event.get("event") == "result":
+            yield event
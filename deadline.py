@@ -0,0 +1,123 @@
+"""Per-request deadlines.
+
+A :class:`Deadline` is created once per request (``run_feature``,
+``run_feature_async(..., deadline=...)``, ``dispatch``) and handed down to
+feature handlers, the provider bridges' HTTP helpers, the NLP search layer
+and the automation runner. Code that cannot take it as an argument reads the
+request's deadline from :func:`current_deadline`, which is set for the
+duration of the request (also inside executor threads the request hops to).
+
+Blocking calls cap their own timeouts with :meth:`Deadline.timeout`, so a
+slow provider releases its worker thread when the request's budget runs out
+instead of holding it for its full 30 s timeout.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Union
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's deadline has passed (or it was cancelled)."""
+
+
+class Deadline:
+    """Absolute expiry on the monotonic clock; ``Deadline()`` never expires."""
+
+    __slots__ = ("expires_at", "_cancelled", "_clock", "_parent")
+
+    def __init__(self, expires_at: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 parent: Optional["Deadline"] = None) -> None:
+        self.expires_at = expires_at
+        self._cancelled = False
+        self._clock = clock
+        self._parent = parent
+
+    @classmethod
+    def after(cls, seconds: Optional[float], clock: Callable[[], float] = time.monotonic) -> "Deadline":
+        return cls(None if seconds is None else clock() + seconds, clock)
+
+    @classmethod
+    def coerce(cls, value: Union["Deadline", float, None]) -> "Deadline":
+        """Accept a Deadline, an absolute ``time.monotonic()`` timestamp or None."""
+        if isinstance(value, Deadline):
+            return value
+        return cls(value)
+
+    def child(self, seconds: Optional[float]) -> "Deadline":
+        """Sub-deadline for one step: at most ``seconds``, never past this one.
+
+        Cancelling the parent also expires the child; cancelling the child
+        leaves the parent running.
+        """
+        expires_at = None if seconds is None else self._clock() + seconds
+        return Deadline(expires_at, self._clock, parent=self)
+
+    def cancel(self) -> None:
+        """Abandon the request: every later check fails immediately."""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self._parent is not None and self._parent.cancelled)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None when unbounded."""
+        if self._cancelled:
+            return 0.0
+        left = None if self.expires_at is None else max(0.0, self.expires_at - self._clock())
+        if self._parent is not None:
+            parent_left = self._parent.remaining()
+            if parent_left is not None:
+                left = parent_left if left is None else min(left, parent_left)
+        return left
+
+    def expired(self) -> bool:
+        left = self.remaining()
+        return left is not None and left <= 0.0
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded("request cancelled" if self.cancelled else "request deadline exceeded")
+
+    def timeout(self, default: Optional[float] = None) -> Optional[float]:
+        """Timeout for the next blocking call: ``default`` capped by the time left.
+
+        Raises DeadlineExceeded when nothing is left, so callers never start
+        work they would have to abandon.
+        """
+        self.check()
+        left = self.remaining()
+        if left is None:
+            return default
+        return left if default is None else min(default, left)
+
+    def __repr__(self) -> str:
+        left = self.remaining()
+        return "<Deadline unbounded>" if left is None else f"<Deadline {left:.3f}s left>"
+
+
+_UNBOUNDED = Deadline()
+_current: contextvars.ContextVar = contextvars.ContextVar("assistant_deadline", default=_UNBOUNDED)
+
+
+def current_deadline() -> Deadline:
+    """Deadline of the request being processed (unbounded outside a request)."""
+    return _current.get()
+
+
+def resolve(deadline: Optional[Deadline]) -> Deadline:
+    """An explicit deadline argument wins over the ambient one."""
+    return deadline if deadline is not None else _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    """Make ``deadline`` the current one for the enclosed block (thread/task local)."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
@@ -0,0 +1,344 @@
+"""Manifest-driven feature registry.
+
+``features/manifest.json`` records, for every module in ``features/``, the
+handler name, router keywords/patterns, declared import cost, load
+priority and response-cache policy. The assistant registers features straight from the manifest and
+only imports a module the first time its handler is dispatched (or when the
+background warmer reaches it), so routing is available before any feature
+module is imported.
+
+Regenerate the manifest after editing feature metadata::
+
+    python feature_registry.py
+
+At startup, modules whose source hash no longer matches the manifest are
+imported eagerly (the old behaviour) and their entries are refreshed.
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from applog import get_logger
+from response_cache import CachePolicy, parse_policy, policy_to_manifest
+
+log = get_logger("feature_registry")
+
+FEATURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "features")
+MANIFEST_PATH = os.path.join(FEATURES_DIR, "manifest.json")
+
+# Load priority: 0 essential, 1 important, 2 supplementary, 3 everything else
+ESSENTIAL_FEATURES = ["calculator.py", "system_info.py"]
+IMPORTANT_FEATURES = ["weather.py", "reminder.py", "nlp_processor.py", "chitchat.py", "app_launcher.py"]
+SUPPLEMENTARY_FEATURES = ["ai_enhancements.py", "work_assistant.py", "gemini_bridge.py"]
+
+# Import cost a module may declare via a module-level ``import_cost``
+COST_LEVELS = ("light", "medium", "heavy")
+
+
+# Bumped whenever the registry (or anything routing depends on) changes;
+# routing caches key on it instead of on the number of features.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def registry_generation() -> int:
+    return _generation
+
+
+def bump_generation() -> int:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _generation
+
+
+def feature_priority(filename: str) -> int:
+    if filename in ESSENTIAL_FEATURES:
+        return 0
+    if filename in IMPORTANT_FEATURES:
+        return 1
+    if filename in SUPPLEMENTARY_FEATURES:
+        return 2
+    return 3
+
+
+def find_handler(module: Any, module_name: str) -> Optional[Callable]:
+    """Return the module's entry point using the router's naming convention."""
+    # Prefer explicit module-level handler names first, then getters
+    for func_name in (module_name, "main", "handle", f"get_{module_name}"):
+        func = getattr(module, func_name, None)
+        if callable(func):
+            return func
+    return None
+
+
+def find_async_handler(module: Any, handler_name: str) -> Optional[Callable]:
+    """Return the coroutine twin ``<handler>_async`` of a handler, if the module defines one."""
+    func = getattr(module, f"{handler_name}_async", None)
+    return func if inspect.iscoroutinefunction(func) else None
+
+
+def async_variant(handler: Callable) -> Optional[Callable]:
+    """Coroutine version of a registered handler (LazyFeature or plain function), or None."""
+    if isinstance(handler, LazyFeature):
+        return handler.resolve_async()
+    module = sys.modules.get(getattr(handler, "__module__", None) or "")
+    name = getattr(handler, "__name__", None)
+    if module is None or not name:
+        return None
+    return find_async_handler(module, name)
+
+
+def skipped_stages(handler: Callable) -> FrozenSet[str]:
+    """Pipeline stages the feature opts out of (``pipeline_skip = ("enhance",)``)."""
+    if isinstance(handler, LazyFeature):
+        return handler.skip
+    module = sys.modules.get(getattr(handler, "__module__", None) or "")
+    return frozenset(getattr(module, "pipeline_skip", ()) or ())
+
+
+def is_serial(handler: Callable) -> bool:
+    """True when the feature declares ``batch_serial = True`` (order-sensitive state)."""
+    if isinstance(handler, LazyFeature):
+        return handler.serial
+    module = sys.modules.get(getattr(handler, "__module__", None) or "")
+    return bool(getattr(module, "batch_serial", False))
+
+
+def is_cpu_bound(handler: Callable) -> bool:
+    """True when the feature declares ``cpu_bound = True`` (eligible for the process tier)."""
+    if isinstance(handler, LazyFeature):
+        return handler.cpu_bound
+    module = sys.modules.get(getattr(handler, "__module__", None) or "")
+    return bool(getattr(module, "cpu_bound", False))
+
+
+def cache_policy(handler: Callable) -> Optional[CachePolicy]:
+    """Response-cache policy the feature declares (``response_cache = {"ttl": ...}``), if any."""
+    if isinstance(handler, LazyFeature):
+        return handler.cache
+    module = sys.modules.get(getattr(handler, "__module__", None) or "")
+    return parse_policy(getattr(module, "response_cache", None))
+
+
+def handler_location(handler: Callable) -> Optional[Tuple[str, str]]:
+    """``(feature module name, handler name)`` for a handler in the features package."""
+    if isinstance(handler, LazyFeature):
+        return handler.name, handler.handler_name
+    module = getattr(handler, "__module__", None) or ""
+    name = getattr(handler, "__name__", None)
+    if not module.startswith("features.") or not name:
+        return None
+    return module[len("features."):], name
+
+
+_param_cache: Dict[Any, frozenset] = {}
+
+
+def _handler_params(handler: Callable) -> frozenset:
+    func = handler.resolve() if isinstance(handler, LazyFeature) else handler
+    try:
+        return _param_cache[func]
+    except (KeyError, TypeError):
+        pass
+    try:
+        names = frozenset(inspect.signature(func).parameters)
+    except (TypeError, ValueError):
+        names = frozenset()
+    try:
+        _param_cache[func] = names
+    except TypeError:
+        pass
+    return names
+
+
+def accepts_deadline(handler: Callable) -> bool:
+    """True when the handler (or its coroutine twin) declares a ``deadline`` parameter."""
+    return "deadline" in _handler_params(handler)
+
+
+def accepts_normalized(handler: Callable) -> bool:
+    """True when the handler declares a ``normalized`` parameter (a NormalizedCommand)."""
+    return "normalized" in _handler_params(handler)
+
+
+def list_feature_files(features_dir: str = FEATURES_DIR) -> List[str]:
+    return sorted(
+        f for f in os.listdir(features_dir)
+        if f.endswith(".py") and f != "__init__.py"
+    )
+
+
+def source_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def describe_module(filename: str, features_dir: str = FEATURES_DIR) -> Dict[str, Any]:
+    """Import one feature module and return its manifest entry."""
+    module_name = filename[:-3]
+    module = importlib.import_module(f"features.{module_name}")
+    handler = find_handler(module, module_name)
+    cost = getattr(module, "import_cost", "light")
+    if cost not in COST_LEVELS:
+        cost = "light"
+    return {
+        "name": module_name,
+        "file": filename,
+        "sha1": source_digest(os.path.join(features_dir, filename)),
+        "handler": handler.__name__ if handler else None,
+        "keywords": list(getattr(module, "keywords", []) or []) if handler else [],
+        "patterns": list(getattr(module, "patterns", []) or []) if handler else [],
+        "cost": cost,
+        "priority": feature_priority(filename),
+        "serial": bool(getattr(module, "batch_serial", False)),
+        "skip": sorted(getattr(module, "pipeline_skip", ()) or ()),
+        "cpu_bound": bool(getattr(module, "cpu_bound", False)),
+        "cache": policy_to_manifest(parse_policy(getattr(module, "response_cache", None))),
+    }
+
+
+def read_manifest(path: str = MANIFEST_PATH) -> Dict[str, Dict[str, Any]]:
+    """Return manifest entries keyed by filename ({} if missing or unreadable)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data.get("features", []) if isinstance(data, dict) else []
+        return {e["file"]: e for e in entries if isinstance(e, dict) and e.get("file")}
+    except Exception:
+        return {}
+
+
+def write_manifest(entries: Dict[str, Dict[str, Any]], path: str = MANIFEST_PATH) -> None:
+    ordered = sorted(entries.values(), key=lambda e: (e.get("priority", 3), e["file"]))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "features": ordered}, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def generate_manifest(features_dir: str = FEATURES_DIR, path: str = MANIFEST_PATH) -> Dict[str, Dict[str, Any]]:
+    """Import every feature module once and write a fresh manifest."""
+    entries: Dict[str, Dict[str, Any]] = {}
+    for filename in list_feature_files(features_dir):
+        try:
+            entries[filename] = describe_module(filename, features_dir)
+        except Exception as e:
+            log.error("Failed to describe feature %s: %s", filename[:-3], e)
+    write_manifest(entries, path)
+    return entries
+
+
+def load_manifest_entries(features_dir: str = FEATURES_DIR, path: str = MANIFEST_PATH
+                          ) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Return (up-to-date entries, filenames that are new or changed since generation)."""
+    manifest = read_manifest(path)
+    fresh: List[Dict[str, Any]] = []
+    stale: List[str] = []
+    for filename in list_feature_files(features_dir):
+        entry = manifest.get(filename)
+        try:
+            digest = source_digest(os.path.join(features_dir, filename))
+        except OSError:
+            continue
+        if entry is None or entry.get("sha1") != digest:
+            stale.append(filename)
+        else:
+            fresh.append(entry)
+    return fresh, stale
+
+
+def refresh_manifest_entries(filenames: List[str], features_dir: str = FEATURES_DIR,
+                             path: str = MANIFEST_PATH) -> None:
+    """Re-describe the given modules (already imported, so cheap) and rewrite the manifest."""
+    if not filenames:
+        return
+    entries = read_manifest(path)
+    present = set(list_feature_files(features_dir))
+    entries = {k: v for k, v in entries.items() if k in present}
+    for filename in filenames:
+        try:
+            entries[filename] = describe_module(filename, features_dir)
+        except Exception:
+            entries.pop(filename, None)
+    try:
+        write_manifest(entries, path)
+    except Exception as e:
+        log.warning("Could not update feature manifest: %s", e)
+
+
+# Marks a LazyFeature whose async twin has not been looked up yet
+_ASYNC_UNRESOLVED = object()
+
+
+class LazyFeature:
+    """Callable stand-in for a feature handler that imports its module on first call."""
+
+    def __init__(self, name: str, handler_name: str, cost: str = "light", priority: int = 3,
+                 serial: bool = False, skip: Iterable[str] = (), cpu_bound: bool = False,
+                 cache: Any = None):
+        self.name = name
+        self.handler_name = handler_name
+        self.__name__ = handler_name
+        self.cost = cost
+        self.priority = priority
+        self.serial = serial
+        self.skip = frozenset(skip)
+        self.cpu_bound = cpu_bound
+        self.cache = parse_policy(cache)
+        self._func: Optional[Callable] = None
+        self._async_func: Any = _ASYNC_UNRESOLVED
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def resolve(self) -> Callable:
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    module = importlib.import_module(f"features.{self.name}")
+                    func = getattr(module, self.handler_name, None)
+                    if not callable(func):
+                        raise AttributeError(f"feature '{self.name}' has no handler '{self.handler_name}'")
+                    self._func = func
+        return self._func
+
+    def resolve_async(self) -> Optional[Callable]:
+        """Import the module if needed and return ``<handler>_async`` when it exists."""
+        self.resolve()
+        if self._async_func is _ASYNC_UNRESOLVED:
+            self._async_func = find_async_handler(sys.modules[f"features.{self.name}"], self.handler_name)
+        return self._async_func
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "lazy"
+        return f"<LazyFeature {self.name}.{self.handler_name} ({state})>"
+
+
+def warm_features(lazy_features: List[LazyFeature], include_heavy: bool = False) -> None:
+    """Import lazy features in priority order; heavy modules are skipped unless asked."""
+    for lf in sorted(lazy_features, key=lambda f: (f.priority, COST_LEVELS.index(f.cost))):
+        if lf.loaded or (lf.cost == "heavy" and not include_heavy):
+            continue
+        try:
+            lf.resolve()
+        except Exception as e:
+            log.warning("Failed to warm feature %s: %s", lf.name, e)
+
+
+if __name__ == "__main__":
+    written = generate_manifest()
+    handlers = sum(1 for e in written.values() if e.get("handler"))
+    print(f"Wrote {MANIFEST_PATH}: {len(written)} modules, {handlers} routable features")
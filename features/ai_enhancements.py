@@ -4,12 +4,16 @@ import datetime
 import threading
 import time
 import tempfile
-import unicodedata
 import re
 from collections import defaultdict
 from typing import Dict, List, Tuple
 import pickle
 
+from applog import get_logger
+from normalization import collapse, fold, strip_diacritics
+
+log = get_logger("ai")
+
 class AIAssistant:
     def __init__(self):
         self.data_file = "assistant_data.pkl"
@@ -57,9 +61,9 @@ class AIAssistant:
                     if isinstance(data, dict):
                         with self._lock:
                             self.user_data = self._migrate_and_fix_keys(data)
-                        print("AI data loaded successfully")
+                        log.debug("AI data loaded")
                 except (pickle.UnpicklingError, EOFError, TypeError) as e:
-                    print(f"Error loading AI data: {e}")
+                    log.warning("Error loading AI data: %s", e)
                     # If file is corrupted or not a dict, create new data
                     with self._lock:
                         self.user_data = self._create_default_data()
@@ -146,7 +150,7 @@ class AIAssistant:
                 except Exception:
                     pass
         except Exception as e:
-            print(f"DEBUG: Error during _save_data: {e}")
+            log.warning("Error during _save_data: %s", e)
 
     def _autosave_loop(self):
         # Periodically persist data to avoid loss
@@ -193,7 +197,7 @@ class AIAssistant:
             with open(self.snapshot_file, 'w', encoding='utf-8') as jf:
                 json.dump(data_to_save, jf, ensure_ascii=False, indent=2)
         except Exception as e:
-            print(f"DEBUG: Error in _snapshot_json: {e}")
+            log.warning("Error in _snapshot_json: %s", e)
 
     def _compact_locked(self):
         """Reduce very low-signal entries to keep storage tidy."""
@@ -293,7 +297,7 @@ class AIAssistant:
             
             self.needs_saving = True
         except Exception as e:
-            print(f"DEBUG: Error in record_command: {e}")
+            log.warning("Error in record_command: %s", e)
             # Không gây lỗi cho chương trình chính
     
     def _get_time_category(self, hour: int) -> str:
@@ -328,20 +332,8 @@ class AIAssistant:
                 for k in list(m.keys()):
                     m[k] = max(0.1, float(m.get(k, 0)) * factor)
         except Exception as e:
-            print(f"DEBUG: Error applying decay: {e}")
-
-    # --- Text normalization helpers ---
-    def _strip_diacritics(self, s: str) -> str:
-        try:
-            return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-        except Exception:
-            return s
+            log.warning("Error applying decay: %s", e)
 
-    def _normalize(self, s: str) -> str:
-        s = (s or "").lower().strip()
-        s = re.sub(r"\s+", " ", s)
-        return s
-    
     def predict_command(self, partial_command: str = "") -> List[Tuple[str, float]]:
         """Predict likely commands based on history and context with improved scoring.
         - Accent-insensitive matching
@@ -359,14 +351,14 @@ class AIAssistant:
                 time_category = self._get_time_category(now.hour)
                 weekday = str(now.weekday())
 
-                p = self._normalize(partial_command)
-                p_nf = self._strip_diacritics(p)
+                p = collapse(partial_command)
+                p_nf = strip_diacritics(p)
 
                 def score_match(text: str, base: float) -> float:
                     if not text:
                         return 0.0
-                    t = self._normalize(text)
-                    t_nf = self._strip_diacritics(t)
+                    t = collapse(text)
+                    t_nf = strip_diacritics(t)
                     if not p:
                         return base
                     if p == t or p_nf == t_nf:
@@ -405,7 +397,7 @@ class AIAssistant:
             seen = set()
             out: List[Tuple[str, float]] = []
             for cmd, score in predictions:
-                k = self._strip_diacritics(self._normalize(cmd))
+                k = fold(cmd)
                 if k not in seen and score > 0.1:
                     seen.add(k)
                     out.append((cmd, score))
@@ -413,7 +405,7 @@ class AIAssistant:
                     break
             return out
         except Exception as e:
-            print(f"DEBUG: Error in predict_command: {e}")
+            log.warning("Error in predict_command: %s", e)
             return []
     
     def get_smart_suggestions(self) -> List[str]:
@@ -503,7 +495,7 @@ class AIAssistant:
                     break
             return out
         except Exception as e:
-            print(f"DEBUG: Error in get_smart_suggestions: {e}")
+            log.warning("Error in get_smart_suggestions: %s", e)
             return ["xem thoi tiet", "mo may tinh", "xem thong tin he thong"]
     def learn_preference(self, feature: str, preference: str, value: any):
         """Learn user preferences for specific features."""
@@ -537,7 +529,7 @@ def enhance_with_ai(response: str, command: str, success: bool = True) -> str:
     try:
         # Kiểm tra command có phải là string không
         if not isinstance(command, str):
-            print(f"DEBUG: Command is not a string: {type(command)}")
+            log.debug("Command is not a string: %s", type(command))
             return response
             
         ai_assistant = get_ai_assistant()
@@ -547,7 +539,7 @@ def enhance_with_ai(response: str, command: str, success: bool = True) -> str:
             try:
                 ai_assistant.record_command(command, success)
             except Exception as e:
-                print(f"DEBUG: Error recording command: {e}")
+                log.warning("Error recording command: %s", e)
         
         threading.Thread(target=record_in_background, daemon=True).start()
         
@@ -558,7 +550,7 @@ def enhance_with_ai(response: str, command: str, success: bool = True) -> str:
             if suggestions:
                 response += "\n\n💡 Gợi ý thông minh:\n" + "\n".join(f"• {s}" for s in suggestions)
     except Exception as e:
-        print(f"DEBUG: Error in enhance_with_ai: {e}")
+        log.warning("Error in enhance_with_ai: %s", e)
         # Không thay đổi response khi có lỗi
     
     return response
@@ -575,7 +567,7 @@ def get_ai_predictions(partial_command: str = "") -> List[str]:
         predictions = ai_assistant.predict_command(partial_command)
         return [cmd for cmd, score in predictions if score > 0.1]
     except Exception as e:
-        print(f"DEBUG: Error in get_ai_predictions: {e}")
+        log.warning("Error in get_ai_predictions: %s", e)
         return []
 
 # Keywords and patterns for feature detection
@@ -3,7 +3,8 @@ import shutil
 import threading
 from typing import Dict, List, Tuple, Optional
 import re
-import unicodedata
+
+from normalization import NormalizedCommand, fold as _norm_key
 
 # Robust app launcher that can find and open apps by name.
 
@@ -12,24 +13,6 @@ _app_index: Dict[str, str] = {}
 _indexed = False
 
 
-def _strip_diacritics(s: str) -> str:
-    try:
-        return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-    except Exception:
-        return s
-
-
-def _normalize(s: str) -> str:
-    s = (s or "").lower().strip()
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-
-def _norm_key(s: str) -> str:
-    s = _normalize(s)
-    return _strip_diacritics(s)
-
-
 def _start_menu_dirs() -> List[str]:
     paths = []
     programdata = os.environ.get('ProgramData')
@@ -103,8 +86,8 @@ _synonyms: Dict[str, str] = {
 }
 
 
-def _extract_app_query(command: str) -> str:
-    txt = _norm_key(command)
+def _extract_app_query(command: str, normalized: Optional[NormalizedCommand] = None) -> str:
+    txt = normalized.accentless if normalized is not None else _norm_key(command)
     # Remove common verbs/phrases around launching
     for w in [
         'mo ', 'mở ', 'khoi dong ', 'khởi động ', 'chay ', 'chạy ',
@@ -168,12 +151,12 @@ def _launch(path_or_bin: str) -> bool:
         return False
 
 
-def app_launcher(command: str = None) -> str:
+def app_launcher(command: str = None, normalized: Optional[NormalizedCommand] = None) -> str:
     """Find and open an application by name. Supports Vietnamese with/without dấu."""
     if not command:
         return "Bạn muốn mở ứng dụng nào? Ví dụ: 'mở Chrome', 'mở máy tính', 'mở Zalo'"
 
-    q = _extract_app_query(command)
+    q = _extract_app_query(command, normalized)
     if not q:
         return "Bạn muốn mở ứng dụng nào?"
 
@@ -1,6 +1,10 @@
 import re
-import time
-from typing import List
+from typing import List, Optional
+
+from deadline import Deadline
+
+# Mỗi bước được tối đa chừng này giây (và không vượt quá deadline của cả chuỗi)
+STEP_TIMEOUT = 10.0
 
 def _split_steps(cmd: str) -> List[str]:
     """Split a multi-step command by common Vietnamese separators."""
@@ -14,7 +18,7 @@ def _split_steps(cmd: str) -> List[str]:
     steps = [p.strip() for p in parts if p and p.strip()]
     return steps
 
-def automation(command: str = None) -> str:
+def automation(command: str = None, deadline: Optional[Deadline] = None) -> str:
     if not command:
         return "Dùng: 'tự động: <bước 1>; <bước 2>; ...' Ví dụ: 'tự động: xem nhắc nhở; mở bảng ghi chú'"
     try:
@@ -23,19 +27,23 @@ def automation(command: str = None) -> str:
             return "Không tìm thấy bước nào để chạy."
         # Lazy import to avoid cycles
         import assistant as _assistant
-        results = []
-        for i, step in enumerate(steps, 1):
-            try:
-                res = _assistant.run_feature(step)
-            except Exception as e:
-                res = f"Lỗi ở bước {i}: {e}"
-            results.append(f"[{i}] {step} -> {res}")
-            time.sleep(0.05)
+        # Một lượt định tuyến cho cả chuỗi, chạy tuần tự trên pool riêng của batch
+        batch = _assistant.run_features_batch(
+            steps, max_concurrency=1, timeout=STEP_TIMEOUT, dedupe=False,
+            deadline=deadline,
+        )
+        results = [f"[{i}] {step} -> {item.result}" for i, (step, item) in enumerate(zip(steps, batch), 1)]
         return "\n".join(results)
     except Exception as e:
         return f"Không thể chạy chuỗi: {e}"
 
+# Steps of different chains may touch the same state: run chains one at a time in batches
+batch_serial = True
+
 # Router metadata
 keywords = ["tự động", "automation", "chuỗi", "multi-step", "workflow"]
 patterns = [r"^tự\s+động", r"^automation", r"^chuỗi\b"]
 
+# Each step is already enhanced (learning record + suggestions) by the pipeline;
+# do not append suggestions a second time to the combined reply
+pipeline_skip = ("enhance",)
@@ -3,6 +3,9 @@ from typing import Tuple, Optional
 
 keywords = ["tính", "cộng", "trừ", "nhân", "chia", "bằng", "kết quả"]
 
+# Same expression, same answer: repeats are served from the response cache
+response_cache = {"ttl": 300, "key": "normalized"}
+
 patterns = [
     "tính ... cộng ...",
     "cộng ... với ...",
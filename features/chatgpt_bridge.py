@@ -1,7 +1,9 @@
 import os
 import json
 import time
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+
+from deadline import Deadline, DeadlineExceeded, resolve as resolve_deadline
 
 
 API_KEY_ENV = "OPENAI_API_KEY"
@@ -69,15 +71,29 @@ def set_api_config(api_key: Optional[str] = None, *, model: Optional[str] = None
         cfg[API_BASE_ENV] = basev
         os.environ[API_BASE_ENV] = basev
     save_config(cfg)
+    try:
+        # Provider routing depends on is_configured(); drop cached routes
+        from feature_registry import bump_generation  # type: ignore
+        bump_generation()
+    except Exception:
+        pass
+
 
+def _http_post(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: float = 30.0,
+               deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """POST helper that prefers 'requests' but falls back to urllib.
 
-def _http_post(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
-    """POST helper that prefers 'requests' but falls back to urllib."""
+    The timeout is capped by the request deadline; once it has passed this
+    raises DeadlineExceeded instead of returning an error payload.
+    """
+    dl = resolve_deadline(deadline)
     try:
         import requests  # type: ignore
-        resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        resp = requests.post(url, headers=headers, json=payload, timeout=dl.timeout(timeout))
         resp.raise_for_status()
         return resp.json()
+    except DeadlineExceeded:
+        raise
     except Exception:
         # Fallback to urllib
         try:
@@ -85,13 +101,15 @@ def _http_post(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeo
             import urllib.error
             data = json.dumps(payload).encode("utf-8")
             req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-            with urllib.request.urlopen(req, timeout=timeout) as resp:  # nosec - user controls key, not URL
+            with urllib.request.urlopen(req, timeout=dl.timeout(timeout)) as resp:  # nosec - user controls key, not URL
                 raw = resp.read().decode("utf-8", errors="replace")
                 return json.loads(raw)
+        except DeadlineExceeded:
+            raise
         except Exception as e:  # Return a structured error so caller can handle gracefully
+            dl.check()
             return {"error": {"message": str(e)}}
 
-
 def _default_system_prompt(user_text: str) -> str:
     # Keep it short, Vietnamese-first but mirror user language if not Vietnamese
     return (
@@ -100,27 +118,19 @@ def _default_system_prompt(user_text: str) -> str:
     )
 
 
-def ask_chatgpt(
+def _build_request(
     user_text: str,
-    *,
-    system_prompt: Optional[str] = None,
-    history: Optional[List[Dict[str, str]]] = None,
-    model: Optional[str] = None,
-    temperature: float = 0.6,
-    max_tokens: int = 600,
-    timeout: float = 30.0,
-) -> str:
-    """Query the OpenAI Chat Completions API and return the assistant message text.
-
-    Configuration via env:
-    - OPENAI_API_KEY: required
-    - OPENAI_API_BASE: optional, default https://api.openai.com
-    - OPENAI_MODEL: optional, default gpt-4o-mini
-    """
+    system_prompt: Optional[str],
+    history: Optional[List[Dict[str, str]]],
+    model: Optional[str],
+    temperature: float,
+    max_tokens: int,
+) -> Optional[Tuple[str, Dict[str, str], Dict[str, Any]]]:
+    """Return (url, headers, payload) for a chat completion, or None without a key."""
     # Prefer env var, fallback to saved config
     api_key = os.environ.get(API_KEY_ENV, "").strip() or get_saved_api_key().strip()
     if not api_key:
-        return "Chưa cấu hình OPENAI_API_KEY. Hãy đặt biến môi trường OPENAI_API_KEY để bật ChatGPT."
+        return None
 
     base = (os.environ.get(API_BASE_ENV) or get_saved_base() or "https://api.openai.com").rstrip("/")
     mdl = (model or os.environ.get(MODEL_ENV) or get_saved_model() or "gpt-4o-mini").strip()
@@ -143,9 +153,10 @@ def ask_chatgpt(
         "temperature": max(0.0, min(2.0, float(temperature))),
         "max_tokens": int(max_tokens),
     }
+    return url, headers, payload
 
-    data = _http_post(url, headers, payload, timeout=timeout)
 
+def _parse_response(data: Any) -> str:
     if not isinstance(data, dict):
         return "Không nhận được phản hồi hợp lệ từ ChatGPT."
 
@@ -163,24 +174,67 @@ def ask_chatgpt(
         return "Không phân tích được phản hồi từ ChatGPT."
 
 
+_NOT_CONFIGURED = "Chưa cấu hình OPENAI_API_KEY. Hãy đặt biến môi trường OPENAI_API_KEY để bật ChatGPT."
+
+
+def ask_chatgpt(
+    user_text: str,
+    *,
+    system_prompt: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
+    temperature: float = 0.6,
+    max_tokens: int = 600,
+    timeout: float = 30.0,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """Query the OpenAI Chat Completions API and return the assistant message text.
+
+    Configuration via env:
+    - OPENAI_API_KEY: required
+    - OPENAI_API_BASE: optional, default https://api.openai.com
+    - OPENAI_MODEL: optional, default gpt-4o-mini
+    """
+    req = _build_request(user_text, system_prompt, history, model, temperature, max_tokens)
+    if req is None:
+        return _NOT_CONFIGURED
+    url, headers, payload = req
+    return _parse_response(_http_post(url, headers, payload, timeout=timeout, deadline=deadline))
+
+
+async def ask_chatgpt_async(
+    user_text: str,
+    *,
+    system_prompt: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
+    temperature: float = 0.6,
+    max_tokens: int = 600,
+    timeout: float = 30.0,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """Coroutine version of ask_chatgpt; the request is awaited on the event loop."""
+    req = _build_request(user_text, system_prompt, history, model, temperature, max_tokens)
+    if req is None:
+        return _NOT_CONFIGURED
+    url, headers, payload = req
+    from async_http import post_json  # type: ignore
+    return _parse_response(await post_json(url, headers, payload, timeout=timeout, deadline=deadline))
+
+
 # Minimal feature glue so the module can be routed like others
 keywords = ["chatgpt", "hoi chatgpt", "hỏi chatgpt", "gpt"]
 patterns = ["hỏi chatgpt", "hoi chatgpt", "chatgpt oi", "chatgpt ơi"]
 
 
-def main(command: Optional[str] = None) -> str:
-    """Entry point for manual ChatGPT queries.
-
-    Examples:
-    - "hỏi chatgpt Java và Python khác gì?"
-    - "chatgpt ơi, viết đoạn mã Python in hello"
-    """
+def _prepare_main(command: Optional[str]) -> Tuple[Optional[str], str]:
+    """Strip trigger phrases; returns (reply, prompt) where reply short-circuits."""
     text = (command or "").strip()
     if not is_configured():
         return (
             "Chưa cấu hình ChatGPT. Đặt biến môi trường OPENAI_API_KEY, "
             "(tuỳ chọn) OPENAI_MODEL=gpt-4o-mini để bật."
-        )
+        ), text
 
     # Strip leading trigger phrases to keep prompt clean
     lowered = text.lower()
@@ -190,6 +244,26 @@ def main(command: Optional[str] = None) -> str:
             break
 
     if not text:
-        return "Bạn muốn hỏi ChatGPT điều gì?"
+        return "Bạn muốn hỏi ChatGPT điều gì?", text
+    return None, text
+
+
+def main(command: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+    """Entry point for manual ChatGPT queries.
 
-    return ask_chatgpt(text)
+    Examples:
+    - "hỏi chatgpt Java và Python khác gì?"
+    - "chatgpt ơi, viết đoạn mã Python in hello"
+    """
+    reply, text = _prepare_main(command)
+    if reply is not None:
+        return reply
+    return ask_chatgpt(text, deadline=deadline)
+
+
+async def main_async(command: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+    """Coroutine entry point used by the assistant's async dispatcher."""
+    reply, text = _prepare_main(command)
+    if reply is not None:
+        return reply
+    return await ask_chatgpt_async(text, deadline=deadline)
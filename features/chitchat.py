@@ -1,7 +1,8 @@
 import re
-import unicodedata
 from typing import List
 
+from normalization import collapse, strip_diacritics as _strip_diacritics
+
 # Keywords and patterns for casual small talk in Vietnamese
 # Include both accented and unaccented/common-typed variants for robustness
 keywords: List[str] = [
@@ -37,16 +38,8 @@ patterns: List[str] = [
 ]
 
 
-def _strip_diacritics(s: str) -> str:
-    try:
-        return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-    except Exception:
-        return s
-
-
 def _normalize(s: str) -> str:
-    s = (s or "").lower().strip()
-    s = re.sub(r"\s+", " ", s)
+    s = collapse(s)
     # best-effort fix common punctuation noise
     s = re.sub(r"[^\w\sáàảãạăắằẳẵặâấầẩẫậđéèẻẽẹêếềểễệíìỉĩịóòỏõọôốồổỗộơớờởỡợúùủũụưứừửữựýỳỷỹỵ]", " ", s)
     return s
@@ -104,6 +97,10 @@ def _select_reply(user_text: str) -> str:
     return "Mình có thể trò chuyện cùng bạn. Bạn muốn nói về điều gì?"
 
 
+# Replies are fixed per phrase (no randomness), so repeats can be cached
+response_cache = {"ttl": 300, "key": "accentless"}
+
+
 def chitchat(command: str = "") -> str:
     """Handle casual conversation in Vietnamese."""
     return _select_reply(command or "")
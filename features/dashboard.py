@@ -21,6 +21,9 @@ except Exception:
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+# Declared for the feature manifest: pulls in matplotlib/TkAgg, never warm eagerly
+import_cost = "heavy"
+
 
 class SystemDashboard:
     def __init__(self, root: tk.Tk, interval_ms: int = 1000, history: int = 60):
@@ -1,6 +1,8 @@
 import os
 import json
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+
+from deadline import Deadline, DeadlineExceeded, resolve as resolve_deadline
 
 # Environment variable for the API key
 API_KEY_ENV = "GEMINI_API_KEY"
@@ -44,39 +46,55 @@ def set_api_key(api_key: str) -> None:
     cfg[API_KEY_ENV] = api_key.strip()
     os.environ[API_KEY_ENV] = api_key.strip()
     save_config(cfg)
+    try:
+        # Provider routing depends on is_configured(); drop cached routes
+        from feature_registry import bump_generation  # type: ignore
+        bump_generation()
+    except Exception:
+        pass
+
+def _http_post(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: float = 30.0,
+               deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """POST helper using requests or urllib.
 
-def _http_post(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
-    """POST helper using requests or urllib."""
+    The timeout is capped by the request deadline; once it has passed this
+    raises DeadlineExceeded instead of returning an error payload.
+    """
+    dl = resolve_deadline(deadline)
     try:
-        import requests
-        resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        import requests  # type: ignore
+        resp = requests.post(url, headers=headers, json=payload, timeout=dl.timeout(timeout))
         resp.raise_for_status()
         return resp.json()
+    except DeadlineExceeded:
+        raise
     except Exception:
+        # Fallback to urllib
         try:
             import urllib.request
             import urllib.error
             data = json.dumps(payload).encode("utf-8")
             req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-            with urllib.request.urlopen(req, timeout=timeout) as resp:
+            with urllib.request.urlopen(req, timeout=dl.timeout(timeout)) as resp:  # nosec - user controls key, not URL
                 raw = resp.read().decode("utf-8", errors="replace")
                 return json.loads(raw)
-        except Exception as e:
+        except DeadlineExceeded:
+            raise
+        except Exception as e:  # Return a structured error so caller can handle gracefully
+            dl.check()
             return {"error": {"message": str(e)}}
 
-def ask_gemini(
+def _build_request(
     user_text: str,
-    *,
-    history: Optional[List[Dict[str, str]]] = None,
-    model: str = "gemini-1.5-flash",
-    temperature: float = 0.7,
-    max_tokens: int = 1000,
-    timeout: float = 30.0,
-) -> str:
-    """Query the Google Gemini API."""
+    history: Optional[List[Dict[str, str]]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> Optional[Tuple[str, Dict[str, str], Dict[str, Any]]]:
+    """Return (url, headers, payload) for a generateContent call, or None without a key."""
     api_key = os.environ.get(API_KEY_ENV, "").strip() or get_saved_api_key().strip()
     if not api_key:
-        return "Chưa cấu hình GEMINI_API_KEY. Hãy đặt biến môi trường để bật Gemini."
+        return None
 
     url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
 
@@ -97,9 +115,9 @@ def ask_gemini(
             "maxOutputTokens": max_tokens,
         },
     }
+    return url, headers, payload
 
-    data = _http_post(url, headers, payload, timeout=timeout)
-
+def _parse_response(data: Any) -> str:
     if not isinstance(data, dict):
         return "Không nhận được phản hồi hợp lệ từ Gemini."
 
@@ -127,12 +145,49 @@ def ask_gemini(
     except (KeyError, IndexError, TypeError) as e:
         return f"Không phân tích được phản hồi từ Gemini: {str(e)}"
 
+_NOT_CONFIGURED = "Chưa cấu hình GEMINI_API_KEY. Hãy đặt biến môi trường để bật Gemini."
+
+def ask_gemini(
+    user_text: str,
+    *,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: str = "gemini-1.5-flash",
+    temperature: float = 0.7,
+    max_tokens: int = 1000,
+    timeout: float = 30.0,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """Query the Google Gemini API."""
+    req = _build_request(user_text, history, model, temperature, max_tokens)
+    if req is None:
+        return _NOT_CONFIGURED
+    url, headers, payload = req
+    return _parse_response(_http_post(url, headers, payload, timeout=timeout, deadline=deadline))
+
+async def ask_gemini_async(
+    user_text: str,
+    *,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: str = "gemini-1.5-flash",
+    temperature: float = 0.7,
+    max_tokens: int = 1000,
+    timeout: float = 30.0,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """Coroutine version of ask_gemini; the request is awaited on the event loop."""
+    req = _build_request(user_text, history, model, temperature, max_tokens)
+    if req is None:
+        return _NOT_CONFIGURED
+    url, headers, payload = req
+    from async_http import post_json  # type: ignore
+    return _parse_response(await post_json(url, headers, payload, timeout=timeout, deadline=deadline))
+
 # Feature glue
 keywords = ["gemini", "ask gemini", "set gemini key"]
 patterns = ["hỏi gemini", "ask gemini", "set gemini key to"]
 
-def main(command: Optional[str] = None) -> str:
-    """Entry point for manual Gemini queries and configuration."""
+def _prepare_main(command: Optional[str]) -> Tuple[Optional[str], str]:
+    """Handle configuration commands; returns (reply, prompt) where reply short-circuits."""
     text = (command or "").strip()
     
     # Command to set the API key
@@ -140,15 +195,28 @@ def main(command: Optional[str] = None) -> str:
         key = text[len("set gemini key to"):].strip()
         if key:
             set_api_key(key)
-            return "Đã lưu API key cho Gemini."
+            return "Đã lưu API key cho Gemini.", text
         else:
-            return "Vui lòng cung cấp API key."
+            return "Vui lòng cung cấp API key.", text
 
     # Fallback to asking Gemini
     if not is_configured():
-        return "Chưa cấu hình Gemini. Hãy dùng lệnh 'set gemini key to YOUR_KEY' hoặc đặt biến môi trường GEMINI_API_KEY."
+        return "Chưa cấu hình Gemini. Hãy dùng lệnh 'set gemini key to YOUR_KEY' hoặc đặt biến môi trường GEMINI_API_KEY.", text
 
     if not text:
-        return "Bạn muốn hỏi Gemini điều gì?"
+        return "Bạn muốn hỏi Gemini điều gì?", text
+    return None, text
 
-    return ask_gemini(text)
+def main(command: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+    """Entry point for manual Gemini queries and configuration."""
+    reply, text = _prepare_main(command)
+    if reply is not None:
+        return reply
+    return ask_gemini(text, deadline=deadline)
+
+async def main_async(command: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+    """Coroutine entry point used by the assistant's async dispatcher."""
+    reply, text = _prepare_main(command)
+    if reply is not None:
+        return reply
+    return await ask_gemini_async(text, deadline=deadline)
@@ -10,13 +10,15 @@ class ConversationMemory:
     - Keeps a rolling window of recent turns in-process for fast access.
     - Persists turns to ai_enhancements user_data['conversations'] when available.
     - Exposes provider-friendly history format.
+    - ``persist=False`` keeps turns in-process only (benchmark replays).
     """
 
-    def __init__(self, max_turns: int = 200) -> None:
+    def __init__(self, max_turns: int = 200, persist: bool = True) -> None:
         self._lock = threading.RLock()
         self._turns: Deque[Dict[str, str]] = deque(maxlen=max_turns)
         self._max_turns = max_turns
         self._enabled: bool = True
+        self._persist = persist
 
     def add_turn(self, role: str, content: str) -> None:
         if not self._enabled:
@@ -29,6 +31,8 @@ class ConversationMemory:
         }
         with self._lock:
             self._turns.append(item)
+        if not self._persist:
+            return
         # Best-effort persist
         try:
             from .ai_enhancements import get_ai_assistant  # lazy import
@@ -68,6 +72,8 @@ class ConversationMemory:
     def clear(self) -> None:
         with self._lock:
             self._turns.clear()
+        if not self._persist:
+            return
         try:
             from .ai_enhancements import get_ai_assistant  # lazy import
             ai = get_ai_assistant()
@@ -91,18 +97,10 @@ def get_memory() -> ConversationMemory:
     return _memory_singleton
 
 # --- Feature glue: simple memory control via commands ---
-import unicodedata
-
-def _strip_diacritics(s: str) -> str:
-    try:
-        return ''.join(c for c in unicodedata.normalize('NFD', s or '') if unicodedata.category(c) != 'Mn')
-    except Exception:
-        return s or ''
+from normalization import NormalizedCommand, fold as _norm
 
-def _norm(s: str) -> str:
-    s = (s or '').lower().strip()
-    s = _strip_diacritics(s)
-    return ' '.join(s.split())
+# Toggling/clearing memory is order-sensitive in batch runs
+batch_serial = True
 
 keywords = ["ghi nho", "ngu canh", "bo nho", "history", "context"]
 patterns = [
@@ -110,9 +108,9 @@ patterns = [
     "xem ngu canh gan day", "xem ngu canh", "clear history", "enable memory", "disable memory"
 ]
 
-def main(command: str = None) -> str:
+def main(command: str = None, normalized: Optional[NormalizedCommand] = None) -> str:
     cm = get_memory()
-    text = _norm(command or '')
+    text = normalized.accentless if normalized is not None else _norm(command or '')
     if not text:
         return (
             "Dieu khien bo nho hoi thoai:\n"
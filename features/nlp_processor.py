@@ -1,10 +1,27 @@
+import atexit
 import re
 import string
-import unicodedata
 import datetime
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from collections import Counter, defaultdict
 import json
+import os
+import pickle
+
+from applog import get_logger
+from deadline import Deadline, DeadlineExceeded, resolve as resolve_deadline
+from intent_engine import IntentEngine
+from learned_store import LearnedPatternStore
+from normalization import repair_mojibake, strip_diacritics
+
+log = get_logger("nlp")
+
+# Tệp lưu mẫu đã học giữa các lần chạy (không đặt = chỉ trong bộ nhớ)
+LEARNED_PATTERNS_PATH = os.environ.get("ASSISTANT_LEARNED_PATTERNS") or None
+
+_WORD_RE = re.compile(r'\b\w+\b')
+_SENTIMENT_NEGATIONS = frozenset(["không", "chẳng", "chả", "đâu", "not", "no", "never"])
+_SENTIMENT_INTENSIFIERS = {"rất": 1.3, "cực": 1.5, "vô cùng": 1.4, "very": 1.3, "really": 1.2, "extremely": 1.5}
 
 # Lazy loading for advanced NLP libraries
 _spacy_nlp = None
@@ -44,6 +61,9 @@ def get_requests():
 # Từ khóa và mẫu cho việc nhận diện tính năng
 keywords = ["hiểu", "phân tích", "ngôn ngữ", "nlp", "xử lý", "lời nói", "cảm xúc", "ý định", "trí tuệ nhân tạo", "ai"]
 
+# Phân tích nhiều lượt regex: chạy trong process tier khi được bật
+cpu_bound = True
+
 patterns = [
     "hiểu lời nói",
     "phân tích ngôn ngữ",
@@ -60,22 +80,62 @@ patterns = [
 class EnhancedNLPProcessor:
     """Bộ xử lý ngôn ngữ tự nhiên cải tiến với khả năng hiểu ngữ cảnh"""
     
-    def __init__(self):
+    def __init__(self, learned_path: Optional[str] = None):
         self.intent_patterns = self._load_enhanced_intent_patterns()
+        # Biên dịch toàn bộ mẫu ý định một lần (intent_engine.py)
+        self.intent_engine = IntentEngine(self.intent_patterns)
         self.entity_patterns = self._load_entity_patterns()
+        self._entity_regexes, self._entity_regexes_noacc = self._compile_entity_patterns()
         self.sentiment_words = self._load_enhanced_sentiment_words()
+        self._sentiment_trie = self._compile_sentiment_lexicon()
         self.synonyms = self._load_synonyms()
         self.context_memory = []  # Lưu trữ ngữ cảnh hội thoại
         self.user_preferences = {}  # Lưu trữ sở thích người dùng
         self.user_history = []  # Lưu trữ lịch sử tương tác người dùng
-        self.learned_patterns = {}  # Lưu trữ các mẫu đã học từ người dùng
+        # Mẫu đã học từ người dùng: có giới hạn, suy giảm theo tần suất và được đánh chỉ mục
+        self.learned_patterns = LearnedPatternStore(path=learned_path)
         self.language_preferences = ["vi", "en"]  # Ngôn ngữ được hỗ trợ
         self.search_history = []  # Lưu trữ lịch sử tìm kiếm
         
-    def process_command(self, command: str) -> str:
+    def process_command(self, command: str, deadline: Optional[Deadline] = None) -> str:
         """Xử lý lệnh từ người dùng với enhanced processing"""
+        return self.complete_plan(self._plan_command(command), deadline)
+
+    async def process_command_async(self, command: str, deadline: Optional[Deadline] = None) -> str:
+        """Như process_command nhưng tìm kiếm trực tuyến được await trên event loop"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        # Phân tích là CPU-bound nên chạy trong thread, chỉ phần mạng chạy trên loop
+        plan = await loop.run_in_executor(None, self._plan_command, command)
+        return await self.complete_plan_async(plan, deadline)
+
+    def complete_plan(self, plan: Tuple[str, str], deadline: Optional[Deadline] = None) -> str:
+        """Thực hiện phần không phải phân tích của kế hoạch: nhắc nhở hoặc tìm kiếm"""
+        action, value = plan
+        if action == "reminder":
+            from features.reminder import reminder
+            return reminder(value)
+        if action == "search":
+            # Thực hiện tìm kiếm và trả về kết quả
+            return self._search_for_information(value, deadline)
+        return value
+
+    async def complete_plan_async(self, plan: Tuple[str, str], deadline: Optional[Deadline] = None) -> str:
+        action, value = plan
+        if action == "search":
+            return await self._search_for_information_async(value, deadline)
+        if action == "reminder":
+            import asyncio
+            return await asyncio.get_running_loop().run_in_executor(None, self.complete_plan, plan, deadline)
+        return value
+
+    def _plan_command(self, command: str) -> Tuple[str, str]:
+        """Phân tích lệnh và trả về ("reply", câu trả lời), ("search", truy vấn) hoặc ("reminder", lệnh)
+
+        Chỉ phân tích (thuần CPU); nhắc nhở và tìm kiếm do complete_plan thực hiện.
+        """
         if not command:
-            return "Tôi có thể giúp phân tích ngôn ngữ, nhận diện ý định, và xử lý các lệnh liên quan đến nhắc nhở với khả năng hiểu ngữ cảnh tốt hơn."
+            return "reply", "Tôi có thể giúp phân tích ngôn ngữ, nhận diện ý định, và xử lý các lệnh liên quan đến nhắc nhở với khả năng hiểu ngữ cảnh tốt hơn."
         
         # Enhance command với synonyms và normalization
         enhanced_command = self._enhance_command(command)
@@ -88,21 +148,18 @@ class EnhancedNLPProcessor:
         
         # Xử lý lệnh liên quan đến nhắc nhở
         if self._is_reminder_related(enhanced_command, analysis):
-            from features.reminder import reminder
-            return reminder(enhanced_command)
+            return "reminder", enhanced_command
         
         # Kiểm tra xem có nên tìm kiếm thông tin từ bên ngoài không
         if self._should_search_for_information(analysis):
             # Trích xuất truy vấn từ phân tích
-            query = self._extract_search_query(enhanced_command, analysis)
-            # Thực hiện tìm kiếm và trả về kết quả
-            return self._search_for_information(query)
+            return "search", self._extract_search_query(enhanced_command, analysis)
         
         # Cập nhật context memory
         self._update_context(enhanced_command, analysis)
         
         # Hiển thị kết quả phân tích cải tiến
-        return self._format_brief_result(analysis)
+        return "reply", self._format_brief_result(analysis)
     
     def _enhance_command(self, command: str) -> str:
         """Cải thiện lệnh bằng cách thay thế synonyms và normalize"""
@@ -124,50 +181,12 @@ class EnhancedNLPProcessor:
             pass
         return enhanced.strip()
 
-    def _strip_diacritics(self, s: str) -> str:
-        """Remove Vietnamese diacritics for accent-insensitive matching."""
-        try:
-            return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-        except Exception:
-            return s
-
-    def _repair_common_mojibake(self, s: str) -> str:
-        """Best-effort fixes for frequent UTF-8/Windows-1252 mojibake seen in inputs/tests."""
-        replacements = {
-            # Greetings and common words
-            "xin chA�o": "xin chao",
-            "chA�o": "chao",
-            "c���m ��n": "cam on",
-            # Dates/times
-            "ngA�y": "ngay",
-            "hA'm": "hom",
-            "lA�c": "luc",
-            "gi��?": "gio",
-            "phA�t": "phut",
-            # Reminder keywords
-            "nh��_c nh��Y": "nhac nho",
-            "ghi chA�": "ghi chu",
-            "l��<ch": "lich",
-            "xA3a": "xoa",
-            # AI terms
-            "trA-": "tri",
-            "tu���": "tue",
-            "nhA�n": "nhan",
-            "t���o": "tao",
-            "h��?c": "hoc",
-            "mA�y": "may",
-            # Question words
-            "lA� gA�": "la gi",
-            "��Y �`A�u": "o dau",
-            "bao nhiA�u": "bao nhieu",
-            "th��� nA�o": "the nao",
-            "t���i sao": "tai sao",
-            "khi nA�o": "khi nao",
-        }
-        for bad, good in replacements.items():
-            s = s.replace(bad, good)
-        return s
-    
+    # Remove Vietnamese diacritics for accent-insensitive matching
+    _strip_diacritics = staticmethod(strip_diacritics)
+
+    # Sửa lỗi mã hóa dùng chung (mojibake.py): văn bản sạch được trả về ngay
+    _repair_common_mojibake = staticmethod(repair_mojibake)
+
     def analyze_text_with_context(self, text: str) -> Dict[str, Any]:
         """Phân tích văn bản với context awareness"""
         # Phân tích cơ bản
@@ -218,9 +237,9 @@ class EnhancedNLPProcessor:
     def _detect_intent_robust(self, text: str) -> Dict[str, float]:
         """Kết hợp phát hiện intent hiện có với sửa lỗi mã hóa, bỏ dấu và học tăng cường.
 
-        - Gọi logic hiện có để giữ hành vi cũ.
+        - Chấm điểm bằng engine đã biên dịch (detect_enhanced_intent).
+        - Khớp từ khóa không dấu (chịu lỗi mojibake/thiếu dấu) khi engine không tìm thấy gì.
         - Bổ sung tăng cường từ mẫu đã học.
-        - Thêm khớp từ khóa không dấu để chịu lỗi (mojibake/thiếu dấu).
         - Giữ fallback an toàn nếu vẫn không xác định.
         """
         # Start with existing detection
@@ -229,17 +248,41 @@ class EnhancedNLPProcessor:
         except Exception:
             scores = {}
 
+        # Keyword heuristics only when the compiled patterns found nothing:
+        # their bare substrings ("ai", "hi") would outvote real matches
+        if not scores:
+            scores = self._heuristic_intent(text, scores)
+
         # Apply learned patterns boost
         try:
             scores = self._apply_learned_patterns(text, scores)
         except Exception:
             pass
 
-        # Accent-insensitive/mojibake-friendly fallback
+        text_clean = self._clean_for_heuristics(text)
+
+        # Final coarse fallback
+        if not scores:
+            if "?" in text or text_clean.endswith("khong"):
+                scores["question"] = 0.6
+            elif any(word in text_clean.split() for word in ["lam", "tao", "giup", "may", "mo", "chay", "m", "ch"]):
+                scores["command"] = 0.6
+            else:
+                scores["unknown"] = 0.8
+
+        return scores
+
+    def _clean_for_heuristics(self, text: str) -> str:
         try:
-            text_clean = self._strip_diacritics(self._repair_common_mojibake(text)).lower()
+            return self._strip_diacritics(self._repair_common_mojibake(text)).lower()
         except Exception:
-            text_clean = text.lower()
+            return text.lower()
+
+    def _heuristic_intent(self, text: str, scores: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Khớp từ khóa không dấu (chịu lỗi mojibake/thiếu dấu), nâng điểm trong ``scores``."""
+        scores = {} if scores is None else scores
+        # Accent-insensitive/mojibake-friendly fallback
+        text_clean = self._clean_for_heuristics(text)
 
         def bump(intent: str, score: float):
             scores[intent] = max(scores.get(intent, 0.0), score)
@@ -256,95 +299,117 @@ class EnhancedNLPProcessor:
             bump("ai_enhancement", 0.7)
         if ("?" in text or any(k in text_clean for k in ["la gi", "la ai", "o dau", "bao nhieu", "the nao", "tai sao", "khi nao"])):
             bump("question", 0.6)
+        return scores
 
-        # Final coarse fallback
-        if not scores:
-            if "?" in text or text_clean.endswith("khong"):
-                scores["question"] = 0.6
-            elif any(word in text_clean.split() for word in ["lam", "tao", "giup", "may", "mo", "chay", "m", "ch"]):
-                scores["command"] = 0.6
-            else:
-                scores["unknown"] = 0.8
+    def _remember_search(self, query: str, text: str) -> None:
+        # Lưu vào lịch sử tìm kiếm
+        self.search_history.append({
+            "query": query,
+            "result": text[:200] + "...",  # Giới hạn độ dài
+            "timestamp": datetime.datetime.now().isoformat()
+        })
+        
+        # Giữ chỉ 20 lịch sử tìm kiếm gần nhất
+        if len(self.search_history) > 20:
+            self.search_history.pop(0)
 
-        return scores
-    
-    def _search_for_information(self, query: str) -> str:
-        """Tìm kiếm thông tin từ các nguồn bên ngoài khi không thể trả lời câu hỏi"""
+    def _search_urls(self, query: str) -> Tuple[str, str]:
+        # URL encode the query for use in URLs
+        import urllib.parse
+        encoded_query = urllib.parse.quote(query)
+        return (
+            f"https://api.duckduckgo.com/?q={encoded_query}&format=json&no_html=1&skip_disambig=1",
+            f"https://vi.wikipedia.org/api/rest_v1/page/summary/{encoded_query}",
+        )
+
+    def _answer_from_duckduckgo(self, query: str, data: Dict[str, Any]) -> Optional[str]:
+        # Kiểm tra AbstractText trước
+        if "AbstractText" in data and data["AbstractText"]:
+            self._remember_search(query, data["AbstractText"])
+            return f"Tôi đã tìm thấy thông tin sau về '{query}':\n\n{data['AbstractText'][:500]}..."
+        
+        # Nếu không có AbstractText, kiểm tra các section khác
+        if "RelatedTopics" in data and data["RelatedTopics"]:
+            # Lấy thông tin từ chủ đề liên quan đầu tiên
+            first_topic = data["RelatedTopics"][0]
+            if "Text" in first_topic:
+                self._remember_search(query, first_topic["Text"])
+                return f"Tôi đã tìm thấy thông tin liên quan đến '{query}':\n\n{first_topic['Text'][:500]}..."
+        return None
+
+    def _answer_from_wikipedia(self, query: str, data: Dict[str, Any]) -> Optional[str]:
+        if "extract" in data:
+            self._remember_search(query, data["extract"])
+            return f"Tôi đã tìm thấy thông tin sau về '{query}' từ Wikipedia:\n\n{data['extract'][:500]}..."
+        return None
+
+    def _search_for_information(self, query: str, deadline: Optional[Deadline] = None) -> str:
+        """Tìm kiếm thông tin từ các nguồn bên ngoài khi không thể trả lời câu hỏi
+
+        Mỗi request bị giới hạn bởi deadline của yêu cầu; hết hạn thì ném DeadlineExceeded.
+        """
+        dl = resolve_deadline(deadline)
         try:
             # Kiểm tra xem requests có sẵn không
             requests = get_requests()
             if not requests:
                 return "Xin lỗi, tôi không thể tìm kiếm thông tin trực tuyến tại thời điểm này vì thiếu thư viện requests."
             
-            # URL encode the query for use in URLs
-            import urllib.parse
-            encoded_query = urllib.parse.quote(query)
+            search_url, wiki_url = self._search_urls(query)
             
             # Thử tìm kiếm với DuckDuckGo Instant Answer API
             try:
-                search_url = f"https://api.duckduckgo.com/?q={encoded_query}&format=json&no_html=1&skip_disambig=1"
-                response = requests.get(search_url, timeout=5)
+                response = requests.get(search_url, timeout=dl.timeout(5))
                 if response.status_code == 200:
-                    data = response.json()
-                    # Kiểm tra AbstractText trước
-                    if "AbstractText" in data and data["AbstractText"]:
-                        # Lưu vào lịch sử tìm kiếm
-                        self.search_history.append({
-                            "query": query,
-                            "result": data["AbstractText"][:200] + "...",  # Giới hạn độ dài
-                            "timestamp": datetime.datetime.now().isoformat()
-                        })
-                        
-                        # Giữ chỉ 20 lịch sử tìm kiếm gần nhất
-                        if len(self.search_history) > 20:
-                            self.search_history.pop(0)
-                        
-                        return f"Tôi đã tìm thấy thông tin sau về '{query}':\n\n{data['AbstractText'][:500]}..."
-                    
-                    # Nếu không có AbstractText, kiểm tra các section khác
-                    if "RelatedTopics" in data and data["RelatedTopics"]:
-                        # Lấy thông tin từ chủ đề liên quan đầu tiên
-                        first_topic = data["RelatedTopics"][0]
-                        if "Text" in first_topic:
-                            # Lưu vào lịch sử tìm kiếm
-                            self.search_history.append({
-                                "query": query,
-                                "result": first_topic["Text"][:200] + "...",  # Giới hạn độ dài
-                                "timestamp": datetime.datetime.now().isoformat()
-                            })
-                            
-                            # Giữ chỉ 20 lịch sử tìm kiếm gần nhất
-                            if len(self.search_history) > 20:
-                                self.search_history.pop(0)
-                            
-                            return f"Tôi đã tìm thấy thông tin liên quan đến '{query}':\n\n{first_topic['Text'][:500]}..."
+                    answer = self._answer_from_duckduckgo(query, response.json())
+                    if answer:
+                        return answer
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 pass  # Continue to next search method
             
             # Nếu DuckDuckGo không có kết quả, thử Wikipedia API
             try:
-                wiki_url = f"https://vi.wikipedia.org/api/rest_v1/page/summary/{encoded_query}"
-                response = requests.get(wiki_url, timeout=5)
+                response = requests.get(wiki_url, timeout=dl.timeout(5))
                 if response.status_code == 200:
-                    data = response.json()
-                    if "extract" in data:
-                        # Lưu vào lịch sử tìm kiếm
-                        self.search_history.append({
-                            "query": query,
-                            "result": data["extract"][:200] + "...",  # Giới hạn độ dài
-                            "timestamp": datetime.datetime.now().isoformat()
-                        })
-                        
-                        # Giữ chỉ 20 lịch sử tìm kiếm gần nhất
-                        if len(self.search_history) > 20:
-                            self.search_history.pop(0)
-                        
-                        return f"Tôi đã tìm thấy thông tin sau về '{query}' từ Wikipedia:\n\n{data['extract'][:500]}..."
+                    answer = self._answer_from_wikipedia(query, response.json())
+                    if answer:
+                        return answer
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 pass  # Continue to next search method
             
             # Nếu không tìm thấy thông tin từ các nguồn trên
+            dl.check()
+            return f"Xin lỗi, tôi không thể tìm thấy thông tin về '{query}'. Bạn có thể cung cấp thêm chi tiết không?"
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            return f"Xin lỗi, đã có lỗi xảy ra khi tìm kiếm thông tin: {str(e)}"
+
+    async def _search_for_information_async(self, query: str, deadline: Optional[Deadline] = None) -> str:
+        """Phiên bản async của _search_for_information (không cần thư viện requests)"""
+        import asyncio
+        from async_http import fetch_json  # type: ignore
+        try:
+            search_url, wiki_url = self._search_urls(query)
+            for url, extract in ((search_url, self._answer_from_duckduckgo),
+                                 (wiki_url, self._answer_from_wikipedia)):
+                try:
+                    status, data = await fetch_json(url, timeout=5, deadline=deadline)
+                    if status == 200 and isinstance(data, dict):
+                        answer = extract(query, data)
+                        if answer:
+                            return answer
+                except (asyncio.CancelledError, DeadlineExceeded):
+                    raise
+                except Exception:
+                    pass  # Continue to next search method
             return f"Xin lỗi, tôi không thể tìm thấy thông tin về '{query}'. Bạn có thể cung cấp thêm chi tiết không?"
+        except (asyncio.CancelledError, DeadlineExceeded):
+            raise
         except Exception as e:
             return f"Xin lỗi, đã có lỗi xảy ra khi tìm kiếm thông tin: {str(e)}"
     
@@ -431,97 +496,42 @@ class EnhancedNLPProcessor:
         # Nếu có ý định rõ ràng, học từ các từ khóa liên quan
         if intents:
             main_intent = self._get_main_intent(analysis)
-            keywords = analysis.get("keywords", [])
-            
-            # Cập nhật mẫu đã học cho ý định này
-            if main_intent not in self.learned_patterns:
-                self.learned_patterns[main_intent] = {
-                    "keywords": [],
-                    "phrases": [],
-                    "count": 0
-                }
-            
-            # Thêm từ khóa mới
-            for keyword in keywords:
-                if keyword not in self.learned_patterns[main_intent]["keywords"]:
-                    self.learned_patterns[main_intent]["keywords"].append(keyword)
-            
-            # Thêm cụm từ mới
-            normalized_text = analysis.get("normalized_text", "")
-            if normalized_text and normalized_text not in self.learned_patterns[main_intent]["phrases"]:
-                self.learned_patterns[main_intent]["phrases"].append(normalized_text)
-            
-            # Tăng số lần xuất hiện
-            self.learned_patterns[main_intent]["count"] += 1
+            self.learned_patterns.learn(main_intent, analysis.get("keywords", []),
+                                        analysis.get("normalized_text", ""))
     
     def _apply_learned_patterns(self, text: str, intent_scores: Dict[str, float]):
         """Áp dụng các mẫu đã học để cải thiện phát hiện ý định"""
-        # Kiểm tra các mẫu đã học
-        for intent, pattern_data in self.learned_patterns.items():
-            # Kiểm tra từ khóa đã học
-            learned_keywords = pattern_data.get("keywords", [])
-            keyword_matches = sum(1 for keyword in learned_keywords if keyword in text)
-            
-            # Kiểm tra cụm từ đã học
-            learned_phrases = pattern_data.get("phrases", [])
-            phrase_matches = sum(1 for phrase in learned_phrases if phrase in text)
-            
-            # Tính điểm dựa trên các mẫu đã học
-            if keyword_matches > 0 or phrase_matches > 0:
-                # Tính điểm học tập dựa trên số lần xuất hiện
-                learning_weight = min(pattern_data.get("count", 0) / 10.0, 1.0)
-                learned_score = (keyword_matches * 0.1 + phrase_matches * 0.2) * learning_weight
-                
-                # Cập nhật điểm ý định
-                if intent in intent_scores:
-                    intent_scores[intent] = min(intent_scores[intent] + learned_score, 1.0)
-                else:
-                    intent_scores[intent] = min(learned_score, 1.0)
-        
+        # Một lượt quét chỉ mục của kho mẫu đã học thay cho phép thử từng từ khóa/cụm từ
+        for intent, (keyword_matches, phrase_matches, count) in self.learned_patterns.matches(text).items():
+            # Tính điểm học tập dựa trên số lần xuất hiện
+            learning_weight = min(count / 10.0, 1.0)
+            learned_score = (keyword_matches * 0.1 + phrase_matches * 0.2) * learning_weight
+
+            # Cập nhật điểm ý định
+            if intent in intent_scores:
+                intent_scores[intent] = min(intent_scores[intent] + learned_score, 1.0)
+            else:
+                intent_scores[intent] = min(learned_score, 1.0)
+
         return intent_scores
-    
-        """Phát hiện ý định được cải tiến với scoring system và học máy"""
-        intent_scores = {}
-        
-        # Kiểm tra các pattern với trọng số khác nhau
-        for intent, patterns in self.intent_patterns.items():
-            max_score = 0.0
-            pattern_matches = 0
-            
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    pattern_matches += 1
-                    # Scoring system cải tiến
-                    base_score = 0.4
-                    match_bonus = pattern_matches * 0.15
-                    score = min(base_score + match_bonus, 1.0)
-                    max_score = max(max_score, score)
-            
-            if max_score > 0:
-                intent_scores[intent] = max_score
-        
+
+    def detect_enhanced_intent(self, text: str) -> Dict[str, float]:
+        """Phát hiện ý định bằng engine đã biên dịch: mọi ý định được chấm điểm trong một lượt quét
+
+        Điểm = 0.4 + 0.15 x số mẫu khớp (tối đa 1.0); mẫu đã học và fallback do
+        _detect_intent_robust áp dụng.
+        """
+        intent_scores = self.intent_engine.score(text)
+
         # Xử lý đặc biệt cho các intent phức tạp
         if any(word in text for word in ["xóa", "hủy", "delete", "remove"]) and any(word in text for word in ["nhắc", "ghi chú", "lịch", "reminder"]):
             intent_scores["delete_reminder"] = 0.95
-        
+
         if any(word in text for word in ["xem", "hiển thị", "list", "show"]) and any(word in text for word in ["nhắc", "ghi chú", "lịch", "reminder"]):
             intent_scores["list_reminder"] = 0.95
-            
-        # Áp dụng các mẫu đã học
-        intent_scores = self._apply_learned_patterns(text, intent_scores)
-            
-        # Fallback mechanism
-        if not intent_scores:
-            # Phân tích dựa trên cấu trúc câu
-            if "?" in text or text.endswith("không"):
-                intent_scores["question"] = 0.6
-            elif any(word in text for word in ["làm", "tạo", "giúp", "mở"]):
-                intent_scores["command"] = 0.6
-            else:
-                intent_scores["unknown"] = 0.8
-            
+
         return intent_scores
-        
+
     def _load_enhanced_intent_patterns(self) -> Dict[str, List[str]]:
         """Tải các mẫu nhận diện ý định được cải tiến"""
         return {
@@ -725,87 +735,133 @@ class EnhancedNLPProcessor:
         
         return analysis
         
-    def extract_enhanced_entities(self, text: str) -> Dict[str, List[str]]:
-        """Normalize and extract entities with accent/encoding tolerance and de-duplication."""
-        entities: Dict[str, List[str]] = {}
-
-        try:
-            text_norm = self._repair_common_mojibake(text)
-        except Exception:
-            text_norm = text
-        text_noacc = self._strip_diacritics(text_norm)
+    def _compile_entity_patterns(self) -> Tuple[List[Tuple[str, "re.Pattern[str]"]], List[Tuple[str, "re.Pattern[str]"]]]:
+        """Sửa mojibake, bỏ dấu và biên dịch mẫu thực thể một lần, ở cả hai dạng.
 
+        Dạng không dấu chỉ giữ các mẫu thực sự đổi khi bỏ dấu.
+        """
+        accented: List[Tuple[str, "re.Pattern[str]"]] = []
+        accentless: List[Tuple[str, "re.Pattern[str]"]] = []
         for entity_type, patterns in self.entity_patterns.items():
-            seen = set()
-            matches: List[str] = []
             for pattern in patterns:
                 try:
                     p = self._repair_common_mojibake(pattern)
                 except Exception:
                     p = pattern
-                for m in re.finditer(p, text_norm, re.IGNORECASE):
-                    et = m.group(0).strip()
-                    if len(et) > 1 and et.lower() not in {"cua", "trong", "voi", "va", "la"}:
-                        if et not in seen:
-                            seen.add(et)
-                            matches.append(et)
                 p2 = self._strip_diacritics(p)
-                if p2 and p2 != p:
-                    for m in re.finditer(p2, text_noacc, re.IGNORECASE):
-                        et = m.group(0).strip()
-                        if len(et) > 1 and et.lower() not in {"cua", "trong", "voi", "va", "la"}:
-                            if et not in seen:
-                                seen.add(et)
-                                matches.append(et)
-            if matches:
-                entities[entity_type] = matches
+                try:
+                    accented.append((entity_type, re.compile(p, re.IGNORECASE)))
+                    if p2 and p2 != p:
+                        accentless.append((entity_type, re.compile(p2, re.IGNORECASE)))
+                except re.error as e:
+                    log.warning("Bỏ qua mẫu thực thể %s không hợp lệ %r: %s", entity_type, pattern, e)
+        return accented, accentless
+
+    def extract_enhanced_entities(self, text: str) -> Dict[str, List[str]]:
+        """Normalize and extract entities with accent/encoding tolerance and de-duplication.
+
+        One pass over the precompiled patterns per text form; a span found in
+        both forms is reported once, as written in the (repaired) text.
+        """
+        try:
+            text_norm = self._repair_common_mojibake(text)
+        except Exception:
+            text_norm = text
+        text_noacc = self._strip_diacritics(text_norm)
+        # Bỏ dấu dạng NFC giữ nguyên độ dài nên vị trí khớp dùng chung được
+        same_spans = len(text_noacc) == len(text_norm)
+
+        spans: Dict[Tuple[str, int, int], str] = {}
+        for form, target in ((self._entity_regexes, text_norm), (self._entity_regexes_noacc, text_noacc)):
+            source = text_norm if same_spans else target
+            for entity_type, regex in form:
+                for m in regex.finditer(target):
+                    key = (entity_type, m.start(), m.end())
+                    if key not in spans:
+                        spans[key] = source[m.start():m.end()]
 
+        entities: Dict[str, List[str]] = {}
+        seen = set()
+        for (entity_type, _, _), value in sorted(spans.items(), key=lambda item: item[0][1]):
+            et = value.strip()
+            if len(et) > 1 and et.lower() not in {"cua", "trong", "voi", "va", "la"} and (entity_type, et) not in seen:
+                seen.add((entity_type, et))
+                entities.setdefault(entity_type, []).append(et)
         return entities
+    def _compile_sentiment_lexicon(self) -> Dict[str, Any]:
+        """Dựng trie theo từ cho từ điển cảm xúc, từ phủ định và từ nhấn mạnh (một lần).
+
+        Mỗi nút là dict {từ: nút con}; khóa "" (không bao giờ là một từ) giữ
+        (điểm cảm xúc hoặc None, hệ số nhấn mạnh hoặc None) của cụm kết thúc tại đó.
+        Như trước, chỉ cụm tối đa 3 từ được tính.
+        """
+        root: Dict[str, Any] = {}
+
+        def insert(phrase: str, sentiment: Optional[float] = None, multiplier: Optional[float] = None) -> None:
+            tokens = phrase.split(" ")
+            if not 1 <= len(tokens) <= 3:
+                return
+            node = root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            old_sentiment, old_multiplier = node.get("", (None, None))
+            node[""] = (sentiment if sentiment is not None else old_sentiment,
+                        multiplier if multiplier is not None else old_multiplier)
+
+        for phrase, value in self.sentiment_words.items():
+            insert(phrase, sentiment=value)
+        for phrase, multiplier in _SENTIMENT_INTENSIFIERS.items():
+            insert(phrase, multiplier=multiplier)
+        return root
+
     def analyze_enhanced_sentiment(self, text: str) -> Dict[str, float]:
-        """Phân tích cảm xúc cải tiến với context awareness"""
-        words = re.findall(r'\b\w+\b', text.lower())
-        phrases = []
-        
-        # Tạo các cụm từ 2-3 từ liên tiếp
-        for i in range(len(words) - 1):
-            phrases.append(words[i] + " " + words[i+1])
-            if i < len(words) - 2:
-                phrases.append(words[i] + " " + words[i+1] + " " + words[i+2])
-        
+        """Phân tích cảm xúc cải tiến với context awareness
+
+        Một lượt quét trie từ điển trên danh sách từ: cụm 2-3 từ (trọng số 1.5)
+        và từng từ (trọng số 1) được tính mà không tạo chuỗi n-gram.
+        """
+        words = _WORD_RE.findall((text or "").lower())
+        trie = self._sentiment_trie
+
         # Tính điểm cảm xúc với weight khác nhau
         score = 0.0
-        count = 0
+        count = 0.0
         confidence = 0.0
-        
-        # Kiểm tra cụm từ trước (weight cao hơn)
-        for phrase in phrases:
-            if phrase in self.sentiment_words:
-                weight = 1.5  # Cụm từ có trọng số cao hơn
-                score += self.sentiment_words[phrase] * weight
-                confidence += abs(self.sentiment_words[phrase]) * weight
-                count += weight
-        
-        # Kiểm tra từng từ
-        for word in words:
-            if word in self.sentiment_words:
-                score += self.sentiment_words[word]
-                confidence += abs(self.sentiment_words[word])
-                count += 1
-        
-        # Xử lý negation (phủ định)
-        negation_words = ["không", "chẳng", "chả", "đâu", "not", "no", "never"]
-        has_negation = any(neg in words for neg in negation_words)
+        has_negation = False
+        intensifiers_found = set()
+
+        for i, word in enumerate(words):
+            if word in _SENTIMENT_NEGATIONS:
+                has_negation = True
+            node = trie.get(word)
+            depth = 1
+            while node is not None:
+                value, multiplier = node.get("", (None, None))
+                if value is not None:
+                    # Cụm từ có trọng số cao hơn từ đơn
+                    weight = 1.5 if depth > 1 else 1.0
+                    score += value * weight
+                    confidence += abs(value) * weight
+                    count += weight
+                if multiplier is not None:
+                    intensifiers_found.add(" ".join(words[i:i + depth]))
+                if depth == 3 or i + depth >= len(words):
+                    break
+                node = node.get(words[i + depth])
+                depth += 1
+
+        # Xử lý negation (phủ định): đảo ngược và giảm intensity
         if has_negation and score != 0:
-            score *= -0.8  # Đảo ngược và giảm intensity
-        
-        # Xử lý intensifiers (từ nhấn mạnh)
-        intensifiers = {"rất": 1.3, "cực": 1.5, "vô cùng": 1.4, "very": 1.3, "really": 1.2, "extremely": 1.5}
-        for intensifier, multiplier in intensifiers.items():
-            if intensifier in words and score != 0:
-                score *= multiplier
-                confidence *= multiplier
-                break
-        
+            score *= -0.8
+
+        # Xử lý intensifiers (từ nhấn mạnh): từ đầu tiên theo thứ tự khai báo
+        if intensifiers_found and score != 0:
+            for intensifier, multiplier in _SENTIMENT_INTENSIFIERS.items():
+                if intensifier in intensifiers_found:
+                    score *= multiplier
+                    confidence *= multiplier
+                    break
+
         # Tính toán kết quả
         if count > 0:
             avg_score = score / count
@@ -813,14 +869,32 @@ class EnhancedNLPProcessor:
         else:
             avg_score = 0.0
             confidence = 0.0
-            
+
         sentiment = {
             "score": avg_score,
             "confidence": confidence,
             "label": "positive" if avg_score > 0.15 else "negative" if avg_score < -0.15 else "neutral"
         }
-        
+
         return sentiment
+
+    def analyze_sentiment_batch(self, texts: Iterable[Any]) -> List[Dict[str, float]]:
+        """Phân tích cảm xúc hàng loạt (command_history, hội thoại) theo đúng thứ tự đầu vào.
+
+        Phần tử có thể là chuỗi hoặc bản ghi dict có "command"/"text"; câu lặp
+        lại chỉ được phân tích một lần.
+        """
+        results: List[Dict[str, float]] = []
+        seen: Dict[str, Dict[str, float]] = {}
+        for item in texts:
+            if isinstance(item, dict):
+                item = item.get("command") or item.get("text") or ""
+            text = item if isinstance(item, str) else ""
+            sentiment = seen.get(text)
+            if sentiment is None:
+                sentiment = seen[text] = self.analyze_enhanced_sentiment(text)
+            results.append(dict(sentiment))
+        return results
     
     def extract_smart_keywords(self, text: str) -> List[str]:
         """Trích xuất từ khóa thông minh với frequency analysis"""
@@ -926,12 +1000,13 @@ class EnhancedNLPProcessor:
             "entities": analysis.get("entities", {}),
             "timestamp": datetime.datetime.now().isoformat()
         }
-        
+        self._remember_context(context_entry)
+
+    def _remember_context(self, context_entry: Dict[str, Any]):
+        """Thêm một lượt vào context memory, chỉ giữ 10 entries gần nhất"""
         self.context_memory.append(context_entry)
-        
-        # Giữ chỉ 10 context entries gần nhất
         if len(self.context_memory) > 10:
-            self.context_memory.pop(0)
+            del self.context_memory[:-10]
     
     def _calculate_context_score(self, text: str, analysis: Dict[str, Any]) -> float:
         """Tính điểm relevance dựa trên context"""
@@ -1355,29 +1430,136 @@ def get_nlp_processor() -> EnhancedNLPProcessor:
     """Trả về instance của EnhancedNLPProcessor (singleton)"""
     global _nlp_processor
     if _nlp_processor is None:
-        _nlp_processor = EnhancedNLPProcessor()
+        _nlp_processor = EnhancedNLPProcessor(learned_path=LEARNED_PATTERNS_PATH)
+        if LEARNED_PATTERNS_PATH:
+            atexit.register(_nlp_processor.learned_patterns.flush)
     return _nlp_processor
 
+def _fallback_reply(command: str) -> str:
+    # Fallback to a lighter analysis path if detailed processing fails
+    try:
+        return enhance_with_nlp(command)
+    except Exception as e:
+        return f"Không thể xử lý với NLP: {e}"
+
 # Module-level entry point for the assistant router
-def nlp_processor(command: str = None) -> str:
+def nlp_processor(command: str = None, deadline: Optional[Deadline] = None) -> str:
     """Process a command using the enhanced NLP processor and return a human-readable summary."""
     proc = get_nlp_processor()
     if not command:
         return "Vui lòng nhập câu lệnh hoặc câu hỏi để phân tích."
     try:
-        return proc.process_command(command)
+        return proc.process_command(command, deadline)
+    except DeadlineExceeded:
+        raise
     except Exception:
-        # Fallback to a lighter analysis path if detailed processing fails
-        try:
-            return enhance_with_nlp(command)
-        except Exception as e:
-            return f"Không thể xử lý với NLP: {e}"
+        return _fallback_reply(command)
+
+async def nlp_processor_async(command: str = None, deadline: Optional[Deadline] = None) -> str:
+    """Coroutine entry point: analysis runs in a worker thread, web search on the event loop."""
+    proc = get_nlp_processor()
+    if not command:
+        return "Vui lòng nhập câu lệnh hoặc câu hỏi để phân tích."
+    try:
+        return await proc.process_command_async(command, deadline)
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        return _fallback_reply(command)
+
+# --- Process tier (process_tier.py): phân tích chạy trong tiến trình con ---
+# Chỉ kế hoạch (tuple chuỗi), context_memory và learned_patterns đi qua ranh
+# giới tiến trình; nhắc nhở và tìm kiếm vẫn chạy trong tiến trình chính.
+# learned_patterns được gửi dưới dạng bản chụp đã pickle (dựng lại mỗi khi
+# revision đổi); worker chỉ nạp lại khi revision khác, nên mọi tiến trình
+# chấm điểm ý định trên cùng một kho. Worker chỉ ghi lại các lệnh learn()
+# và trả về phần thay đổi của lượt gọi; tiến trình chính nối thêm chúng và
+# là nơi duy nhất lưu learned_patterns (ASSISTANT_LEARNED_PATTERNS).
+
+# Tiến trình chính: (kho, revision, bản chụp đã pickle) gửi gần nhất
+_learned_blob: Tuple[Any, int, bytes] = (None, 0, b"")
+# Worker: context_memory nhận ở lượt gọi hiện tại và revision kho đã nạp
+_cpu_base: List[Dict[str, Any]] = []
+_learned_revision = 0
+
+def cpu_plan(command: str) -> Tuple[str, str]:
+    if not command:
+        return "reply", "Vui lòng nhập câu lệnh hoặc câu hỏi để phân tích."
+    try:
+        return get_nlp_processor()._plan_command(command)
+    except Exception:
+        return "reply", _fallback_reply(command)
+
+def cpu_apply(plan: Tuple[str, str], command: str, deadline: Optional[Deadline] = None) -> str:
+    try:
+        return get_nlp_processor().complete_plan(plan, deadline)
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        return _fallback_reply(command)
+
+async def cpu_apply_async(plan: Tuple[str, str], command: str, deadline: Optional[Deadline] = None) -> str:
+    try:
+        return await get_nlp_processor().complete_plan_async(plan, deadline)
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        return _fallback_reply(command)
+
+def cpu_state() -> Dict[str, Any]:
+    global _learned_blob
+    proc = get_nlp_processor()
+    store = proc.learned_patterns
+    if _learned_blob[0] is not store or _learned_blob[1] != store.revision:
+        revision, data = store.snapshot()
+        _learned_blob = (store, revision, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+    return {"context": list(proc.context_memory), "learned": _learned_blob[1:]}
+
+def load_cpu_state(state: Dict[str, Any]) -> None:
+    """Worker: nhận context và kho mẫu đã học của tiến trình chính, bắt đầu ghi lại thay đổi."""
+    global _cpu_base, _learned_revision
+    proc = get_nlp_processor()
+    proc.context_memory = list(state["context"])
+    _cpu_base = list(state["context"])
+    revision, blob = state["learned"]
+    if revision != _learned_revision:
+        proc.learned_patterns.load_snapshot(pickle.loads(blob))
+        _learned_revision = revision
+    proc.learned_patterns.path = None  # chỉ tiến trình chính lưu tệp
+    if proc.learned_patterns.journal is None:
+        proc.learned_patterns.journal = []  # learn() chỉ ghi lại, không tự áp dụng
+
+def cpu_delta() -> Dict[str, list]:
+    """Worker: các lượt context mới và các lệnh learn() của lượt gọi vừa chạy."""
+    proc = get_nlp_processor()
+    added = [e for e in proc.context_memory if not any(e is b for b in _cpu_base)]
+    learned, proc.learned_patterns.journal = proc.learned_patterns.journal or [], []
+    return {"context": added, "learned": learned}
+
+def apply_cpu_delta(delta: Dict[str, list]) -> None:
+    """Tiến trình chính: nối thêm thay đổi của worker thay vì ghi đè trạng thái."""
+    proc = get_nlp_processor()
+    for entry in delta.get("context", ()):
+        proc._remember_context(entry)
+    for intent, keywords, phrase in delta.get("learned", ()):
+        proc.learned_patterns.learn(intent, keywords, phrase)
+
+def warm_worker() -> None:
+    """Dựng bộ xử lý và chạy một lượt phân tích để biên dịch sẵn các regex."""
+    proc = get_nlp_processor()
+    with proc.learned_patterns.suspended():
+        proc.analyze_text_with_context("nhắc tôi họp lúc 9 giờ sáng mai ở Hà Nội, tôi rất vui")
+    proc.user_history.clear()
 
 def analyze_user_input(text: str) -> Dict[str, Any]:
     """Phân tích đầu vào của người dùng với enhanced capabilities"""
     processor = get_nlp_processor()
     return processor.analyze_text_with_context(text)
 
+def analyze_sentiment_batch(texts: Iterable[Any]) -> List[Dict[str, float]]:
+    """Phân tích cảm xúc cho nhiều câu (xem EnhancedNLPProcessor.analyze_sentiment_batch)"""
+    return get_nlp_processor().analyze_sentiment_batch(texts)
+
 def enhance_with_nlp(command: str) -> str:
     """Hàm chính để xử lý lệnh với NLP"""
     if not command:
@@ -4,6 +4,8 @@ from typing import Optional, List
 
 
 DEFAULT_PROVIDER_KEY = "DEFAULT_PROVIDER"  # values: "chatgpt" | "gemini"
+# Start the provider request alongside the NLP handler for questions (opt-in)
+SPECULATIVE_ESCALATION_KEY = "SPECULATIVE_ESCALATION"
 
 
 def _config_path() -> str:
@@ -52,6 +54,28 @@ def set_default_provider(provider: Optional[str]) -> None:
     _save_config(cfg)
 
 
+# Checked on every question routed to the NLP processor: read the file once
+_speculative_escalation: Optional[bool] = None
+
+
+def get_speculative_escalation() -> bool:
+    global _speculative_escalation
+    if _speculative_escalation is None:
+        _speculative_escalation = _load_config().get(SPECULATIVE_ESCALATION_KEY) is True
+    return _speculative_escalation
+
+
+def set_speculative_escalation(enabled: bool) -> None:
+    global _speculative_escalation
+    cfg = _load_config()
+    if enabled:
+        cfg[SPECULATIVE_ESCALATION_KEY] = True
+    else:
+        cfg.pop(SPECULATIVE_ESCALATION_KEY, None)
+    _save_config(cfg)
+    _speculative_escalation = None
+
+
 def list_configured_providers() -> List[str]:
     out: List[str] = []
     try:
@@ -9,6 +9,9 @@ from typing import Dict, List, Optional, Tuple
 # ÄÆ°á»ng dáº«n Ä‘áº¿n tá»‡p lÆ°u trá»¯ dá»¯ liá»‡u nháº¯c nhá»Ÿ
 REMINDER_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reminder_data.json")
 
+# Batch runs keep reminder commands in order (add -> list -> delete)
+batch_serial = True
+
 # Tá»« khÃ³a vÃ  máº«u cho viá»‡c nháº­n diá»‡n tÃ­nh nÄƒng
 keywords = ["nháº¯c nhá»Ÿ", "lá»‹ch", "sá»± kiá»‡n", "háº¹n", "lá»‹ch trÃ¬nh", "reminder", "calendar", "event", "ghi chÃº"]
 
@@ -22,6 +22,9 @@ patterns = [
     "system info"
 ]
 
+# Live figures (CPU %, memory): cache the rendered reply only briefly
+response_cache = {"ttl": 2, "key": "raw"}
+
 # Cache system information for 5 seconds
 @lru_cache(maxsize=1)
 def get_cached_system_info() -> dict:
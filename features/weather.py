@@ -3,6 +3,8 @@ import time
 import re
 from typing import Dict, Any, Optional, Tuple
 
+from deadline import Deadline, DeadlineExceeded, resolve as resolve_deadline
+
 # Optional requests import (real API if available)
 try:
     import requests  # type: ignore
@@ -13,6 +15,10 @@ except Exception:
 _weather_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
 _CACHE_TTL_SECONDS = 10 * 60  # 10 minutes
 
+# Rendered replies expire with the data they were built from: the key is the
+# parsed city plus the data entry's fetch time (see cache_key)
+response_cache = {"ttl": _CACHE_TTL_SECONDS, "key": "cache_key"}
+
 # Minimal city -> (lat, lon) mapping for VN majors
 _CITY_COORDS: Dict[str, Tuple[float, float]] = {
     "hanoi": (21.0278, 105.8342),
@@ -45,16 +51,19 @@ def _normalize_city(text: Optional[str]) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
-def _from_cache(city_norm: str) -> Optional[Dict[str, Any]]:
+def _cache_entry(city_norm: str) -> Optional[Tuple[float, Dict[str, Any]]]:
     entry = _weather_cache.get(city_norm)
     if not entry:
         return None
-    ts, data = entry
-    if time.time() - ts <= _CACHE_TTL_SECONDS:
-        return data
+    if time.time() - entry[0] <= _CACHE_TTL_SECONDS:
+        return entry
     _weather_cache.pop(city_norm, None)
     return None
 
+def _from_cache(city_norm: str) -> Optional[Dict[str, Any]]:
+    entry = _cache_entry(city_norm)
+    return entry[1] if entry else None
+
 def _put_cache(city_norm: str, data: Dict[str, Any]) -> None:
     _weather_cache[city_norm] = (time.time(), data)
 
@@ -77,45 +86,77 @@ def _simulated(city: str) -> str:
     data = samples.get(key, {"temp": 27.0, "humidity": 70, "code": 2})
     return _fmt_output(city or "(không rõ)", data["temp"], data["humidity"], data["code"])
 
-def _query_open_meteo(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+_OPEN_METEO_URL = (
+    "https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+    "&current=temperature_2m,relative_humidity_2m,weather_code&timezone=auto"
+)
+# Legacy fallback (older Open‑Meteo)
+_OPEN_METEO_LEGACY_URL = (
+    "https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+    "&current_weather=true&timezone=auto"
+)
+
+def _parse_current(j: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    cur = j.get("current") or {}
+    if not cur:
+        return None
+    return {
+        "temp": float(cur.get("temperature_2m")),
+        "humidity": float(cur.get("relative_humidity_2m")) if cur.get("relative_humidity_2m") is not None else None,
+        "code": int(cur.get("weather_code")) if cur.get("weather_code") is not None else None,
+    }
+
+def _parse_legacy(j: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    cw = j.get("current_weather") or {}
+    if not cw:
+        return None
+    return {
+        "temp": float(cw.get("temperature")),
+        "humidity": None,
+        "code": int(cw.get("weathercode")) if cw.get("weathercode") is not None else None,
+    }
+
+def _query_open_meteo(lat: float, lon: float, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
     if not requests:
         return None
+    dl = resolve_deadline(deadline)
     try:
         # Modern endpoint with current fields
-        url = (
-            "https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-            "&current=temperature_2m,relative_humidity_2m,weather_code&timezone=auto"
-        ).format(lat=lat, lon=lon)
-        r = requests.get(url, timeout=5)
+        r = requests.get(_OPEN_METEO_URL.format(lat=lat, lon=lon), timeout=dl.timeout(5))
         if r.status_code == 200:
-            j = r.json()
-            cur = j.get("current") or {}
-            if cur:
-                return {
-                    "temp": float(cur.get("temperature_2m")),
-                    "humidity": float(cur.get("relative_humidity_2m")) if cur.get("relative_humidity_2m") is not None else None,
-                    "code": int(cur.get("weather_code")) if cur.get("weather_code") is not None else None,
-                }
-        # Legacy fallback (older Open‑Meteo)
-        url2 = (
-            "https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-            "&current_weather=true&timezone=auto"
-        ).format(lat=lat, lon=lon)
-        r2 = requests.get(url2, timeout=5)
+            data = _parse_current(r.json())
+            if data:
+                return data
+        r2 = requests.get(_OPEN_METEO_LEGACY_URL.format(lat=lat, lon=lon), timeout=dl.timeout(5))
         if r2.status_code == 200:
-            j2 = r2.json()
-            cw = j2.get("current_weather") or {}
-            if cw:
-                return {
-                    "temp": float(cw.get("temperature")),
-                    "humidity": None,
-                    "code": int(cw.get("weathercode")) if cw.get("weathercode") is not None else None,
-                }
+            return _parse_legacy(r2.json())
+    except DeadlineExceeded:
+        raise
     except Exception:
+        dl.check()
         return None
     return None
 
-def get_weather(city_name: str = None) -> str:
+async def _query_open_meteo_async(lat: float, lon: float, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+    """Same lookup as _query_open_meteo, awaited on the event loop (no requests needed)."""
+    import asyncio
+    from async_http import fetch_json  # type: ignore
+    try:
+        status, j = await fetch_json(_OPEN_METEO_URL.format(lat=lat, lon=lon), timeout=5, deadline=deadline)
+        if status == 200 and isinstance(j, dict):
+            data = _parse_current(j)
+            if data:
+                return data
+        status, j = await fetch_json(_OPEN_METEO_LEGACY_URL.format(lat=lat, lon=lon), timeout=5, deadline=deadline)
+        if status == 200 and isinstance(j, dict):
+            return _parse_legacy(j)
+    except (asyncio.CancelledError, DeadlineExceeded):
+        raise
+    except Exception:
+        return None
+    return None
+
+def get_weather(city_name: str = None, deadline: Optional[Deadline] = None) -> str:
     """Get current weather (Open‑Meteo if available) with caching and fallback."""
     city = city_name or "Hanoi"
     city_norm = _normalize_city(city)
@@ -126,15 +167,33 @@ def get_weather(city_name: str = None) -> str:
 
     coords = _CITY_COORDS.get(city_norm)
     if coords and requests:
-        data = _query_open_meteo(coords[0], coords[1])
+        data = _query_open_meteo(coords[0], coords[1], deadline)
         if data:
             _put_cache(city_norm, data)
             return _fmt_output(city.title(), data.get("temp", 0.0), data.get("humidity"), data.get("code"))
 
     return _simulated(city)
 
-def weather(command: str = None) -> str:
-    """Parse command to extract city name and return weather info."""
+async def get_weather_async(city_name: str = None, deadline: Optional[Deadline] = None) -> str:
+    """Coroutine version of get_weather sharing its cache and fallback."""
+    city = city_name or "Hanoi"
+    city_norm = _normalize_city(city)
+
+    cached = _from_cache(city_norm)
+    if cached:
+        return _fmt_output(city.title(), cached.get("temp", 0.0), cached.get("humidity"), cached.get("code"))
+
+    coords = _CITY_COORDS.get(city_norm)
+    if coords:
+        data = await _query_open_meteo_async(coords[0], coords[1], deadline)
+        if data:
+            _put_cache(city_norm, data)
+            return _fmt_output(city.title(), data.get("temp", 0.0), data.get("humidity"), data.get("code"))
+
+    return _simulated(city)
+
+def _parse_city(command: Optional[str]) -> Optional[str]:
+    """Extract the city name from a weather command."""
     city_name = None
     if command:
         tokens = command.lower().split()
@@ -149,8 +208,32 @@ def weather(command: str = None) -> str:
             city_tokens = [t for t in tokens if t not in weather_words]
             if city_tokens:
                 city_name = " ".join(city_tokens)
+    return city_name
+
+def cache_key(command: Optional[str]) -> Optional[str]:
+    """Response-cache key (city and data fetch time), or None while a live city has no fresh data.
+
+    The fetch time ties a cached reply to its data entry: once the data
+    expires or is refetched the key changes, so a reply is never older than
+    the data TTL. A live city missing from the data cache means the last
+    fetch failed and the reply was simulated; that reply is not cached, so
+    the next request tries the network again.
+    """
+    city_norm = _normalize_city(_parse_city(command) or "Hanoi")
+    if city_norm not in _CITY_COORDS:
+        return city_norm
+    entry = _cache_entry(city_norm)
+    if entry is None:
+        return None
+    return f"{city_norm}@{entry[0]}"
 
-    return get_weather(city_name)
+def weather(command: str = None, deadline: Optional[Deadline] = None) -> str:
+    """Parse command to extract city name and return weather info."""
+    return get_weather(_parse_city(command), deadline)
+
+async def weather_async(command: str = None, deadline: Optional[Deadline] = None) -> str:
+    """Coroutine entry point used by the assistant's async dispatcher."""
+    return await get_weather_async(_parse_city(command), deadline)
 
 # Keywords and patterns for feature detection
 keywords = ["thời tiết", "weather", "nhiệt độ", "độ ẩm", "dự báo", "thoi tiet", "nhiet do", "do am"]
@@ -322,6 +322,9 @@ def get_help() -> str:
 
 Hãy thử một trong các lệnh trên!"""
 
+# Task/timer state is order-sensitive: batch runs keep these commands in order
+batch_serial = True
+
 # Keywords and patterns for feature detection
 keywords = [
     "task", "nhiệm vụ", "công việc", "pomodoro", "timer", 
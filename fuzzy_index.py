@@ -0,0 +1,149 @@
+"""Precomputed phrase corpus for the router's fuzzy fallback tier.
+
+Built once per registry generation from every feature's keywords and
+patterns: phrases are normalized (lowercase, diacritics stripped, ``...``
+placeholders removed), joined into one document per feature and indexed by
+token. A query is first narrowed to the features/patterns that share at least
+one token with it, then scored in a single batched call (rapidfuzz when
+installed, the assistant's ``get_fuzz()`` scorer otherwise), so unmatched
+commands no longer pay one fuzzy comparison per registered feature.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+_rapidfuzz = None
+_rapidfuzz_lock = threading.Lock()
+
+
+def get_rapidfuzz():
+    """Return ``(process, fuzz)`` from rapidfuzz, or ``None`` when it is not installed."""
+    global _rapidfuzz
+    if _rapidfuzz is None:
+        with _rapidfuzz_lock:
+            if _rapidfuzz is None:
+                try:
+                    from rapidfuzz import process, fuzz  # type: ignore
+                    _rapidfuzz = (process, fuzz)
+                except ImportError:
+                    _rapidfuzz = False
+    return _rapidfuzz or None
+
+
+class FuzzyIndex:
+    """Token-prefiltered fuzzy matcher over feature phrases."""
+
+    def __init__(self, entries: Iterable[Tuple[str, Sequence[str], Sequence[str]]],
+                 normalize: Callable[[str], str], skip: Iterable[str] = ()):
+        """``entries`` are ``(feature_name, keywords, patterns)`` in registry order."""
+        self._normalize = normalize
+        skip = set(skip)
+        self.names: List[str] = []
+        self._docs: List[str] = []
+        self._keyword_owner: Dict[str, int] = {}
+        self._doc_postings: Dict[str, List[int]] = {}
+        # Suggestion corpus: (feature index, display pattern, normalized pattern)
+        self._patterns: List[Tuple[int, str, str]] = []
+        self._pattern_postings: Dict[str, List[int]] = {}
+
+        for name, keywords, patterns in entries:
+            keywords = [k for k in (keywords or []) if k]
+            patterns = [p for p in (patterns or []) if p]
+            idx = len(self.names)
+            self.names.append(name)
+            for p in patterns:
+                norm_p = self._clean(p)
+                if norm_p:
+                    pid = len(self._patterns)
+                    self._patterns.append((idx, p, norm_p))
+                    for tok in set(norm_p.split()):
+                        self._pattern_postings.setdefault(tok, []).append(pid)
+            if name in skip or not (keywords or patterns):
+                self._docs.append("")
+                continue
+            for kw in keywords:
+                # First feature in registry order owns a keyword (exact-match tier)
+                self._keyword_owner.setdefault(kw, idx)
+            doc = " ".join(filter(None, (self._clean(p) for p in list(keywords) + list(patterns))))
+            self._docs.append(doc)
+            for tok in set(doc.split()):
+                self._doc_postings.setdefault(tok, []).append(idx)
+
+    def _clean(self, phrase: str) -> str:
+        return " ".join(t for t in self._normalize(phrase.replace("...", " ")).split())
+
+    def exact_keyword(self, tokens: Sequence[str]) -> Optional[str]:
+        """Return the earliest-registered feature that lists one of ``tokens`` as a keyword."""
+        best: Optional[int] = None
+        for tok in tokens:
+            idx = self._keyword_owner.get(tok)
+            if idx is not None and (best is None or idx < best):
+                best = idx
+        return self.names[best] if best is not None else None
+
+    def _candidates(self, postings: Dict[str, List[int]], query: str) -> List[int]:
+        found: Set[int] = set()
+        for tok in set(query.split()):
+            found.update(postings.get(tok, ()))
+        return sorted(found)
+
+    def best_feature(self, command: str, threshold: float = 0.7,
+                     fallback_scorer: Optional[Callable[[str, str], float]] = None
+                     ) -> Optional[Tuple[str, float]]:
+        """Best feature whose phrase document scores strictly above ``threshold`` (0..1)."""
+        query = self._normalize(command)
+        cands = self._candidates(self._doc_postings, query)
+        if not cands:
+            return None
+        docs = [self._docs[i] for i in cands]
+        rf = get_rapidfuzz()
+        if rf is not None:
+            process, fuzz = rf
+            hit = process.extractOne(query, docs, scorer=fuzz.token_set_ratio, score_cutoff=threshold * 100)
+            if hit is None or hit[1] / 100.0 <= threshold:
+                return None
+            return (self.names[cands[hit[2]]], hit[1] / 100.0)
+        if fallback_scorer is None:
+            return None
+        best: Optional[Tuple[str, float]] = None
+        best_score = threshold
+        for i, doc in zip(cands, docs):
+            score = fallback_scorer(query, doc) / 100.0
+            if score > best_score:
+                best_score = score
+                best = (self.names[i], score)
+        return best
+
+    def suggest(self, command: str, limit: int = 3, cutoff: float = 60,
+                fallback_scorer: Optional[Callable[[str, str], float]] = None) -> List[str]:
+        """Up to ``limit`` display patterns (one per feature) with partial_ratio above ``cutoff``."""
+        query = self._normalize(command)
+        cands = self._candidates(self._pattern_postings, query)
+        if not cands:
+            return []
+        texts = [self._patterns[pid][2] for pid in cands]
+        scored: List[Tuple[float, int]] = []
+        rf = get_rapidfuzz()
+        if rf is not None:
+            process, fuzz = rf
+            for _, score, pos in process.extract(query, texts, scorer=fuzz.partial_ratio,
+                                                 score_cutoff=cutoff, limit=None):
+                if score > cutoff:
+                    scored.append((score, cands[pos]))
+        elif fallback_scorer is not None:
+            for pid, text in zip(cands, texts):
+                score = fallback_scorer(query, text)
+                if score > cutoff:
+                    scored.append((score, pid))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        seen: Set[int] = set()
+        out: List[str] = []
+        for _, pid in scored:
+            feat_idx, display, _ = self._patterns[pid]
+            if feat_idx in seen:
+                continue
+            seen.add(feat_idx)
+            out.append(display)
+            if len(out) >= limit:
+                break
+        return out
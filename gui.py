@@ -10,6 +10,7 @@ import time
 import unicodedata
 import re
 import assistant
+from normalization import repair_mojibake
 from features.ai_enhancements import get_ai_assistant
 # Optional modern theming with ttkbootstrap
 try:
@@ -71,34 +72,16 @@ def get_reminder_manager():
 
 
 def repair_vi(s: str) -> str:
-    """Best-effort fix of mojibake Vietnamese strings to proper UTF-8 text."""
+    """Best-effort fix of mojibake Vietnamese strings to proper UTF-8 text.
+
+    Clean strings (every redraw, almost every message) cost one pre-check.
+    """
     if not isinstance(s, str):
         return s
-    mapping = {
-        'Tr��� lA� ���o': 'Trợ lý ảo',
-        'Giao di���n': 'Giao diện',
-        'Tr��� giA�p': 'Trợ giúp',
-        'Gi��>i thi���u': 'Giới thiệu',
-        'ThoA�t': 'Thoát',
-        'Ch��� �`��T t��`i': 'Chế độ tối',
-        'TA-nh n��ng': 'Tính năng',
-        'Nh��_c nh��Y': 'Nhắc nhở',
-        '�?���n gi��?': 'Đến giờ:',
-        'Th��?i gian': 'Thời gian',
-        '�?ang t���i tA-nh n��ng': 'Đang tải tính năng',
-        'G��-i': 'Gửi',
-        'Nh��-p yA�u c��\u0015u c��\u0015a b���n...': 'Nhập yêu cầu của bạn...',
-        '�?ang x��- lA��?�': 'Đang xử lý',
-        'B���n: ': 'Bạn: ',
-        'Tr��� lA�: ': 'Trợ lý: ',
-    }
-    out = s
     try:
-        for k, v in mapping.items():
-            out = out.replace(k, v)
+        return repair_mojibake(s)
     except Exception:
         return s
-    return out
 
 
 class ChatView(ttk.Frame):
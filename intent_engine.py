@@ -0,0 +1,133 @@
+"""Compiled intent engine for the NLP processor.
+
+Every intent pattern is compiled once, in two forms: as written, and with
+diacritics stripped (for commands typed without accents). Scoring a text is
+then one scan plus a handful of regex searches:
+
+1. each pattern's literal prefixes (``(?:xóa|hủy)\\s+...`` -> ``xóa``, ``hủy``)
+   are extracted from its parse tree and loaded into an Aho-Corasick
+   automaton, so one pass over the text finds which patterns can match at all
+2. only those candidates (plus patterns without a literal prefix) are
+   searched, with the precompiled regex
+
+The result is exact: a pattern whose prefixes are all absent cannot match.
+Texts are lowercased once, so patterns without uppercase letters are
+compiled without ``re.IGNORECASE``.
+
+The score of an intent grows with the number of its patterns that match:
+``min(base + step * matches, 1.0)``.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from aho_corasick import AhoCorasick
+from applog import get_logger
+from normalization import strip_diacritics
+
+try:  # Python 3.11+
+    from re import _parser as _sre_parse  # type: ignore[attr-defined]
+    from re._constants import AT, AT_BEGINNING, BRANCH, LITERAL, SUBPATTERN  # type: ignore
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+    from sre_constants import AT, AT_BEGINNING, BRANCH, LITERAL, SUBPATTERN  # type: ignore
+
+log = get_logger("intent_engine")
+
+
+def _prefixes(items) -> Set[str]:
+    """Literal strings one of which every match of ``items`` starts with ("" = unknown)."""
+    current = {""}
+    for op, av in items:
+        if op is LITERAL:
+            current = {p + chr(av) for p in current}
+            continue
+        if op is AT and av is AT_BEGINNING:
+            continue
+        if op is BRANCH:
+            alternatives: Set[str] = set()
+            for branch in av[1]:
+                alternatives |= _prefixes(branch)
+            current = {p + q for p in current for q in alternatives}
+        elif op is SUBPATTERN:
+            current = {p + q for p in current for q in _prefixes(av[-1])}
+        break
+    return current
+
+
+def literal_prefixes(pattern: str) -> Optional[Set[str]]:
+    """Lowercased literal prefixes of ``pattern``, or None when it has none."""
+    try:
+        found = _prefixes(list(_sre_parse.parse(pattern)))
+    except Exception:
+        return None
+    if not found or "" in found:
+        return None
+    return {p.lower() for p in found}
+
+
+class _Form:
+    """One text form (accented or accentless): compiled patterns and their prefix gate."""
+
+    __slots__ = ("regexes", "gate", "ungated")
+
+    def __init__(self) -> None:
+        self.regexes: List[Tuple[str, "re.Pattern[str]"]] = []
+        self.gate = AhoCorasick()
+        self.ungated: List[int] = []
+
+    def add(self, intent: str, pattern: str) -> None:
+        try:
+            flags = re.IGNORECASE if pattern != pattern.lower() else 0
+            regex = re.compile(pattern, flags)
+        except re.error as e:
+            log.warning("Skipping invalid %s pattern %r: %s", intent, pattern, e)
+            return
+        index = len(self.regexes)
+        self.regexes.append((intent, regex))
+        prefixes = literal_prefixes(pattern)
+        if prefixes is None:
+            self.ungated.append(index)
+        else:
+            for prefix in prefixes:
+                self.gate.add(prefix, index)
+
+    def counts(self, text: str) -> Dict[str, int]:
+        candidates = self.gate.find_payloads(text)
+        candidates.update(self.ungated)
+        counts: Dict[str, int] = {}
+        for index in candidates:
+            intent, regex = self.regexes[index]
+            if regex.search(text):
+                counts[intent] = counts.get(intent, 0) + 1
+        return counts
+
+
+class IntentEngine:
+    """Score every intent against a text in one gated pass."""
+
+    def __init__(self, patterns: Dict[str, Iterable[str]], base: float = 0.4, step: float = 0.15):
+        self.base = base
+        self.step = step
+        self._accented = _Form()
+        self._accentless = _Form()
+        for intent, sources in patterns.items():
+            for pattern in sources:
+                self._accented.add(intent, pattern)
+                self._accentless.add(intent, strip_diacritics(pattern))
+        self._accented.gate.build()
+        self._accentless.gate.build()
+
+    def __len__(self) -> int:
+        return len(self._accented.regexes)
+
+    def match_counts(self, text: str) -> Dict[str, int]:
+        """Number of matching patterns per intent (intents without a match are absent)."""
+        lowered = (text or "").lower()
+        plain = strip_diacritics(lowered)
+        # Text typed without accents is matched against the accentless patterns
+        form = self._accentless if plain == lowered else self._accented
+        return form.counts(lowered)
+
+    def score(self, text: str) -> Dict[str, float]:
+        return {intent: min(self.base + self.step * n, 1.0) for intent, n in self.match_counts(text).items()}
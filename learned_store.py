@@ -0,0 +1,304 @@
+"""Bounded store for the intent keywords/phrases the NLP processor learns.
+
+Every analysed command teaches its main intent a few keywords and its
+normalized text. The store keeps them per intent in dicts (term -> weight),
+so membership is O(1), and caps each intent at ``max_keywords`` /
+``max_phrases`` terms. Weights decay: each learn() makes the next sighting
+worth ``1 / decay`` times more than the last (the usual exponential-unit
+trick, rescaled before it overflows), so when an intent overflows the
+least-used terms, weighted towards recent use, are evicted in one batch.
+
+Matching a command is one scan of an Aho-Corasick index over every live
+term. The index is rebuilt lazily: terms added since the last build are
+checked with a plain substring test and evicted terms are filtered out,
+until the changes reach ``rebuild_after`` or a quarter of the index, so the
+rebuild cost stays amortized however large the store grows.
+
+With a ``path`` the store is loaded from that JSON file and written back
+atomically ``debounce`` seconds after the last change (see taught_store.py).
+``revision`` changes with every change to the contents (it is unique across
+stores in a process), and snapshot()/load_snapshot() copy the contents to
+another store. Setting ``journal`` to a list makes learn() only record its
+calls as ``(intent, keywords, phrase)`` for the owning store to replay:
+process-tier workers score against the parent's snapshot and never diverge.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from aho_corasick import AhoCorasick
+from applog import get_logger
+
+log = get_logger("learned_store")
+
+KINDS = ("keywords", "phrases")
+
+_RESCALE_AT = 1e12
+
+_revisions = itertools.count(1)
+
+
+class _Intent:
+    __slots__ = ("count", "keywords", "phrases")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.keywords: Dict[str, float] = {}
+        self.phrases: Dict[str, float] = {}
+
+
+class LearnedPatternStore:
+    """Thread-safe learned keyword/phrase store with caps, decay and a substring index."""
+
+    def __init__(self, max_keywords: int = 200, max_phrases: int = 100, decay: float = 0.99,
+                 rebuild_after: int = 32, path: Optional[str] = None, debounce: float = 2.0) -> None:
+        self.caps = {"keywords": max(1, max_keywords), "phrases": max(1, max_phrases)}
+        self.decay = min(max(decay, 0.5), 1.0)
+        self.rebuild_after = max(1, rebuild_after)
+        self.path = path
+        self.debounce = debounce
+        self._lock = threading.RLock()
+        self._intents: Dict[str, _Intent] = {}
+        self._unit = 1.0
+        self._index = AhoCorasick().build()
+        self._pending: Set[Tuple[str, str, str]] = set()
+        self._stale = 0
+        self._indexed = 0
+        self._learning = True
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self.journal: Optional[List[Tuple[str, Tuple[str, ...], str]]] = None
+        self.revision = next(_revisions)
+        self.evictions = 0
+        self.rebuilds = 0
+        if path:
+            self._load()
+
+    # --- mapping-style view (kept for callers of the old dict) ---
+
+    def __contains__(self, intent: object) -> bool:
+        return intent in self._intents
+
+    def __len__(self) -> int:
+        return len(self._intents)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._intents))
+
+    def keys(self) -> List[str]:
+        return list(self._intents)
+
+    def get(self, intent: str) -> Optional[Dict[str, object]]:
+        """Snapshot {"keywords": set, "phrases": set, "count": int} of one intent."""
+        with self._lock:
+            entry = self._intents.get(intent)
+            if entry is None:
+                return None
+            return {"keywords": set(entry.keywords), "phrases": set(entry.phrases), "count": entry.count}
+
+    # --- learning ---
+
+    @contextmanager
+    def suspended(self) -> Iterator[None]:
+        """Ignore learn() calls inside the block (warmup runs, benchmarks)."""
+        with self._lock:
+            previous, self._learning = self._learning, False
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._learning = previous
+
+    def learn(self, intent: str, keywords: Iterable[str] = (), phrase: str = "") -> None:
+        """Record one interaction of ``intent``: bump its count and the weight of each term."""
+        if not intent:
+            return
+        with self._lock:
+            if not self._learning:
+                return
+            keywords = tuple(keywords)
+            if self.journal is not None:
+                self.journal.append((intent, keywords, phrase))
+                return
+            entry = self._intents.get(intent)
+            if entry is None:
+                entry = self._intents[intent] = _Intent()
+            entry.count += 1
+            self._unit /= self.decay
+            if self._unit > _RESCALE_AT:
+                self._rescale()
+            for keyword in keywords:
+                self._add(intent, entry, "keywords", keyword)
+            if phrase:
+                self._add(intent, entry, "phrases", phrase)
+            self._mark_dirty()
+
+    def _add(self, intent: str, entry: _Intent, kind: str, term: str) -> None:
+        if not term:
+            return
+        terms: Dict[str, float] = getattr(entry, kind)
+        if term in terms:
+            terms[term] += self._unit
+            return
+        terms[term] = self._unit
+        self._pending.add((intent, kind, term))
+        cap = self.caps[kind]
+        if len(terms) > cap:
+            # Evict to 90% of the cap in one go so the O(n) pass is amortized
+            excess = len(terms) - max(1, int(cap * 0.9))
+            for victim in heapq.nsmallest(excess, terms, key=terms.__getitem__):
+                del terms[victim]
+                if (intent, kind, victim) in self._pending:
+                    self._pending.discard((intent, kind, victim))
+                else:
+                    self._stale += 1
+            self.evictions += excess
+
+    def _rescale(self) -> None:
+        for entry in self._intents.values():
+            for kind in KINDS:
+                terms = getattr(entry, kind)
+                for term in terms:
+                    terms[term] /= self._unit
+        self._unit = 1.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._intents.clear()
+            self._unit = 1.0
+            self._rebuild()
+            self._mark_dirty()
+
+    def snapshot(self) -> Tuple[int, Dict[str, object]]:
+        """(revision, contents) in the JSON file format, for load_snapshot() elsewhere."""
+        with self._lock:
+            return self.revision, self._dump()
+
+    def load_snapshot(self, data: Dict[str, object]) -> None:
+        """Replace the contents with another store's snapshot() (nothing is saved)."""
+        with self._lock:
+            self._intents.clear()
+            self._unit = 1.0
+            self._load_intents(data.get("intents") if isinstance(data, dict) else None)
+
+    # --- matching ---
+
+    def _rebuild(self) -> None:
+        index = AhoCorasick()
+        for intent, entry in self._intents.items():
+            for kind in KINDS:
+                for term in getattr(entry, kind):
+                    index.add(term, (intent, kind, term))
+        self._index = index.build()
+        self._indexed = len(index)
+        self._pending.clear()
+        self._stale = 0
+        self.rebuilds += 1
+
+    def matches(self, text: str) -> Dict[str, Tuple[int, int, int]]:
+        """{intent: (keyword matches, phrase matches, interaction count)} for terms occurring in ``text``."""
+        if not text:
+            return {}
+        with self._lock:
+            if not self._intents:
+                return {}
+            if len(self._pending) + self._stale >= max(self.rebuild_after, self._indexed // 4):
+                self._rebuild()
+            found = self._index.find_payloads(text)
+            if self._stale:
+                found = {p for p in found if p[0] in self._intents and p[2] in getattr(self._intents[p[0]], p[1])}
+            found.update(p for p in self._pending if p[2] in text)
+            out: Dict[str, List[int]] = {}
+            for intent, kind, _ in found:
+                counts = out.setdefault(intent, [0, 0])
+                counts[0 if kind == "keywords" else 1] += 1
+            return {intent: (k, p, self._intents[intent].count) for intent, (k, p) in out.items()}
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "intents": len(self._intents),
+                "keywords": sum(len(e.keywords) for e in self._intents.values()),
+                "phrases": sum(len(e.phrases) for e in self._intents.values()),
+                "pending": len(self._pending),
+                "evictions": self.evictions,
+                "rebuilds": self.rebuilds,
+            }
+
+    # --- persistence ---
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.warning("Could not load learned patterns from %s: %s", self.path, e)
+            return
+        with self._lock:
+            self._load_intents(data.get("intents") if isinstance(data, dict) else None)
+
+    def _load_intents(self, intents: object) -> None:
+        if isinstance(intents, dict):
+            for intent, raw in intents.items():
+                if not isinstance(raw, dict):
+                    continue
+                entry = _Intent()
+                try:
+                    entry.count = int(raw.get("count", 0))
+                    for kind in KINDS:
+                        terms = raw.get(kind) or {}
+                        best = sorted(terms.items(), key=lambda kv: kv[1], reverse=True)[:self.caps[kind]]
+                        setattr(entry, kind, {str(t): float(w) for t, w in best})
+                except (TypeError, ValueError, AttributeError):
+                    continue
+                self._intents[str(intent)] = entry
+        self._rebuild()
+        self.revision = next(_revisions)
+
+    def _mark_dirty(self) -> None:
+        self.revision = next(_revisions)
+        if not self.path:
+            return
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _dump(self) -> Dict[str, object]:
+        # Weights are saved relative to the current unit so a reload starts at 1.0
+        return {"version": 1, "intents": {
+            intent: {"count": entry.count,
+                     **{kind: {t: round(w / self._unit, 6) for t, w in getattr(entry, kind).items()}
+                        for kind in KINDS}}
+            for intent, entry in self._intents.items()
+        }}
+
+    def flush(self) -> None:
+        """Write pending changes now (atomic replace of the JSON file)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty or not self.path:
+                return
+            data = self._dump()
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except Exception as e:
+                log.warning("Could not save learned patterns: %s", e)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
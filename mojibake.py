@@ -0,0 +1,112 @@
+"""Shared detection and repair of mojibake (UTF-8 text decoded with the wrong codec).
+
+Two kinds of damage reach the assistant, in commands, stored data and UI
+strings:
+
+- reversible: UTF-8 decoded as Windows-1252/Latin-1 (``"xin chÃ o"``);
+  encoding back and decoding as UTF-8 restores the text exactly
+- lossy: some bytes became U+FFFD or control characters (``"nh??_c nh??Y"``
+  for "nhắc nhở"); only known fragments can be mapped back, via
+  :data:`KNOWN_FRAGMENTS`
+
+:func:`looks_broken` is the pre-check: ASCII text, and non-ASCII text
+without U+FFFD, control characters or cp1252 markers, is clean and
+:func:`repair_mojibake` returns it as is. Broken text gets one codec round
+trip plus one scan of a compiled alternation of the fragments (longest
+first), and the result is cached.
+"""
+
+import re
+
+from ttl_cache import MISSING, TTLCache
+
+# Sequences typical of UTF-8 text decoded as Windows-1252/Latin-1
+_CODEC_MARKERS = re.compile("[ÃÂÄÆ]|á[»º]|â€")
+# Anything that can start a repair: codec markers, U+FFFD, C0/C1 controls (tabs/newlines are fine)
+_SUSPECT = re.compile("[\ufffd\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9fÃÂÄÆ]|á[»º]|â€")
+
+KNOWN_FRAGMENTS = {
+    # Commands and stored data (NLP processor); the lost accents are not guessed
+    "xin chA\ufffdo": "xin chao",
+    "chA\ufffdo": "chao",
+    "c\ufffd\ufffd\ufffdm \ufffd\ufffdn": "cam on",
+    "ngA\ufffdy": "ngay",
+    "hA'm": "hom",
+    "lA\ufffdc": "luc",
+    "gi\ufffd\ufffd?": "gio",
+    "phA\ufffdt": "phut",
+    "nh\ufffd\ufffd_c nh\ufffd\ufffdY": "nhac nho",
+    "ghi chA\ufffd": "ghi chu",
+    "l\ufffd\ufffd<ch": "lich",
+    "xA3a": "xoa",
+    "trA-": "tri",
+    "tu\ufffd\ufffd\ufffd": "tue",
+    "nhA\ufffdn": "nhan",
+    "t\ufffd\ufffd\ufffdo": "tao",
+    "h\ufffd\ufffd?c": "hoc",
+    "mA\ufffdy": "may",
+    "lA\ufffd gA\ufffd": "la gi",
+    "\ufffd\ufffdY \ufffd`A\ufffdu": "o dau",
+    "bao nhiA\ufffdu": "bao nhieu",
+    "th\ufffd\ufffd\ufffd nA\ufffdo": "the nao",
+    "t\ufffd\ufffd\ufffdi sao": "tai sao",
+    "khi nA\ufffdo": "khi nao",
+    # Reminder words the router used to list as broken tokens
+    "nh\ufffd\ufffd_c": "nhắc",
+    "h\ufffd\ufffd1n": "hẹn",
+    "s\ufffd\ufffd\ufffd ki\ufffd\ufffd\ufffdn": "sự kiện",
+    # GUI labels and chat prefixes (known strings, so the accents are restored)
+    "Tr\ufffd\ufffd\ufffd lA\ufffd \ufffd\ufffd\ufffdo": "Trợ lý ảo",
+    "Giao di\ufffd\ufffd\ufffdn": "Giao diện",
+    "Tr\ufffd\ufffd\ufffd giA\ufffdp": "Trợ giúp",
+    "Gi\ufffd\ufffd>i thi\ufffd\ufffd\ufffdu": "Giới thiệu",
+    "ThoA\ufffdt": "Thoát",
+    "Ch\ufffd\ufffd\ufffd \ufffd`\ufffd\ufffdT t\ufffd\ufffd`i": "Chế độ tối",
+    "TA-nh n\ufffd\ufffdng": "Tính năng",
+    "Nh\ufffd\ufffd_c nh\ufffd\ufffdY": "Nhắc nhở",
+    "\ufffd?\ufffd\ufffd\ufffdn gi\ufffd\ufffd?": "Đến giờ:",
+    "Th\ufffd\ufffd?i gian": "Thời gian",
+    "\ufffd?ang t\ufffd\ufffd\ufffdi tA-nh n\ufffd\ufffdng": "Đang tải tính năng",
+    "G\ufffd\ufffd-i": "Gửi",
+    "Nh\ufffd\ufffd-p yA\ufffdu c\ufffd\ufffd\x15u c\ufffd\ufffd\x15a b\ufffd\ufffd\ufffdn...": "Nhập yêu cầu của bạn...",
+    "\ufffd?ang x\ufffd\ufffd- lA\ufffd\ufffd?\ufffd": "Đang xử lý",
+    "B\ufffd\ufffd\ufffdn: ": "Bạn: ",
+    "Tr\ufffd\ufffd\ufffd lA\ufffd: ": "Trợ lý: ",
+}
+
+_FRAGMENTS = re.compile("|".join(re.escape(k) for k in sorted(KNOWN_FRAGMENTS, key=len, reverse=True)))
+
+REPAIR_CACHE_SIZE = 1024
+_repaired = TTLCache(maxsize=REPAIR_CACHE_SIZE)
+
+
+def looks_broken(s: str) -> bool:
+    """Cheap pre-check: False for clean ASCII/UTF-8 text."""
+    return bool(s) and not s.isascii() and _SUSPECT.search(s) is not None
+
+
+def _repair(s: str) -> str:
+    out = s
+    if _CODEC_MARKERS.search(out):
+        for codec in ("cp1252", "latin-1"):
+            try:
+                out = out.encode(codec).decode("utf-8")
+                break
+            except (UnicodeEncodeError, UnicodeDecodeError):
+                continue
+    return _FRAGMENTS.sub(lambda m: KNOWN_FRAGMENTS[m.group(0)], out)
+
+
+def repair_mojibake(s: str) -> str:
+    """``s`` with mojibake undone where it can be; clean text is returned unchanged."""
+    if not looks_broken(s):
+        return s
+    out = _repaired.get(s)
+    if out is MISSING:
+        out = _repair(s)
+        _repaired.put(s, out)
+    return out
+
+
+def repair_stats():
+    return _repaired.stats()
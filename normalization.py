@@ -0,0 +1,77 @@
+"""Shared text normalization for commands.
+
+Every stage used to lowercase, strip diacritics and collapse whitespace on its
+own. :func:`normalize_command` does it once and returns an immutable
+:class:`NormalizedCommand`; results are interned in a bounded LRU so a command
+that is routed, handed to a feature and recorded for learning is normalized
+only once. The small helpers (:func:`strip_diacritics`, :func:`collapse`,
+:func:`fold`) are the single implementation the features reuse.
+"""
+
+import unicodedata
+from typing import Callable, Hashable, NamedTuple, Optional, Sequence, Tuple
+
+from mojibake import repair_mojibake  # re-exported: the shared repair lives in mojibake.py
+from ttl_cache import MISSING, TTLCache
+
+
+def strip_diacritics(s: str) -> str:
+    """Remove combining marks (accents); ``đ`` is kept as is."""
+    try:
+        return ''.join(c for c in unicodedata.normalize('NFD', s or '') if unicodedata.category(c) != 'Mn')
+    except Exception:
+        return s or ''
+
+
+def collapse(s: str) -> str:
+    """Lowercase, trim and collapse runs of whitespace to one space."""
+    return ' '.join((s or '').lower().split())
+
+
+def fold(s: str) -> str:
+    """Accent-insensitive matching key: lowercase, no diacritics, collapsed whitespace."""
+    return strip_diacritics(collapse(s))
+
+
+class NormalizedCommand(NamedTuple):
+    raw: str
+    lower: str  # lowercase, whitespace collapsed
+    accentless: str  # ``lower`` without diacritics (== fold(raw))
+    tokens: Tuple[str, ...]
+    repaired: str  # like ``lower``, but with mojibake undone first
+
+    def __str__(self) -> str:
+        return self.raw
+
+
+def _build(raw: str, tokenize: Optional[Callable[[str], Sequence[str]]]) -> NormalizedCommand:
+    raw = raw if isinstance(raw, str) else str(raw or '')
+    lower = collapse(raw)
+    tokens = tuple(tokenize(raw)) if tokenize is not None else tuple(lower.split())
+    return NormalizedCommand(raw, lower, strip_diacritics(lower), tokens, collapse(repair_mojibake(raw)))
+
+
+INTERN_CACHE_SIZE = 4096
+_interned = TTLCache(maxsize=INTERN_CACHE_SIZE)
+
+
+def normalize_command(raw: str, tokenize: Optional[Callable[[str], Sequence[str]]] = None,
+                      key: Hashable = None) -> NormalizedCommand:
+    """Interned :class:`NormalizedCommand` for ``raw``.
+
+    ``tokenize`` defaults to whitespace splitting; pass ``key`` (e.g. the
+    tokenizer's dictionary generation) so tokens from a different tokenizer
+    are not served from the cache.
+    """
+    if tokenize is not None and key is None:
+        return _build(raw, tokenize)  # unknown tokenizer: nothing safe to cache under
+    cache_key = (raw, key) if tokenize is not None else (raw,)
+    nc = _interned.get(cache_key)
+    if nc is MISSING:
+        nc = _build(raw, tokenize)
+        _interned.put(cache_key, nc)
+    return nc
+
+
+def intern_stats():
+    return _interned.stats()
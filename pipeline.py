@@ -0,0 +1,246 @@
+"""Request pipeline: pre-hooks -> router -> prepare hooks -> handler -> post-processors.
+
+Each stage is a plain function taking the :class:`RequestContext`. The
+pipeline times every stage (a tracing span plus ``ctx.timings`` in ms), skips
+stages that do not apply to the routed feature, and hands every stage after
+the router the :class:`ResolvedFeature` (handler and registry name), so no
+stage has to look the feature up again.
+
+- ``pre_hooks`` run before routing; one may answer the request early by
+  calling :meth:`RequestContext.answer` (e.g. a taught reply).
+- ``router`` sets ``ctx.feature`` (None = nothing matched).
+- ``prepare`` hooks run once the feature is known, before the handler; one
+  may supply the handler's result itself (:meth:`RequestContext.supply`,
+  e.g. a response-cache hit), and the handler is then skipped.
+- ``handler`` produces ``ctx.result``.
+- ``post_processors`` refine ``ctx.result``.
+
+A stage can be limited to some features (``only_for``) or skipped for some
+(``skip_for``, :meth:`Pipeline.skip`); features can also opt out of stages
+themselves through ``skip_lookup`` (``pipeline_skip`` in the feature module).
+Routing and execution are separate calls so a batch can route everything
+first and execute later.
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set
+
+from deadline import Deadline
+from tracing import span
+
+
+class ResolvedFeature(NamedTuple):
+    name: Optional[str]
+    handler: Callable
+    params: str
+    confidence: float = 1.0
+
+
+class RequestContext:
+    """Mutable state of one request as it moves through the pipeline."""
+
+    __slots__ = ("command", "deadline", "normalized", "feature", "result", "early",
+                 "handled", "success", "state", "timings", "_cleanups")
+
+    def __init__(self, command: str, deadline: Optional[Deadline] = None) -> None:
+        self.command = command
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.normalized: Any = None
+        self.feature: Optional[ResolvedFeature] = None
+        self.result: Any = None
+        self.early = False  # answered by a pre-hook; router and handler do not run
+        self.handled = False  # result supplied by a prepare hook; the handler does not run
+        self.success = True  # False when no feature matched and the fallback answered
+        self.state: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self._cleanups: List[Callable[[], None]] = []
+
+    @property
+    def feature_name(self) -> Optional[str]:
+        return self.feature.name if self.feature is not None else None
+
+    def answer(self, result: Any) -> None:
+        self.result = result
+        self.early = True
+
+    def supply(self, result: Any) -> None:
+        """Provide the handler result; post-processors still run on it."""
+        self.result = result
+        self.handled = True
+
+    def on_finish(self, func: Callable[[], None]) -> None:
+        """Run ``func`` when execution ends, whatever the outcome."""
+        self._cleanups.append(func)
+
+    def finish(self) -> None:
+        cleanups, self._cleanups = self._cleanups, []
+        for func in reversed(cleanups):
+            try:
+                func()
+            except Exception:
+                pass
+
+
+class Stage:
+    """A named pipeline step with an optional coroutine variant."""
+
+    __slots__ = ("name", "func", "async_func", "only_for", "skip_for", "blocking")
+
+    def __init__(self, name: str, func: Callable[[RequestContext], Any],
+                 async_func: Optional[Callable[[RequestContext], Awaitable[Any]]] = None,
+                 only_for: Optional[Iterable[str]] = None, skip_for: Iterable[str] = (),
+                 blocking: bool = True) -> None:
+        self.name = name
+        self.func = func
+        self.async_func = async_func
+        # Non-blocking sync stages run directly on the event loop
+        self.blocking = blocking
+        self.only_for: Optional[FrozenSet[str]] = frozenset(only_for) if only_for is not None else None
+        self.skip_for: Set[str] = set(skip_for)
+
+    def __repr__(self) -> str:
+        return f"<Stage {self.name}>"
+
+
+# run_sync(func, ctx) -> awaitable; runs a sync stage off the event loop
+RunSync = Callable[[Callable[[RequestContext], Any], RequestContext], Awaitable[Any]]
+
+
+class Pipeline:
+    def __init__(self, pre_hooks: Iterable[Stage], router: Stage, prepare: Iterable[Stage],
+                 handler: Stage, post_processors: Iterable[Stage],
+                 skip_lookup: Optional[Callable[[ResolvedFeature], Iterable[str]]] = None) -> None:
+        self.pre_hooks = list(pre_hooks)
+        self.router = router
+        self.prepare = list(prepare)
+        self.handler = handler
+        self.post_processors = list(post_processors)
+        self._skip_lookup = skip_lookup
+
+    def stages(self) -> List[Stage]:
+        return [*self.pre_hooks, self.router, *self.prepare, self.handler, *self.post_processors]
+
+    def stage(self, name: str) -> Stage:
+        for st in self.stages():
+            if st.name == name:
+                return st
+        raise KeyError(name)
+
+    def skip(self, stage_name: str, feature_name: str) -> None:
+        """Do not run ``stage_name`` for requests routed to ``feature_name``."""
+        self.stage(stage_name).skip_for.add(feature_name)
+
+    def unskip(self, stage_name: str, feature_name: str) -> None:
+        self.stage(stage_name).skip_for.discard(feature_name)
+
+    def _applies(self, st: Stage, ctx: RequestContext) -> bool:
+        name = ctx.feature_name
+        if st.only_for is not None and name not in st.only_for:
+            return False
+        if name is not None and name in st.skip_for:
+            return False
+        if ctx.feature is not None and self._skip_lookup is not None:
+            try:
+                if st.name in self._skip_lookup(ctx.feature):
+                    return False
+            except Exception:
+                pass
+        return True
+
+    # --- synchronous ---
+
+    def _run_stage(self, st: Stage, ctx: RequestContext) -> None:
+        if self._applies(st, ctx):
+            with _StageTimer(st.name, ctx):
+                st.func(ctx)
+
+    def route(self, ctx: RequestContext) -> RequestContext:
+        """Pre-hooks and router; stops early when a pre-hook answered."""
+        for st in self.pre_hooks:
+            self._run_stage(st, ctx)
+            if ctx.early:
+                return ctx
+        self._run_stage(self.router, ctx)
+        return ctx
+
+    def execute(self, ctx: RequestContext) -> Any:
+        """Prepare hooks, handler and post-processors for a routed context."""
+        if ctx.early:
+            return ctx.result
+        try:
+            for st in self.prepare:
+                if ctx.handled:
+                    break
+                self._run_stage(st, ctx)
+            if not ctx.handled:
+                self._run_stage(self.handler, ctx)
+            for st in self.post_processors:
+                self._run_stage(st, ctx)
+        finally:
+            ctx.finish()
+        return ctx.result
+
+    def run(self, ctx: RequestContext) -> Any:
+        self.route(ctx)
+        return self.execute(ctx)
+
+    # --- asyncio ---
+
+    async def _run_stage_async(self, st: Stage, ctx: RequestContext, run_sync: RunSync) -> None:
+        if not self._applies(st, ctx):
+            return
+        with _StageTimer(st.name, ctx):
+            if st.async_func is not None:
+                await st.async_func(ctx)
+            elif st.blocking:
+                await run_sync(st.func, ctx)
+            else:
+                st.func(ctx)
+
+    async def route_async(self, ctx: RequestContext, run_sync: RunSync) -> RequestContext:
+        for st in self.pre_hooks:
+            await self._run_stage_async(st, ctx, run_sync)
+            if ctx.early:
+                return ctx
+        await self._run_stage_async(self.router, ctx, run_sync)
+        return ctx
+
+    async def execute_async(self, ctx: RequestContext, run_sync: RunSync) -> Any:
+        if ctx.early:
+            return ctx.result
+        try:
+            for st in self.prepare:
+                if ctx.handled:
+                    break
+                await self._run_stage_async(st, ctx, run_sync)
+            if not ctx.handled:
+                await self._run_stage_async(self.handler, ctx, run_sync)
+            for st in self.post_processors:
+                await self._run_stage_async(st, ctx, run_sync)
+        finally:
+            ctx.finish()
+        return ctx.result
+
+    async def run_async(self, ctx: RequestContext, run_sync: RunSync) -> Any:
+        await self.route_async(ctx, run_sync)
+        return await self.execute_async(ctx, run_sync)
+
+
+class _StageTimer:
+    __slots__ = ("name", "ctx", "span", "start")
+
+    def __init__(self, name: str, ctx: RequestContext) -> None:
+        self.name = name
+        self.ctx = ctx
+        feature = ctx.feature_name
+        self.span = span(name, feature=feature) if feature is not None else span(name)
+        self.start = 0.0
+
+    def __enter__(self) -> "_StageTimer":
+        self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.ctx.timings[self.name] = (time.perf_counter() - self.start) * 1000.0
+        self.span.__exit__(exc_type, exc, tb)
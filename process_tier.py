@@ -0,0 +1,250 @@
+"""Process-pool tier for CPU-bound features.
+
+A feature module opts in with ``cpu_bound = True``. When the tier is enabled
+(``ASSISTANT_PROCESS_WORKERS`` = a worker count or ``auto``), its handler runs
+in a worker process instead of the shared thread pool, so a long analysis no
+longer holds the GIL for every other in-flight command.
+
+Only plain values cross the process boundary: the module and handler names,
+the params string, the seconds left on the request deadline and the module's
+optional state snapshot. A module can keep work that must stay in the main
+process (shared state, network I/O) out of the worker by defining
+``cpu_plan(params)`` (pure CPU, runs remotely, returns a picklable plan) and
+``cpu_apply(plan, params, deadline)`` (optionally ``cpu_apply_async``), which
+finishes the call here. A module with per-process state can expose
+``cpu_state()`` (a small picklable snapshot) and ``load_cpu_state(state)``;
+the parent ships its snapshot with the call, the worker returns only what
+the call changed (``cpu_delta()``) and the parent merges it with
+``apply_cpu_delta(delta)``, so concurrent calls never overwrite each other's
+changes. ``warm_worker()`` in the module runs once per worker at
+startup (load models, compile patterns).
+
+If the pool cannot be used (disabled, broken, unpicklable result) callers get
+:class:`TierUnavailable` and run the handler in-process as before.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import importlib
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import feature_registry
+from applog import get_logger
+from deadline import Deadline, DeadlineExceeded, deadline_scope
+
+log = get_logger("process_tier")
+
+WORKERS_ENV = "ASSISTANT_PROCESS_WORKERS"
+
+
+class TierUnavailable(Exception):
+    """The process tier cannot run this call; run it in-process instead."""
+
+
+def configured_workers() -> int:
+    """Worker count from ``ASSISTANT_PROCESS_WORKERS`` (0 = tier disabled)."""
+    raw = os.environ.get(WORKERS_ENV, "").strip().lower()
+    if not raw:
+        return 0
+    if raw == "auto":
+        return max(1, (os.cpu_count() or 2) - 1)
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return 0
+
+
+# --- worker side ---
+
+def _init_worker(modules: Tuple[str, ...]) -> None:
+    for name in modules:
+        try:
+            module = importlib.import_module(f"features.{name}")
+            warm = getattr(module, "warm_worker", None)
+            if callable(warm):
+                warm()
+        except Exception:
+            pass  # the call itself reports import errors
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_in_worker(module_name: str, handler_name: str, params: str,
+                   remaining: Optional[float], state: Any) -> Tuple[Any, Any]:
+    module = importlib.import_module(f"features.{module_name}")
+    if state is not None and hasattr(module, "load_cpu_state"):
+        module.load_cpu_state(state)
+    func = getattr(module, "cpu_plan", None) or getattr(module, handler_name)
+    deadline = Deadline.after(remaining)
+    kwargs = {"deadline": deadline} if feature_registry.accepts_deadline(func) else {}
+    with deadline_scope(deadline):
+        result = func(params, **kwargs)
+    delta = module.cpu_delta() if hasattr(module, "cpu_delta") else None
+    return result, delta
+
+
+# --- parent side ---
+
+_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_stats = {"submitted": 0, "completed": 0, "fallbacks": 0, "restarts": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_stats() -> Dict[str, int]:
+    with _stats_lock:
+        out = dict(_stats)
+    out["workers"] = _pool_workers if _pool is not None else 0
+    return out
+
+
+def enabled() -> bool:
+    return configured_workers() > 0
+
+
+def start(modules: Iterable[str] = (), wait: bool = False) -> bool:
+    """Create the pool and spawn every worker now, pre-warming ``modules``.
+
+    Returns False when the tier is disabled. With ``wait`` the call blocks
+    until every worker has finished its warm-up.
+    """
+    workers = configured_workers()
+    if workers <= 0:
+        return False
+    pool = _get_pool(tuple(sorted(set(modules))), workers)
+    futures = [pool.submit(_ping) for _ in range(workers)]
+    if wait:
+        concurrent.futures.wait(futures)
+    return True
+
+
+def _get_pool(modules: Tuple[str, ...] = (), workers: Optional[int] = None) -> concurrent.futures.ProcessPoolExecutor:
+    global _pool, _pool_workers
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that already runs threads is unsafe
+                ctx = multiprocessing.get_context("spawn")
+                _pool_workers = workers or configured_workers() or 1
+                _pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=_pool_workers, mp_context=ctx,
+                    initializer=_init_worker, initargs=(modules,))
+                log.info("Process tier started: %d workers, warming %s", _pool_workers, modules)
+    return _pool
+
+
+def _reset_pool(broken: concurrent.futures.ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+            _count("restarts")
+            log.warning("Process pool broke; it will be recreated on the next call")
+    try:
+        broken.shutdown(wait=False, cancel_futures=True)
+    except Exception:
+        pass
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def submit(module_name: str, handler_name: str, params: str,
+           deadline: Deadline) -> concurrent.futures.Future:
+    """Queue a worker call; the future yields ``(handler result or plan, state)``."""
+    if not enabled():
+        raise TierUnavailable("process tier disabled")
+    deadline.check()
+    module = importlib.import_module(f"features.{module_name}")
+    state = module.cpu_state() if hasattr(module, "cpu_state") else None
+    pool = _get_pool((module_name,))
+    try:
+        future = pool.submit(_run_in_worker, module_name, handler_name, params,
+                             deadline.remaining(), state)
+    except (BrokenProcessPool, RuntimeError) as e:
+        _reset_pool(pool)
+        _count("fallbacks")
+        raise TierUnavailable(str(e)) from e
+    _count("submitted")
+    future.pool = pool  # type: ignore[attr-defined]
+    return future
+
+
+def _settle(module_name: str, future: concurrent.futures.Future) -> Any:
+    # Called with a finished future: merge the worker's changes, map pool errors
+    try:
+        result, delta = future.result(0)
+    except BrokenProcessPool as e:
+        _reset_pool(future.pool)  # type: ignore[attr-defined]
+        _count("fallbacks")
+        raise TierUnavailable(str(e)) from e
+    except (pickle.PicklingError, TypeError) as e:
+        if isinstance(e, TypeError) and "pickle" not in str(e):
+            raise
+        _count("fallbacks")
+        raise TierUnavailable(str(e)) from e
+    _count("completed")
+    if delta is not None:
+        module = sys.modules[f"features.{module_name}"]
+        if hasattr(module, "apply_cpu_delta"):
+            module.apply_cpu_delta(delta)
+    return result
+
+
+def call(module_name: str, handler_name: str, params: str, deadline: Deadline) -> Any:
+    """Run a CPU-bound feature through a worker and wait for its result.
+
+    With ``cpu_plan`` in the module only the plan is computed remotely;
+    ``cpu_apply(plan, params, deadline)`` then finishes the call here.
+    """
+    future = submit(module_name, handler_name, params, deadline)
+    try:
+        concurrent.futures.wait([future], timeout=deadline.remaining())
+    finally:
+        if not future.done():
+            future.cancel()  # a started call stops at its own deadline check
+    if not future.done():
+        raise DeadlineExceeded("process tier call timed out")
+    result = _settle(module_name, future)
+    module = sys.modules[f"features.{module_name}"]
+    if hasattr(module, "cpu_plan"):
+        return module.cpu_apply(result, params, deadline=deadline)
+    return result
+
+
+async def call_async(module_name: str, handler_name: str, params: str, deadline: Deadline,
+                     run_sync: Callable[..., Awaitable[Any]]) -> Any:
+    """Like :func:`call` but awaited; ``run_sync(func, *args)`` runs a sync ``cpu_apply``."""
+    future = submit(module_name, handler_name, params, deadline)
+    await asyncio.wait([asyncio.wrap_future(future)], timeout=deadline.remaining())
+    if not future.done():
+        future.cancel()
+        raise DeadlineExceeded("process tier call timed out")
+    result = _settle(module_name, future)
+    module = sys.modules[f"features.{module_name}"]
+    if not hasattr(module, "cpu_plan"):
+        return result
+    apply_async = getattr(module, "cpu_apply_async", None)
+    if apply_async is not None:
+        return await apply_async(result, params, deadline=deadline)
+    return await run_sync(functools.partial(module.cpu_apply, deadline=deadline), result, params)
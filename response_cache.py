@@ -0,0 +1,138 @@
+"""Shared response cache for idempotent feature handlers.
+
+A feature opts in by declaring a policy in its module (copied into the
+feature manifest)::
+
+    response_cache = {"ttl": 300, "key": "accentless", "time_varying": False}
+
+- ``ttl``: seconds a reply stays valid (required, > 0)
+- ``key``: how the handler params become the cache key: ``"raw"``,
+  ``"normalized"`` (lowercase, collapsed spaces; the default),
+  ``"accentless"`` (also without diacritics) or the name of a module-level
+  function ``(params) -> str | None``; None means "do not cache this one"
+- ``time_varying``: the reply depends on the wall clock, so entries are
+  also bucketed by ``time.time() // ttl`` (a clock reply never outlives its
+  minute)
+
+Only the handler's own result is cached; the pipeline still decorates,
+enhances and records every request, hit or miss.
+"""
+
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+from normalization import collapse, fold
+from ttl_cache import MISSING, TTLCache
+
+KEY_FUNCTIONS: Dict[str, Callable[[str], str]] = {
+    "raw": lambda params: params,
+    "normalized": collapse,
+    "accentless": fold,
+}
+
+
+class CachePolicy(NamedTuple):
+    ttl: float
+    key: str = "normalized"
+    time_varying: bool = False
+
+
+def parse_policy(raw: Any) -> Optional[CachePolicy]:
+    """CachePolicy from a module attribute / manifest entry (None when absent or invalid)."""
+    if isinstance(raw, CachePolicy):
+        return raw
+    if not isinstance(raw, dict):
+        return None
+    try:
+        ttl = float(raw.get("ttl", 0))
+    except (TypeError, ValueError):
+        return None
+    if ttl <= 0:
+        return None
+    key = raw.get("key") or "normalized"
+    if not isinstance(key, str):
+        return None
+    return CachePolicy(ttl, key, bool(raw.get("time_varying", False)))
+
+
+def policy_to_manifest(policy: Optional[CachePolicy]) -> Optional[Dict[str, Any]]:
+    return policy._asdict() if policy is not None else None
+
+
+class ResponseCache:
+    """Bounded LRU of handler replies keyed by (scope, feature, key(params)[, time bucket]).
+
+    ``scope()`` is part of every key; the assistant passes the registry
+    generation, so reloading features drops every cached reply at once.
+    """
+
+    def __init__(self, maxsize: int = 512, scope: Callable[[], Hashable] = lambda: None,
+                 clock: Callable[[], float] = time.monotonic,
+                 wall_clock: Callable[[], float] = time.time):
+        self._cache = TTLCache(maxsize=maxsize, clock=clock)
+        self._scope = scope
+        self._wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self._by_feature: Dict[str, Dict[str, int]] = {}
+        self._uncacheable = 0
+
+    def _key(self, feature: str, policy: CachePolicy, params: str) -> Optional[Hashable]:
+        func = KEY_FUNCTIONS.get(policy.key)
+        if func is None:
+            # Custom key function of an already imported feature module
+            module = sys.modules.get(f"features.{feature}")
+            func = getattr(module, policy.key, None) if module is not None else None
+            if not callable(func):
+                return None
+        try:
+            key = func(params or "")
+        except Exception:
+            return None
+        if key is None:
+            return None
+        if policy.time_varying:
+            return (self._scope(), feature, key, int(self._wall_clock() // policy.ttl))
+        return (self._scope(), feature, key)
+
+    def _count(self, feature: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._by_feature.setdefault(feature, {"hits": 0, "misses": 0, "stores": 0})
+            counts[outcome] += 1
+
+    def get(self, feature: str, policy: CachePolicy, params: str) -> Any:
+        """Cached reply, or ``MISSING``."""
+        key = self._key(feature, policy, params)
+        if key is None:
+            with self._lock:
+                self._uncacheable += 1
+            return MISSING
+        value = self._cache.get(key)
+        self._count(feature, "misses" if value is MISSING else "hits")
+        return value
+
+    def put(self, feature: str, policy: CachePolicy, params: str, value: Any) -> bool:
+        key = self._key(feature, policy, params)
+        if key is None:
+            return False
+        self._cache.put(key, value, ttl=policy.ttl)
+        self._count(feature, "stores")
+        return True
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Overall cache stats plus hits/misses/stores per feature."""
+        out = self._cache.stats()
+        with self._lock:
+            out["uncacheable"] = self._uncacheable
+            out["features"] = {name: dict(c) for name, c in self._by_feature.items()}
+        return out
+
+    def reset_stats(self) -> None:
+        self._cache.reset_stats()
+        with self._lock:
+            self._by_feature.clear()
+            self._uncacheable = 0
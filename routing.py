@@ -0,0 +1,141 @@
+"""Declarative early-routing rules compiled into a single-pass matcher.
+
+The rule table lives in ``routing_rules.json`` next to this module. Each rule
+names a target (a built-in handler or a feature module), the phrases that
+trigger it and optional guards. At load time every ``substrings`` phrase is
+normalized and compiled into one Aho-Corasick automaton, and every ``tokens``
+entry goes into a token -> rules index, so routing a command costs one scan of
+the normalized text plus one pass over its tokens.
+
+Rule fields:
+- ``name``: identifier used in logs/stats.
+- ``priority``: lower runs first (ties keep file order).
+- ``handler`` | ``feature``: built-in handler name, or feature module name.
+- ``substrings``: phrases matched anywhere in the normalized command.
+- ``tokens``: exact tokens matched against the tokenized command.
+- ``requires``: extra guards evaluated by the router (e.g. ``"configured"``, ``"digit"``).
+- ``params``: ``"command"`` (default), ``"empty"`` or ``"after_token"``.
+"""
+
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from aho_corasick import AhoCorasick
+from applog import get_logger
+
+log = get_logger("routing")
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_rules.json")
+
+PARAM_MODES = ("command", "empty", "after_token")
+
+
+class RoutingRule(NamedTuple):
+    name: str
+    priority: int
+    handler: Optional[str]
+    feature: Optional[str]
+    substrings: Tuple[str, ...]
+    tokens: Tuple[str, ...]
+    requires: Tuple[str, ...]
+    params: str
+
+
+class RuleMatch(NamedTuple):
+    rule: RoutingRule
+    token: Optional[str]  # first matching token (in rule order) when matched via tokens
+
+
+class RouteTable:
+    """Compiled form of the routing rules."""
+
+    def __init__(self, rules: Sequence[RoutingRule], normalize: Callable[[str], str]):
+        self.rules: List[RoutingRule] = sorted(rules, key=lambda r: r.priority)
+        self._automaton = AhoCorasick()
+        self._token_index: Dict[str, List[int]] = {}
+        for idx, rule in enumerate(self.rules):
+            for phrase in rule.substrings:
+                self._automaton.add(normalize(phrase), idx)
+            for tok in rule.tokens:
+                self._token_index.setdefault(tok.lower(), []).append(idx)
+        self._automaton.build()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def matches(self, norm_cmd: str, tokens: Sequence[str]) -> Iterator[RuleMatch]:
+        """Yield rules whose phrases occur in the command, in priority order."""
+        hit = self._automaton.find_payloads(norm_cmd)
+        token_hit: Dict[int, None] = {}
+        for tok in tokens:
+            for idx in self._token_index.get(tok, ()):
+                token_hit[idx] = None
+        if not hit and not token_hit:
+            return
+        for idx in sorted(hit.union(token_hit)):
+            rule = self.rules[idx]
+            matched_token = None
+            if idx not in hit and rule.params == "after_token":
+                # Preserve rule order: the first listed token present wins
+                for tok in rule.tokens:
+                    if tok in tokens:
+                        matched_token = tok
+                        break
+            yield RuleMatch(rule, matched_token)
+
+
+def _parse_rule(raw: Dict, order: int) -> RoutingRule:
+    name = str(raw.get("name") or f"rule_{order}")
+    handler = raw.get("handler")
+    feature = raw.get("feature")
+    if bool(handler) == bool(feature):
+        raise ValueError(f"rule '{name}' must set exactly one of 'handler' or 'feature'")
+    params = str(raw.get("params") or "command")
+    if params not in PARAM_MODES:
+        raise ValueError(f"rule '{name}' has unknown params mode '{params}'")
+    return RoutingRule(
+        name=name,
+        priority=int(raw.get("priority", order)),
+        handler=str(handler) if handler else None,
+        feature=str(feature) if feature else None,
+        substrings=tuple(str(s) for s in raw.get("substrings", []) if s),
+        tokens=tuple(str(t) for t in raw.get("tokens", []) if t),
+        requires=tuple(str(g) for g in raw.get("requires", []) if g),
+        params=params,
+    )
+
+
+def load_rules(path: str = RULES_PATH) -> List[RoutingRule]:
+    """Read and validate the rule table; raises on malformed files."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    raw_rules = data.get("rules", []) if isinstance(data, dict) else data
+    return [_parse_rule(r, i) for i, r in enumerate(raw_rules)]
+
+
+_table: Optional[RouteTable] = None
+_table_lock = threading.Lock()
+
+
+def get_route_table(normalize: Callable[[str], str], path: str = RULES_PATH) -> RouteTable:
+    """Return the compiled table, building it on first use."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                try:
+                    rules = load_rules(path)
+                except Exception as e:
+                    log.error("Failed to load routing rules from %s: %s", path, e)
+                    rules = []
+                _table = RouteTable(rules, normalize)
+    return _table
+
+
+def reload_route_table() -> None:
+    """Drop the compiled table so the next lookup re-reads the rule file."""
+    global _table
+    with _table_lock:
+        _table = None
@@ -0,0 +1,222 @@
+"""Priority-aware thread scheduler for request work.
+
+Work is submitted in one of three classes, served in this order:
+
+- ``interactive``: what the user just typed (GUI, CLI, ``dispatch``)
+- ``background``: warmups and reminder-triggered actions
+- ``batch``: replays and automation chains
+
+Each class has its own FIFO queue and a concurrency limit. A free worker
+always takes the oldest task of the most urgent class that is still under its
+limit. The background and batch limits add up to less than the pool size, so
+some workers stay free for interactive work however much batch work is queued.
+
+:class:`PriorityScheduler` is a :class:`concurrent.futures.Executor`, so it
+can be passed to ``loop.run_in_executor``. A plain ``submit`` uses the ambient
+class set by :func:`priority_scope`, which is interactive by default. Tasks run
+with their class as the ambient one, so work they submit inherits it.
+"""
+
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BACKGROUND, BATCH)
+
+_current_priority: ContextVar[str] = ContextVar("request_priority", default=INTERACTIVE)
+_worker_local = threading.local()
+
+
+def _check(priority: str) -> str:
+    if priority not in PRIORITIES:
+        raise ValueError(f"unknown priority class {priority!r} (expected one of {PRIORITIES})")
+    return priority
+
+
+def current_priority() -> str:
+    """Ambient priority class for work submitted from here."""
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: str) -> Iterator[str]:
+    """Make ``priority`` the ambient class for the duration of the block."""
+    token = _current_priority.set(_check(priority))
+    try:
+        yield priority
+    finally:
+        _current_priority.reset(token)
+
+
+def running_priority() -> Optional[str]:
+    """Class of the scheduler task running on this thread (None outside a worker)."""
+    return getattr(_worker_local, "priority", None)
+
+
+class _Task:
+    __slots__ = ("future", "fn", "args", "kwargs", "priority", "enqueued_at")
+
+    def __init__(self, future, fn, args, kwargs, priority):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+
+
+class _ClassState:
+    __slots__ = ("limit", "queue", "running", "submitted", "completed", "max_queued",
+                 "wait_total", "wait_max")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.queue: Deque[_Task] = deque()
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class PriorityScheduler(concurrent.futures.Executor):
+    """Shared worker threads serving priority classes with per-class limits."""
+
+    def __init__(self, max_workers: int, limits: Optional[Dict[str, int]] = None,
+                 name: str = "scheduler"):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self._max_workers = max_workers
+        self._name = name
+        limits = dict(limits or {})
+        self._classes = {
+            p: _ClassState(max(1, min(int(limits.get(p, max_workers)), max_workers))) for p in PRIORITIES
+        }
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._waiting = 0
+        self._shutdown = False
+
+    # --- submission ---
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> concurrent.futures.Future:
+        return self.submit_as(current_priority(), fn, *args, **kwargs)
+
+    def submit_as(self, priority: str, fn: Callable, /, *args, **kwargs) -> concurrent.futures.Future:
+        """Queue ``fn(*args, **kwargs)`` in the given priority class."""
+        _check(priority)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            st = self._classes[priority]
+            st.queue.append(_Task(future, fn, args, kwargs, priority))
+            st.submitted += 1
+            st.max_queued = max(st.max_queued, len(st.queue))
+            queued = sum(len(c.queue) for c in self._classes.values())
+            if self._waiting < queued and len(self._threads) < self._max_workers:
+                self._spawn()
+            self._cond.notify()
+        return future
+
+    def _spawn(self) -> None:
+        t = threading.Thread(target=self._worker, name=f"{self._name}-{len(self._threads)}", daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    # --- workers ---
+
+    def _next_task(self) -> Optional[_Task]:
+        # Caller holds the lock: oldest task of the most urgent class under its limit
+        for priority in PRIORITIES:
+            st = self._classes[priority]
+            while st.queue and st.running < st.limit:
+                task = st.queue.popleft()
+                if not task.future.set_running_or_notify_cancel():
+                    continue  # cancelled while queued
+                st.running += 1
+                waited = time.perf_counter() - task.enqueued_at
+                st.wait_total += waited
+                st.wait_max = max(st.wait_max, waited)
+                return task
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._waiting += 1
+                    self._cond.wait()
+                    self._waiting -= 1
+                    task = self._next_task()
+            self._run(task)
+
+    def _run(self, task: _Task) -> None:
+        _worker_local.priority = task.priority
+        token = _current_priority.set(task.priority)
+        error: Optional[BaseException] = None
+        result = None
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except BaseException as e:
+            error = e
+        finally:
+            _current_priority.reset(token)
+            _worker_local.priority = None
+        # Release the slot before resolving so waiters see consistent stats
+        with self._cond:
+            st = self._classes[task.priority]
+            st.running -= 1
+            st.completed += 1
+            if st.queue:
+                self._cond.notify()  # a slot opened for this class
+        if error is not None:
+            task.future.set_exception(error)
+            error = None
+        else:
+            task.future.set_result(result)
+
+    # --- lifecycle and metrics ---
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for st in self._classes.values():
+                    while st.queue:
+                        st.queue.popleft().future.cancel()
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for t in threads:
+                if t is not threading.current_thread():
+                    t.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, running count, limit and queue wait (ms) per class."""
+        with self._cond:
+            out: Dict[str, Any] = {"workers": len(self._threads), "max_workers": self._max_workers}
+            for priority, st in self._classes.items():
+                started = st.completed + st.running
+                out[priority] = {
+                    "queued": len(st.queue),
+                    "running": st.running,
+                    "limit": st.limit,
+                    "submitted": st.submitted,
+                    "completed": st.completed,
+                    "max_queued": st.max_queued,
+                    "avg_wait_ms": (st.wait_total / started * 1000.0) if started else 0.0,
+                    "max_wait_ms": st.wait_max * 1000.0,
+                }
+            return out
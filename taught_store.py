@@ -0,0 +1,152 @@
+"""In-memory store for taught replies ("day: <pattern> => <reply>").
+
+The pairs in ``taught.json`` are loaded once into an Aho-Corasick index, so
+looking a command up costs one scan of the command instead of a file read
+plus a substring test per taught pattern. The file is re-read only when its
+mtime changes (checked at most every ``check_interval`` seconds), and new
+rules are written back atomically after ``debounce`` seconds so a burst of
+teaching produces a single write.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from aho_corasick import AhoCorasick
+from applog import get_logger
+
+log = get_logger("taught_store")
+
+
+class TaughtStore:
+    """Thread-safe taught-reply index backed by a JSON file."""
+
+    def __init__(self, path: str, debounce: float = 0.5, check_interval: float = 1.0,
+                 clock=time.monotonic) -> None:
+        self.path = path
+        self.debounce = debounce
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._pairs: Dict[str, str] = {}
+        self._keys: List[str] = []
+        self._index = AhoCorasick().build()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._loaded = False
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self.reloads = 0
+        self.writes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._maybe_reload()
+            return len(self._pairs)
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _rebuild(self) -> None:
+        index = AhoCorasick()
+        self._keys = list(self._pairs)
+        for pos, key in enumerate(self._keys):
+            # Payload is the insertion position: the earliest taught rule wins,
+            # like the old in-order scan of the dict
+            index.add(key, pos)
+        self._index = index.build()
+
+    def _maybe_reload(self) -> None:
+        now = self._clock()
+        if self._loaded and now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        mtime = self._file_mtime()
+        if self._loaded and (mtime == self._mtime or self._dirty):
+            # Unchanged, or we hold newer unsaved rules that will overwrite it
+            return
+        pairs: Dict[str, str] = {}
+        if mtime is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    pairs = {str(k): str(v) for k, v in data.items()}
+            except Exception:
+                pairs = {}
+        self._pairs = pairs
+        self._mtime = mtime
+        self._loaded = True
+        self._rebuild()
+        self.reloads += 1
+
+    def lookup(self, norm_cmd: str) -> Optional[str]:
+        """Reply of the earliest taught pattern that occurs in ``norm_cmd``, if any."""
+        with self._lock:
+            self._maybe_reload()
+            if not self._keys or not norm_cmd:
+                return None
+            hits = self._index.find_payloads(norm_cmd)
+            if not hits:
+                return None
+            return self._pairs.get(self._keys[min(hits)])
+
+    def teach(self, key: str, value: str) -> None:
+        """Add or replace a rule; the file write is debounced."""
+        with self._lock:
+            self._maybe_reload()
+            if key in self._pairs:
+                self._pairs[key] = value  # position (priority) unchanged
+            else:
+                self._pairs[key] = value
+                self._rebuild()
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write pending rules now (atomic replace of the JSON file)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._pairs, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+                self._mtime = self._file_mtime()
+                self._dirty = False
+                self.writes += 1
+            except Exception as e:
+                log.warning("Could not save taught replies to %s: %s", self.path, e)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+
+_stores: Dict[str, TaughtStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_taught_store(path: str) -> TaughtStore:
+    """Shared store for ``path``; pending writes are flushed at interpreter exit."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = TaughtStore(path)
+            _stores[path] = store
+            atexit.register(store.flush)
+        return store
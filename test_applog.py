@@ -0,0 +1,57 @@
+import io
+import logging
+import os
+import tempfile
+import unittest
+
+import applog
+
+
+class _Loud:
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "loud"
+
+
+class TestAppLog(unittest.TestCase):
+    def tearDown(self):
+        applog.shutdown()
+        applog.configure()
+
+    def test_disabled_debug_never_formats_and_ring_is_bounded(self):
+        applog.configure(level="INFO", ring_size=3, console=False)
+        log = applog.get_logger("test")
+        arg = _Loud()
+        log.debug("value %s", arg)
+        self.assertEqual(arg.formatted, 0)
+        for i in range(5):
+            log.info("line %d", i)
+        lines = applog.recent()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[-1].endswith("line 4"))
+        self.assertEqual(len(applog.recent(1)), 1)
+
+    def test_file_sink_and_unencodable_console(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "assistant.log")
+            applog.configure(level=logging.DEBUG, file_path=path, console=False)
+            stream = io.TextIOWrapper(io.BytesIO(), encoding="ascii")
+            handler = applog.SafeStreamHandler(stream)
+            log = applog.get_logger("test")
+            log.addHandler(handler)
+            try:
+                log.debug("Xin chào %s", "thế giới")
+            finally:
+                log.removeHandler(handler)
+            applog.shutdown()
+            with open(path, encoding="utf-8") as f:
+                self.assertIn("Xin chào thế giới", f.read())
+            stream.seek(0)
+            self.assertIn("Xin ch?o", stream.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
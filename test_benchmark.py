@@ -0,0 +1,74 @@
+import os
+import unittest
+
+import benchmark
+
+
+class TestCorpusAndBaseline(unittest.TestCase):
+    def test_corpus_repeats_by_capped_weight(self):
+        data = {"usage_patterns": {"mấy giờ rồi": 2.4, "thông tin hệ thống": 50, "cũ": 0, "": 3}}
+        corpus = benchmark.load_corpus(data, max_repeat=5)
+        self.assertEqual(corpus.count("mấy giờ rồi"), 3)
+        self.assertEqual(corpus.count("thông tin hệ thống"), 5)
+        self.assertEqual(len(corpus), 8)
+        self.assertEqual(corpus, benchmark.load_corpus(data, max_repeat=5))  # fixed order
+
+    def test_compare_flags_real_regressions_only(self):
+        def report(route_p95, total_p95, per_second):
+            return {
+                "latency": {"total": {"p50": 1.0, "p95": total_p95, "p99": total_p95},
+                            "stages": {"route": {"p95": route_p95}}, "features": {}},
+                "throughput": {"4": {"per_second": per_second}},
+            }
+
+        baseline = report(0.1, 10.0, 1000.0)
+        # route tripled but by less than min_delta: noise, not a regression
+        self.assertEqual(benchmark.compare(report(0.3, 11.0, 900.0), baseline), [])
+        problems = benchmark.compare(report(0.3, 20.0, 500.0), baseline)
+        self.assertEqual(len(problems), 3)  # total p95, total p99, throughput
+        self.assertTrue(any(p.startswith("throughput@4") for p in problems))
+
+
+class TestOfflineReplay(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import assistant
+        assistant.load_features_async().join()
+
+    def test_replay_is_stubbed_and_side_effect_free(self):
+        import assistant
+        import features.ai_enhancements as ai_enhancements
+        import features.memory as memory
+        import features.nlp_processor as nlp_processor
+        import features.provider_prefs as provider_prefs
+        import features.reminder as reminder
+        watched = [reminder.REMINDER_FILE, assistant._TAUGHT_PATH, provider_prefs._config_path()]
+
+        def mtimes():
+            return [os.path.getmtime(p) if os.path.exists(p) else None for p in watched]
+
+        learned = nlp_processor.get_nlp_processor().learned_patterns
+        before, learned_before = mtimes(), learned.stats()
+        ai = ai_enhancements.get_ai_assistant()
+        turns, conversations = memory.get_memory().get_recent(200), list(ai.user_data.get("conversations") or [])
+        corpus = ["mấy giờ rồi", "tính 2 + 3", "thời tiết hà nội", "nhắc tôi họp lúc 15h ngày mai",
+                  "đâu là thủ đô của mỹ", "phân tích câu này giúp tôi", "day: xin chao bench => chao ban",
+                  "xoa lich su hoi thoai"]
+        with benchmark.sandbox() as tmp:
+            latency = benchmark.measure_latency(corpus, repeat=1)
+            throughput = benchmark.measure_throughput(corpus, levels=(1, 2))
+            self.assertEqual(assistant._TAUGHT_PATH, os.path.join(tmp, "taught.json"))
+        self.assertEqual(before, mtimes())
+        self.assertEqual(learned_before, learned.stats())  # no learning between passes
+        self.assertEqual(turns, memory.get_memory().get_recent(200))
+        self.assertEqual(conversations, list(ai.user_data.get("conversations") or []))
+        self.assertEqual((latency["requests"], latency["errors"]), (8, 0))
+        self.assertIn("route", latency["stages"])
+        self.assertIn("calculator", latency["features"])
+        self.assertIn("nlp_processor", latency["features"])
+        self.assertEqual(set(throughput), {"1", "2"})
+        self.assertGreater(throughput["2"]["per_second"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import assistant
+import daemon_client
+from daemon import AssistantDaemon
+
+
+async def fake_dispatch(command, deadline=None):
+    await asyncio.sleep(0.2 if command == "slow" else 0)
+    return f"reply:{command}"
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "assistant.sock")
+        patcher = mock.patch.object(assistant, "dispatch", side_effect=fake_dispatch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        serving = asyncio.run_coroutine_threadsafe(AssistantDaemon(self.path).serve_forever(), loop)
+
+        def stop():
+            loop.call_soon_threadsafe(serving.cancel)
+            time.sleep(0.05)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(1)
+            loop.close()
+        self.addCleanup(stop)
+        for _ in range(100):
+            if daemon_client.ping(self.path):
+                break
+            time.sleep(0.01)
+
+    def test_results_stream_as_they_finish(self):
+        events = list(daemon_client.request({"id": 7, "commands": ["slow", "fast"]}, self.path))
+        self.assertEqual([e["event"] for e in events], ["result", "result", "done"])
+        self.assertEqual([e["index"] for e in events[:2]], [1, 0])
+        self.assertEqual(events[0]["result"], "reply:fast")
+        self.assertTrue(all(e["id"] == 7 for e in events))
+
+    def test_concurrent_connections_and_bad_requests(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.extend(
+            daemon_client.send_commands(["slow"], self.path))) for _ in range(4)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertEqual(len(results), 4)
+        with self.assertRaises(RuntimeError):
+            list(daemon_client.send_commands([1], self.path))  # type: ignore[list-item]
+
+    def test_serial_commands_run_in_request_order(self):
+        with mock.patch.object(assistant, "serial_feature",
+                               side_effect=lambda c: "reminder" if c in ("slow", "list") else None):
+            events = list(daemon_client.request({"id": 1, "commands": ["slow", "list", "fast"]}, self.path))
+        results = [e["command"] for e in events if e["event"] == "result"]
+        # "list" waits for "slow" (same serial feature); "fast" is not held back
+        self.assertEqual(results, ["fast", "slow", "list"])
+
+    def test_socket_is_private_and_foreign_sockets_are_refused(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        with mock.patch.object(daemon_client, "_uid", return_value=os.getuid() + 1):
+            self.assertFalse(daemon_client.ping(self.path))
+            with self.assertRaises(PermissionError):
+                list(daemon_client.send_commands(["fast"], self.path))
+
+
+@unittest.skipUnless(hasattr(os, "getuid"), "needs Unix user ids")
+class TestSocketPath(unittest.TestCase):
+    def test_default_path_without_runtime_dir_is_in_a_private_dir(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(tempfile, "gettempdir", return_value=tmp), \
+                mock.patch.dict(os.environ, clear=True):
+            path = daemon_client.default_socket_path()
+            directory = os.path.dirname(path)
+            self.assertEqual(directory, os.path.join(tmp, f"assistant-{os.getuid()}"))
+            daemon_client.ensure_private_dir(directory)
+            self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+            daemon_client.ensure_private_dir(directory)  # existing and private: fine
+            os.chmod(directory, 0o755)
+            with self.assertRaises(PermissionError):
+                daemon_client.ensure_private_dir(directory)
+            with mock.patch.object(daemon_client, "_uid", return_value=os.getuid() + 1):
+                os.chmod(directory, 0o700)
+                with self.assertRaises(PermissionError):
+                    daemon_client.ensure_private_dir(directory)
+
+
+class TestThinClient(unittest.TestCase):
+    def test_falls_back_only_when_no_daemon_is_listening(self):
+        import cli
+        with mock.patch.object(assistant, "run_feature", return_value="local") as local, \
+                mock.patch.object(assistant, "initialize_assistant"), \
+                mock.patch.object(assistant, "features_loaded"), \
+                mock.patch("sys.stderr"), mock.patch.object(cli, "safe_print"):
+            with mock.patch.object(daemon_client, "send_commands", side_effect=ConnectionRefusedError):
+                self.assertEqual(cli.send(["nhắc tôi họp"]), 0)
+            self.assertEqual(local.call_count, 1)
+            # A timeout after the request was sent must not re-run the command locally
+            with mock.patch.object(daemon_client, "send_commands", side_effect=socket.timeout("timed out")):
+                self.assertEqual(cli.send(["nhắc tôi họp"]), 1)
+            self.assertEqual(local.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
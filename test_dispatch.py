@@ -0,0 +1,302 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import assistant
+from async_http import fetch_json
+from deadline import Deadline, DeadlineExceeded, current_deadline
+from pipeline import ResolvedFeature
+
+_cancelled = []
+
+
+def echo(params):
+    return f"sync:{params}"
+
+
+def slow(params):
+    return "sync"
+
+
+async def slow_async(params):
+    try:
+        await asyncio.sleep(5)
+    except asyncio.CancelledError:
+        _cancelled.append(params)
+        raise
+    return "async"
+
+
+def twin(params):
+    return "sync"
+
+
+async def twin_async(params):
+    return f"async:{params}"
+
+
+_released = []
+
+
+def busy(params):
+    # Cooperative sync handler: polls the ambient request deadline
+    dl = current_deadline()
+    while True:
+        try:
+            dl.check()
+        except DeadlineExceeded:
+            _released.append(params)
+            raise
+        time.sleep(0.01)
+
+
+def _patch_routing(test, route):
+    """Route every command with ``route(command) -> ResolvedFeature`` and skip taught/memory."""
+    for target, kw in (("_resolve_feature", {"side_effect": lambda c, nc: route(c)}),
+                       ("_taught_reply", {"return_value": None}),
+                       ("_record_turn", {})):
+        patcher = mock.patch.object(assistant, target, **kw)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+def _routed_to(test, func):
+    _patch_routing(test, lambda c: ResolvedFeature("stub", func, "p"))
+
+
+class TestDispatch(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(assistant, "_enhance", side_effect=lambda r, c, s: r)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prefers_coroutine_twin(self):
+        _routed_to(self, twin)
+        self.assertEqual(asyncio.run(assistant.dispatch("x")), "async:p")
+
+    def test_sync_handler_runs_in_executor(self):
+        _routed_to(self, echo)
+        self.assertEqual(asyncio.run(assistant.dispatch("x")), "sync:p")
+
+    def test_deadline_cancels_native_handler(self):
+        _cancelled.clear()
+        _routed_to(self, slow)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(assistant.dispatch("x", deadline=time.monotonic() + 0.05))
+        self.assertEqual(_cancelled, ["p"])
+
+
+class TestDeadline(unittest.TestCase):
+    def test_child_is_bounded_by_parent_and_cancellation(self):
+        now = [0.0]
+        parent = Deadline(5.0, clock=lambda: now[0])
+        child = parent.child(10.0)
+        self.assertEqual(child.remaining(), 5.0)
+        self.assertEqual(child.timeout(30.0), 5.0)
+        self.assertIsNone(Deadline().timeout(None))
+        parent.cancel()
+        self.assertTrue(child.expired())
+        with self.assertRaises(DeadlineExceeded):
+            child.timeout(1.0)
+
+    def test_http_post_refuses_expired_deadline(self):
+        from features import gemini_bridge
+        with self.assertRaises(DeadlineExceeded):
+            gemini_bridge._http_post("http://127.0.0.1:9/", {}, {}, deadline=Deadline(time.monotonic() - 1))
+
+
+class TestRunFeatureDeadline(unittest.TestCase):
+    def test_timeout_releases_worker_and_is_counted(self):
+        _released.clear()
+        before = assistant.get_request_stats()
+        _routed_to(self, busy)
+        started = time.monotonic()
+        self.assertEqual(assistant.run_feature("x", timeout=0.1), assistant.TIMEOUT_REPLY)
+        self.assertLess(time.monotonic() - started, 1.0)
+        for _ in range(100):
+            if assistant.get_request_stats()["timeouts"] > before["timeouts"]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(_released, ["p"])
+        after = assistant.get_request_stats()
+        self.assertEqual(after["timeouts"], before["timeouts"] + 1)
+        self.assertEqual(after["errors"], before["errors"])
+
+
+_calls = []
+
+
+def nap(params):
+    _calls.append(params)
+    time.sleep(0.1)
+    return f"done:{params}"
+
+
+def ordered(params):
+    _calls.append(params)
+    time.sleep(0.01 if params == "a" else 0)
+    return params
+
+
+def _route_by_command(command):
+    func = ordered if command.startswith("o:") else nap
+    return ResolvedFeature(func.__name__, func, command.split(":", 1)[1])
+
+
+class TestRunFeaturesBatch(unittest.TestCase):
+    def setUp(self):
+        _calls.clear()
+        _patch_routing(self, _route_by_command)
+        for target, kw in (("_enhance", {"side_effect": lambda r, c, s: r}),):
+            patcher = mock.patch.object(assistant, target, **kw)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_dedupes_runs_concurrently_and_keeps_order(self):
+        commands = [f"n:{i}" for i in range(6)] + ["n:0", "n:3"]
+        started = time.monotonic()
+        results = assistant.run_features_batch(commands, max_concurrency=6)
+        self.assertLess(time.monotonic() - started, 0.45)
+        self.assertEqual([r.result for r in results], [f"done:{c[2:]}" for c in commands])
+        self.assertEqual(sorted(_calls), [str(i) for i in range(6)])
+        self.assertTrue(all(r.status == "ok" and r.run_ms >= 100 for r in results))
+
+    def test_serial_feature_keeps_relative_order(self):
+        with mock.patch("feature_registry.is_serial", side_effect=lambda f: f is ordered):
+            results = assistant.run_features_batch(["o:a", "n:x", "o:b", "o:c"], max_concurrency=4)
+        self.assertEqual([c for c in _calls if c in "abc"], ["a", "b", "c"])
+        self.assertEqual([r.feature for r in results], ["ordered", "nap", "ordered", "ordered"])
+
+    def test_repeated_serial_commands_are_not_deduped(self):
+        with mock.patch("feature_registry.is_serial", side_effect=lambda f: f is ordered):
+            results = assistant.run_features_batch(["o:list", "o:add", "o:list", "n:x", "n:x"])
+        self.assertEqual([c for c in _calls if c != "x"], ["list", "add", "list"])
+        self.assertEqual(_calls.count("x"), 1)  # stateless repeats still run once
+        self.assertEqual([r.result for r in results], ["list", "add", "list", "done:x", "done:x"])
+        self.assertIsNot(results[0], results[2])
+
+
+def weak_nlp(params):
+    time.sleep(0.2)
+    return "Xin loi, toi khong hieu" if "sao" in params else "Câu trả lời đầy đủ"
+
+
+def slow_provider(command, deadline):
+    time.sleep(0.2)
+    return "provider"
+
+
+async def slow_provider_async(command, deadline):
+    await asyncio.sleep(0.2)
+    return "provider"
+
+
+class TestSpeculativeEscalation(unittest.TestCase):
+    def setUp(self):
+        _patch_routing(self, lambda c: ResolvedFeature("nlp_processor", weak_nlp, c))
+        for target, kw in (("_enhance", {"side_effect": lambda r, c, s: r}),
+                           ("_escalate", {"side_effect": slow_provider}),
+                           ("_escalate_async", {"side_effect": slow_provider_async})):
+            patcher = mock.patch.object(assistant, target, **kw)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("features.provider_prefs.get_speculative_escalation", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_provider_overlaps_weak_nlp_answer(self):
+        before = assistant.get_speculation_stats()
+        started = time.monotonic()
+        self.assertEqual(assistant.run_feature("tại sao trời mưa?"), "provider")
+        self.assertLess(time.monotonic() - started, 0.35)
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(assistant.dispatch("tại sao trời mưa?")), "provider")
+        self.assertLess(time.monotonic() - started, 0.35)
+        after = assistant.get_speculation_stats()
+        self.assertEqual(after["used"], before["used"] + 2)
+
+    def test_busy_workers_skip_instead_of_queueing(self):
+        release = threading.Event()
+        assistant._escalate.side_effect = lambda c, d: release.wait(5) and "provider"  # ignores cancel
+
+        def start():
+            return assistant._start_speculation("tại sao trời mưa?", "nlp_processor", Deadline())
+
+        before = assistant.get_speculation_stats()
+        busy = [start() for _ in range(assistant.SPECULATION_WORKERS)]
+        self.assertNotIn(None, busy)
+        self.assertIsNone(start())
+        for spec in busy:
+            spec.cancel()  # abandoned but still on the wire
+        self.assertIsNone(start())
+        self.assertEqual(assistant.get_speculation_stats()["skipped"], before["skipped"] + 2)
+        release.set()
+        for spec in busy:
+            spec.future.result(timeout=1)
+        limit = time.monotonic() + 1
+        spec = start()
+        while spec is None and time.monotonic() < limit:  # slots are released by done-callbacks
+            time.sleep(0.01)
+            spec = start()
+        self.assertIsNotNone(spec)
+        spec.future.result(timeout=1)
+
+    def test_good_nlp_answer_cancels_provider(self):
+        before = assistant.get_speculation_stats()
+        self.assertEqual(asyncio.run(assistant.dispatch("ai là Einstein?")), "Câu trả lời đầy đủ")
+        self.assertEqual(assistant.run_feature("mở nhạc"), "Câu trả lời đầy đủ")  # not a question
+        after = assistant.get_speculation_stats()
+        self.assertEqual(after["started"], before["started"] + 1)
+        self.assertEqual(after["cancelled"], before["cancelled"] + 1)
+
+
+class TestSpeculationFlag(unittest.TestCase):
+    def test_flag_is_read_once_until_set(self):
+        import features.provider_prefs as provider_prefs
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        config = os.path.join(tmp.name, "assistant_config.json")
+        for target, value in (("_config_path", lambda: config), ("_speculative_escalation", None)):
+            patcher = mock.patch.object(provider_prefs, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with mock.patch.object(provider_prefs, "_load_config", wraps=provider_prefs._load_config) as load:
+            self.assertFalse(provider_prefs.get_speculative_escalation())
+            self.assertFalse(provider_prefs.get_speculative_escalation())
+            self.assertEqual(load.call_count, 1)
+            provider_prefs.set_speculative_escalation(True)
+            self.assertTrue(provider_prefs.get_speculative_escalation())
+            self.assertTrue(provider_prefs.get_speculative_escalation())
+            self.assertEqual(load.call_count, 3)
+
+
+class TestAsyncHTTP(unittest.TestCase):
+    def test_fetch_json_chunked_and_post(self):
+        async def handle(reader, writer):
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            body = await reader.readexactly(length) if length else b"{}"
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                         + b"%x\r\n" % len(body) + body + b"\r\n0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await fetch_json(f"http://127.0.0.1:{port}/echo", method="POST",
+                                        payload={"a": 1}, timeout=5)
+
+        self.assertEqual(asyncio.run(run()), (200, {"a": 1}))
+
+
+if __name__ == "__main__":
+    unittest.main()
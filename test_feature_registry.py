@@ -0,0 +1,34 @@
+import unittest
+
+import feature_registry
+
+
+class TestFeatureManifest(unittest.TestCase):
+    def test_manifest_matches_sources(self):
+        # Regenerate with `python feature_registry.py` when this fails
+        entries, stale = feature_registry.load_manifest_entries()
+        self.assertEqual(stale, [])
+        names = {e["name"] for e in entries if e.get("handler")}
+        self.assertTrue({"calculator", "weather", "nlp_processor"} <= names)
+
+    def test_heavy_modules_are_declared(self):
+        entries, _ = feature_registry.load_manifest_entries()
+        costs = {e["name"]: e["cost"] for e in entries}
+        self.assertEqual(costs.get("dashboard"), "heavy")
+
+
+class TestLazyFeature(unittest.TestCase):
+    def test_resolves_on_first_call(self):
+        lf = feature_registry.LazyFeature("calculator", "calculator")
+        self.assertEqual(lf.__name__, "calculator")
+        self.assertIn("Kết quả là: 8", lf("tính 5 cộng 3"))
+        self.assertTrue(lf.loaded)
+
+    def test_missing_handler_raises(self):
+        lf = feature_registry.LazyFeature("calculator", "no_such_handler")
+        with self.assertRaises(AttributeError):
+            lf.resolve()
+
+
+if __name__ == "__main__":
+    unittest.main()
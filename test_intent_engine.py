@@ -0,0 +1,48 @@
+import re
+import unittest
+
+from benchmark import INTENT_SAMPLES
+from features.nlp_processor import EnhancedNLPProcessor
+from intent_engine import IntentEngine, literal_prefixes
+
+
+class TestIntentEngine(unittest.TestCase):
+    def test_literal_prefixes(self):
+        self.assertEqual(literal_prefixes(r"^(?:xóa|hủy)\s+lịch"), {"xóa", "hủy"})
+        self.assertEqual(literal_prefixes(r"(?:là\s+(?:gì|sao))"), {"là"})
+        self.assertEqual(literal_prefixes(r"\?\s*$"), {"?"})
+        self.assertIsNone(literal_prefixes(r"\d+\s+phút"))
+        self.assertIsNone(literal_prefixes(r"(?:ai)?\s+x"))
+
+    def test_gated_scan_matches_exhaustive_search(self):
+        patterns = EnhancedNLPProcessor().intent_patterns
+        engine = IntentEngine(patterns)
+        texts = [text for text, _ in INTENT_SAMPLES] + ["Xin Chào", "làm thế nào để học máy?", ""]
+        for text in texts:
+            lowered = text.lower()
+            expected = {}
+            for intent, sources in patterns.items():
+                n = sum(1 for p in sources if re.search(p, lowered, re.IGNORECASE))
+                if n:
+                    expected[intent] = n
+            if lowered.isascii() and not expected:
+                continue  # accentless text is scored by the accentless form instead
+            with self.subTest(text=text):
+                self.assertEqual(engine.match_counts(text), expected)
+
+    def test_accentless_text_and_scores(self):
+        engine = IntentEngine({"delete_reminder": [r"(?:xóa|hủy)\s+(?:nhắc nhở|lịch)", r"^xóa"]})
+        self.assertEqual(engine.match_counts("xoa nhac nho"), {"delete_reminder": 2})
+        self.assertAlmostEqual(engine.score("Xóa lịch")["delete_reminder"], 0.7)
+        self.assertEqual(engine.score("mở lịch"), {})
+
+    def test_processor_uses_engine(self):
+        proc = EnhancedNLPProcessor()
+        self.assertEqual(len(proc.intent_engine), sum(len(p) for p in proc.intent_patterns.values()))
+        self.assertIn("delete_reminder", proc.detect_enhanced_intent("xóa nhắc nhở"))
+        # Heuristics fill in only when no compiled pattern matched
+        self.assertEqual(proc._detect_intent_robust("chao ban"), {"greeting": 0.8})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+
+from learned_store import LearnedPatternStore
+
+
+class TestLearnedPatternStore(unittest.TestCase):
+    def test_matches_count_distinct_terms_per_intent(self):
+        store = LearnedPatternStore(rebuild_after=2)
+        store.learn("ai_enhancement", ["học", "trí tuệ"], "học máy")
+        store.learn("ai_enhancement", ["học"], "")
+        store.learn("greeting", ["chào"], "xin chào")
+        # Older terms come from the index, the latest one from the pending set
+        self.assertEqual(store.matches("tôi muốn học máy, xin chào"),
+                         {"ai_enhancement": (1, 1, 2), "greeting": (1, 1, 1)})
+        self.assertEqual(store.matches("tạm biệt"), {})
+        self.assertIn("greeting", store)
+        self.assertEqual(store.get("ai_enhancement")["keywords"], {"học", "trí tuệ"})
+
+    def test_caps_evict_least_used_terms(self):
+        store = LearnedPatternStore(max_keywords=10, decay=1.0, rebuild_after=1000)
+        for i in range(10):
+            store.learn("x", ["hay"] + ([f"k{i}"] if i else []))
+        store.matches("hay")  # index the first batch
+        store.learn("x", ["moi"])  # 11 keywords > cap: evict down to 9
+        self.assertEqual(len(store.get("x")["keywords"]), 9)
+        self.assertIn("hay", store.get("x")["keywords"])
+        self.assertIn("moi", store.get("x")["keywords"])
+        self.assertEqual(store.matches("k1 k2 k5 k9 hay")["x"][0], 3)  # evicted terms no longer match
+
+    def test_decay_prefers_recent_terms(self):
+        store = LearnedPatternStore(max_keywords=2, decay=0.5)
+        store.learn("x", ["cu"])
+        store.learn("x", ["cu"])
+        store.learn("x", ["moi"])
+        store.learn("x", ["moi2"])
+        self.assertEqual(store.get("x")["keywords"], {"moi2"})
+
+    def test_persistence_round_trip_and_suspended(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "learned.json")
+            store = LearnedPatternStore(path=path, debounce=60)
+            store.learn("greeting", ["chào"], "xin chào")
+            with store.suspended():
+                store.learn("weather", ["mưa"])
+            store.flush()
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(set(json.load(f)["intents"]), {"greeting"})
+            reloaded = LearnedPatternStore(path=path)
+            self.assertEqual(reloaded.matches("xin chào bạn"), {"greeting": (1, 1, 1)})
+
+    def test_journal_replays_into_another_store(self):
+        worker, parent = LearnedPatternStore(), LearnedPatternStore()
+        worker.journal = []
+        worker.learn("greeting", iter(["chào"]), "xin chào")
+        with worker.suspended():
+            worker.learn("weather", ["mưa"])
+        self.assertEqual(worker.journal, [("greeting", ("chào",), "xin chào")])
+        self.assertEqual(worker.matches("xin chào bạn"), {})  # recorded, not applied
+        revision = parent.revision
+        for call in worker.journal:
+            parent.learn(*call)
+        self.assertNotEqual(parent.revision, revision)
+        self.assertEqual(parent.matches("xin chào bạn"), {"greeting": (1, 1, 1)})
+        revision, data = parent.snapshot()
+        worker.load_snapshot(data)
+        self.assertEqual(worker.matches("xin chào bạn"), {"greeting": (1, 1, 1)})
+        self.assertEqual(parent.revision, revision)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+import mojibake
+from mojibake import looks_broken, repair_mojibake
+
+
+class TestMojibake(unittest.TestCase):
+    def test_clean_text_is_returned_as_is(self):
+        for text in ("what time is it", "Nhắc tôi họp lúc 3 giờ", "NGÃ BA", "", "tab\tand\nnewline"):
+            with self.subTest(text=text):
+                self.assertIs(repair_mojibake(text), text)
+        self.assertFalse(looks_broken("mấy giờ rồi"))
+        self.assertTrue(looks_broken("xin chA�o"))
+
+    def test_codec_round_trip_and_known_fragments(self):
+        self.assertEqual(repair_mojibake("xin chào".encode("utf-8").decode("cp1252")), "xin chào")
+        # Longest fragment wins: the whole phrase, not just "nh??_c"
+        self.assertEqual(repair_mojibake("nh��_c nh��Y tôi"), "nhac nho tôi")
+        self.assertEqual(repair_mojibake("nh��_c tôi"), "nhắc tôi")
+        self.assertEqual(repair_mojibake("B���n: xin chA�o"), "Bạn: xin chao")
+
+    def test_repairs_are_cached(self):
+        broken = "l��<ch họp"
+        before = mojibake.repair_stats()["hits"]
+        self.assertEqual(repair_mojibake(broken), "lich họp")
+        self.assertEqual(repair_mojibake(broken), "lich họp")
+        self.assertEqual(mojibake.repair_stats()["hits"], before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -28,12 +28,28 @@ class TestNLPProcessor(unittest.TestCase):
         self.assertIn("date", entities)
         self.assertIn("time", entities)
 
+    def test_entity_spans_found_in_both_forms_are_reported_once(self):
+        entities = self.processor.extract_enhanced_entities("khoảng 30 phút nữa, ngày mai")
+        self.assertEqual(entities["duration"], ["khoảng 30 phút", "30 phút"])
+        self.assertEqual(entities["date"], ["ngày mai"])
+        self.assertEqual(self.processor.extract_enhanced_entities("ngay mai")["date"], ["ngay mai"])
+
     def test_sentiment_analysis(self):
         command = "Tôi rất vui với kết quả này!"
         analysis = self.processor.analyze_text_with_context(command)
         sentiment = analysis.get("sentiment", {})
         self.assertEqual(sentiment['label'], "positive")
 
+    def test_sentiment_batch_matches_single_analysis(self):
+        texts = ["Tôi rất vui với kết quả này!", {"command": "không thích"}, "mấy giờ rồi",
+                 "Tôi rất vui với kết quả này!", None]
+        results = self.processor.analyze_sentiment_batch(texts)
+        self.assertEqual([r["label"] for r in results], ["positive", "negative", "neutral", "positive", "neutral"])
+        self.assertEqual(results[1], self.processor.analyze_enhanced_sentiment("không thích"))
+        # Multi-word intensifiers are found by the trie scan too
+        plain = self.processor.analyze_enhanced_sentiment("tuyệt vời")["score"]
+        self.assertGreater(self.processor.analyze_enhanced_sentiment("vô cùng tuyệt vời")["score"], plain)
+
     def test_learning_capabilities(self):
         # Test that the processor can learn from interactions
         command = "tôi muốn học cách sử dụng trí tuệ nhân tạo"
@@ -0,0 +1,39 @@
+import unittest
+
+import assistant
+from deadline import Deadline
+from normalization import NormalizedCommand, fold, normalize_command
+
+
+class TestNormalizedCommand(unittest.TestCase):
+    def test_forms_and_interning(self):
+        nc = normalize_command("  Mở   Ứng Dụng  ")
+        self.assertEqual(nc.lower, "mở ứng dụng")
+        self.assertEqual(nc.accentless, "mo ung dung")
+        self.assertEqual(nc.tokens, ("mở", "ứng", "dụng"))
+        self.assertIs(normalize_command("  Mở   Ứng Dụng  "), nc)
+        self.assertEqual(fold("Đà  Nẵng"), "đa nang")  # đ is not a combining mark
+
+    def test_repaired_form_undoes_mojibake(self):
+        broken = "xin chào".encode("utf-8").decode("cp1252")
+        self.assertEqual(normalize_command(broken).repaired, "xin chào")
+        self.assertEqual(normalize_command("Xin chào").repaired, "xin chào")
+
+    def test_router_tokens_and_handler_injection(self):
+        nc = assistant.normalize_command("Xem thời tiết")
+        self.assertIn("thời tiết", nc.tokens)
+        self.assertIs(assistant.normalize_command("Xem thời tiết"), nc)
+
+        seen = []
+
+        def handler(params, normalized=None):
+            seen.append(normalized)
+            return "ok"
+
+        self.assertEqual(assistant._call_handler(handler, "Xem thời tiết", Deadline()), "ok")
+        self.assertIs(seen[0], nc)
+        self.assertIsInstance(seen[0], NormalizedCommand)
+
+
+if __name__ == "__main__":
+    unittest.main()
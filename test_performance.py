@@ -30,6 +30,15 @@ def main():
         samples = [run_once(t) for _ in range(3)]
         print(f"- {t}: min={min(samples):.3f} avg={statistics.mean(samples):.3f} max={max(samples):.3f}")
 
+    # Same commands replayed as one batch (routed once, run concurrently)
+    replay = tests * 20
+    t0 = time.perf_counter()
+    results = assistant.run_features_batch(replay, max_concurrency=4)
+    elapsed = time.perf_counter() - t0
+    print(f"Batch of {len(replay)} commands: {elapsed:.3f}s")
+    for item in results[:len(tests)]:
+        print(f"- {item.command}: route={item.route_ms:.1f}ms run={item.run_ms:.1f}ms ({item.status})")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+
+import assistant
+from deadline import Deadline
+from pipeline import Pipeline, RequestContext, ResolvedFeature, Stage
+
+
+def _build(calls, skip_lookup=None):
+    def step(name, func=None):
+        def run(ctx):
+            calls.append(name)
+            if func is not None:
+                func(ctx)
+        return Stage(name, run)
+
+    def route(ctx):
+        ctx.feature = ResolvedFeature(ctx.command, lambda p: p.upper(), ctx.command)
+
+    def handle(ctx):
+        ctx.result = ctx.feature.handler(ctx.feature.params)
+
+    def taught(ctx):
+        if ctx.command == "taught":
+            ctx.answer("from taught")
+
+    return Pipeline(
+        pre_hooks=[step("taught", taught)],
+        router=step("route", route),
+        prepare=[Stage("only_b", lambda ctx: calls.append("only_b"), only_for=["b"])],
+        handler=step("handler", handle),
+        post_processors=[step("suffix", lambda ctx: setattr(ctx, "result", ctx.result + "!"))],
+        skip_lookup=skip_lookup,
+    )
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages_run_in_order_and_are_timed(self):
+        calls = []
+        ctx = RequestContext("b")
+        self.assertEqual(_build(calls).run(ctx), "B!")
+        self.assertEqual(calls, ["taught", "route", "only_b", "handler", "suffix"])
+        self.assertEqual(set(ctx.timings), {"taught", "route", "only_b", "handler", "suffix"})
+        self.assertEqual(ctx.feature_name, "b")
+
+    def test_pre_hook_answer_skips_router_and_handler(self):
+        calls = []
+        self.assertEqual(_build(calls).run(RequestContext("taught")), "from taught")
+        self.assertEqual(calls, ["taught"])
+
+    def test_per_feature_skips(self):
+        calls = []
+        pipe = _build(calls, skip_lookup=lambda f: ("suffix",) if f.name == "c" else ())
+        pipe.skip("suffix", "a")
+        self.assertEqual(pipe.run(RequestContext("a")), "A")
+        self.assertEqual(pipe.run(RequestContext("c")), "C")
+        pipe.unskip("suffix", "a")
+        self.assertEqual(pipe.run(RequestContext("a")), "A!")
+
+    def test_async_run_uses_run_sync_for_blocking_stages(self):
+        calls = []
+        offloaded = []
+
+        async def run_sync(func, ctx):
+            offloaded.append(func)
+            return func(ctx)
+
+        result = asyncio.run(_build(calls).run_async(RequestContext("a"), run_sync))
+        self.assertEqual(result, "A!")
+        self.assertEqual(len(offloaded), 4)
+
+
+class TestAssistantPipeline(unittest.TestCase):
+    def test_router_hands_over_the_feature_name(self):
+        ctx = assistant.get_pipeline().route(RequestContext("mấy giờ rồi", Deadline()))
+        self.assertEqual(ctx.feature_name, "time")
+        self.assertIs(ctx.feature.handler, assistant.get_time)
+        self.assertIn("route", ctx.timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
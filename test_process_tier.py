@@ -0,0 +1,83 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+import assistant
+import process_tier
+from deadline import Deadline
+from features import nlp_processor
+from learned_store import LearnedPatternStore
+
+
+class TestProcessTier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._env = mock.patch.dict(os.environ, {process_tier.WORKERS_ENV: "1"})
+        cls._env.start()
+        process_tier.start(["nlp_processor"], wait=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        process_tier.shutdown()
+        cls._env.stop()
+
+    def setUp(self):
+        proc = nlp_processor.get_nlp_processor()
+        saved = proc.context_memory, proc.learned_patterns
+        proc.context_memory, proc.learned_patterns = [], LearnedPatternStore()
+        self.addCleanup(setattr, proc, "learned_patterns", saved[1])
+        self.addCleanup(setattr, proc, "context_memory", saved[0])
+
+    def test_worker_result_matches_in_process_and_context_comes_back(self):
+        cmd = "phân tích cảm xúc: hôm nay tôi rất vui"
+        proc = nlp_processor.get_nlp_processor()
+        local = nlp_processor.nlp_processor(cmd)
+        proc.context_memory, proc.learned_patterns = [], LearnedPatternStore()
+        remote = process_tier.call("nlp_processor", "nlp_processor", cmd, Deadline.after(30))
+        self.assertEqual(remote, local)
+        self.assertEqual(len(proc.context_memory), 1)
+        self.assertEqual(proc.learned_patterns.stats()["intents"], 1)  # learned in the parent
+
+    def test_concurrent_calls_merge_context_and_learning_into_the_parent(self):
+        proc = nlp_processor.get_nlp_processor()
+        cmds = ["phân tích cảm xúc: ngày mai tôi hơi buồn", "phân tích ngôn ngữ: trời đẹp quá"]
+        with mock.patch.object(proc.learned_patterns, "learn") as learn:
+            threads = [threading.Thread(target=process_tier.call,
+                                        args=("nlp_processor", "nlp_processor", c, Deadline.after(30)))
+                       for c in cmds]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(proc.context_memory), 2)  # neither call overwrote the other's turn
+        self.assertEqual(learn.call_count, 2)
+
+    def test_worker_scores_with_what_the_parent_learned(self):
+        cmd = "phân tích: ngựa vằn"
+        proc = nlp_processor.get_nlp_processor()
+        for _ in range(10):
+            proc.learned_patterns.learn("farewell", ["ngựa"], "ngựa vằn")
+        with proc.learned_patterns.suspended():  # both runs see the same store
+            local = nlp_processor.nlp_processor(cmd)
+            proc.context_memory = []
+            remote = process_tier.call("nlp_processor", "nlp_processor", cmd, Deadline.after(30))
+        self.assertIn("farewell", remote)
+        self.assertEqual(remote, local)
+
+    def test_cpu_bound_handler_goes_through_the_tier(self):
+        before = process_tier.get_stats()
+        with mock.patch.object(nlp_processor.EnhancedNLPProcessor, "complete_plan",
+                               side_effect=lambda plan, deadline=None: "applied:" + plan[0]):
+            out = assistant._call_handler(nlp_processor.nlp_processor, "phân tích ngôn ngữ", Deadline.after(30))
+        self.assertEqual(out, "applied:reply")
+        self.assertEqual(process_tier.get_stats()["completed"], before["completed"] + 1)
+
+    def test_disabled_tier_is_unavailable(self):
+        with mock.patch.dict(os.environ, {process_tier.WORKERS_ENV: "0"}):
+            with self.assertRaises(process_tier.TierUnavailable):
+                process_tier.call("nlp_processor", "nlp_processor", "x", Deadline())
+
+
+if __name__ == "__main__":
+    unittest.main()
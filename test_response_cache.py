@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import assistant
+from pipeline import RequestContext
+from response_cache import CachePolicy, ResponseCache, parse_policy
+from ttl_cache import MISSING
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_keys_ttl_and_time_buckets(self):
+        clock, wall = FakeClock(), FakeClock(119.0)
+        cache = ResponseCache(maxsize=8, clock=clock, wall_clock=wall)
+        accentless = parse_policy({"ttl": 10, "key": "accentless"})
+        cache.put("weather", accentless, "Thời  tiết", "nắng")
+        self.assertEqual(cache.get("weather", accentless, "thoi tiet"), "nắng")
+        clock.now = 11.0
+        self.assertIs(cache.get("weather", accentless, "thoi tiet"), MISSING)
+
+        clock_policy = CachePolicy(60, time_varying=True)
+        cache.put("time", clock_policy, "", "1:01")
+        self.assertEqual(cache.get("time", clock_policy, ""), "1:01")
+        wall.now = 120.0  # next minute: same key, new bucket
+        self.assertIs(cache.get("time", clock_policy, ""), MISSING)
+
+        stats = cache.stats()
+        self.assertEqual(stats["features"]["weather"], {"hits": 1, "misses": 1, "stores": 1})
+        self.assertIsNone(parse_policy({"ttl": 0}))
+
+    def test_weather_reply_does_not_outlive_its_data(self):
+        import features.weather as weather
+        policy = parse_policy(weather.response_cache)
+        cache = ResponseCache(maxsize=8, clock=FakeClock())  # reply TTL alone never expires here
+        wall = FakeClock(1000.0)
+        with mock.patch.dict(weather._weather_cache, clear=True), \
+                mock.patch.object(weather.time, "time", wall):
+            weather._put_cache("hanoi", {"temp": 30})
+            wall.now += weather._CACHE_TTL_SECONDS - 60  # data is 9 minutes old
+            cache.put("weather", policy, "Hanoi", "30°C")
+            self.assertEqual(cache.get("weather", policy, "Hanoi"), "30°C")
+            wall.now += 120  # the data expired; the reply built from it goes too
+            self.assertIs(cache.get("weather", policy, "Hanoi"), MISSING)
+            weather._put_cache("hanoi", {"temp": 25})  # refetched
+            self.assertIs(cache.get("weather", policy, "Hanoi"), MISSING)
+
+    def test_pipeline_serves_repeats_without_running_the_handler(self):
+        calls = []
+
+        def calculator(expression):
+            calls.append(expression)
+            return f"= {expression}"
+
+        feature = assistant.ResolvedFeature("calculator", calculator, "2 + 3")
+        cache = ResponseCache()
+        with mock.patch.object(assistant, "_response_cache", cache), \
+                mock.patch.object(assistant, "_resolve_feature", return_value=feature), \
+                mock.patch("feature_registry.cache_policy", return_value=CachePolicy(60)), \
+                mock.patch.object(assistant, "_enhance", side_effect=lambda r, c, s: r + " +"):
+            first = assistant._pipeline.run(RequestContext("tính 2 + 3"))
+            ctx = RequestContext("tính 2 + 3")
+            second = assistant._pipeline.run(ctx)
+            third = asyncio.run(assistant._pipeline.run_async(
+                RequestContext("tính 2 + 3"), lambda f, c: asyncio.sleep(0, f(c))))
+        self.assertEqual(calls, ["2 + 3"])
+        self.assertEqual(first, "= 2 + 3 +")
+        self.assertEqual((second, third), (first, first))  # enhance still runs on hits
+        self.assertTrue(ctx.handled)
+        self.assertNotIn("handler", ctx.timings)
+        self.assertEqual(cache.stats()["features"]["calculator"]["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+
+import assistant
+import feature_registry
+from aho_corasick import AhoCorasick
+from fuzzy_index import FuzzyIndex
+from routing import RouteTable, RoutingRule, load_rules
+from ttl_cache import MISSING, TTLCache
+
+
+def _rule(name, priority, **kw):
+    return RoutingRule(
+        name=name, priority=priority,
+        handler=kw.get("handler"), feature=kw.get("feature"),
+        substrings=tuple(kw.get("substrings", ())), tokens=tuple(kw.get("tokens", ())),
+        requires=tuple(kw.get("requires", ())), params=kw.get("params", "command"),
+    )
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_overlapping_patterns(self):
+        ac = AhoCorasick()
+        for i, p in enumerate(["he", "she", "his", "hers"]):
+            ac.add(p, i)
+        ac.build()
+        self.assertEqual(ac.find_payloads("ushers"), {0, 1, 3})
+        spans = [(s, e) for s, e, _ in ac.iter_matches("ushers")]
+        self.assertIn((1, 4), spans)
+        self.assertIn((2, 6), spans)
+
+    def test_no_match(self):
+        ac = AhoCorasick()
+        ac.add("gio", "time")
+        self.assertEqual(ac.find_payloads("xin chao"), set())
+
+
+class TestRouteTable(unittest.TestCase):
+    def test_priority_order_and_tokens(self):
+        table = RouteTable([
+            _rule("late", 20, handler="b", substrings=["thoi tiet"]),
+            _rule("early", 10, handler="a", tokens=["mở"], params="after_token"),
+        ], assistant._normalize_for_match)
+        hits = list(table.matches("mo thoi tiet", ["mở", "thời", "tiết"]))
+        self.assertEqual([m.rule.name for m in hits], ["early", "late"])
+        self.assertEqual(hits[0].token, "mở")
+
+    def test_shipped_rules_load(self):
+        rules = load_rules()
+        self.assertTrue(rules)
+        self.assertTrue(all(bool(r.handler) != bool(r.feature) for r in rules))
+
+
+class TestFindBestFeatureRules(unittest.TestCase):
+    def test_builtin_routes(self):
+        func, conf, params = assistant.find_best_feature("mấy giờ rồi", assistant.preprocess_text("mấy giờ rồi"))
+        self.assertIs(func, assistant.get_time)
+        self.assertEqual(params, "")
+        func, _, _ = assistant.find_best_feature("bạn có thể làm gì", assistant.preprocess_text("bạn có thể làm gì"))
+        self.assertIs(func, assistant.show_help)
+
+
+def _overlap_scorer(a, b):
+    ta, tb = set(a.split()), set(b.split())
+    return 100.0 * len(ta & tb) / max(1, len(ta))
+
+
+class TestFuzzyIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = FuzzyIndex([
+            ("calculator", ["tính"], ["tính ... cộng ..."]),
+            ("work_assistant", ["task", "pomodoro"], ["thêm task", "bắt đầu làm việc", "chơi game"]),
+            ("chitchat", ["chào"], ["kể chuyện cười", "kể một câu đùa"]),
+        ], assistant._normalize_for_match, skip=["calculator"])
+
+    def test_exact_keyword_respects_registry_order_and_skip(self):
+        self.assertEqual(self.index.exact_keyword(["xin", "chào", "task"]), "work_assistant")
+        self.assertIsNone(self.index.exact_keyword(["tính"]))
+
+    def test_best_feature_is_accent_insensitive(self):
+        hit = self.index.best_feature("bat dau lam viec", fallback_scorer=_overlap_scorer)
+        self.assertEqual(hit[0], "work_assistant")
+        self.assertIsNone(self.index.best_feature("hoan toan khac", fallback_scorer=_overlap_scorer))
+
+    def test_suggest_one_pattern_per_feature(self):
+        out = self.index.suggest("kể chuyện", fallback_scorer=_overlap_scorer)
+        self.assertEqual(len(out), 1)
+        self.assertIn(out[0], ("kể chuyện cười", "kể một câu đùa"))
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction_and_stats(self):
+        cache = TTLCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", None)
+        self.assertIsNone(cache.get("b"))  # falsy values are real hits
+        cache.get("a")
+        cache.put("c", 3)  # evicts "b", the least recently used
+        self.assertIs(cache.get("b"), MISSING)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 1, 1))
+
+    def test_ttl_expiry(self):
+        now = [0.0]
+        cache = TTLCache(maxsize=4, ttl=10, clock=lambda: now[0])
+        cache.put("k", "v")
+        cache.put("short", "v", ttl=1)
+        now[0] = 5
+        self.assertEqual(cache.get("k"), "v")
+        self.assertIs(cache.get("short"), MISSING)
+        now[0] = 11
+        self.assertIs(cache.get("k"), MISSING)
+        self.assertEqual(cache.stats()["expirations"], 2)
+
+
+class TestRoutingCache(unittest.TestCase):
+    def test_negative_results_cached_until_generation_bump(self):
+        cmd = "zzqx khong khop gi ca"
+        tokens = assistant.preprocess_text(cmd)
+        assistant.find_best_feature(cmd, tokens)
+        before = assistant.get_routing_cache_stats()["hits"]
+        self.assertEqual(assistant.find_best_feature(cmd, tokens), (None, 0, ""))
+        self.assertEqual(assistant.get_routing_cache_stats()["hits"], before + 1)
+        feature_registry.bump_generation()
+        assistant.find_best_feature(cmd, tokens)
+        self.assertEqual(assistant.get_routing_cache_stats()["hits"], before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+import assistant
+from scheduler import BACKGROUND, BATCH, INTERACTIVE, PriorityScheduler, priority_scope, running_priority
+
+
+class TestPriorityScheduler(unittest.TestCase):
+    def setUp(self):
+        self.sched = PriorityScheduler(3, {BACKGROUND: 1, BATCH: 1})
+        self.addCleanup(self.sched.shutdown, cancel_futures=True)
+
+    def test_interactive_is_not_delayed_by_queued_batch_work(self):
+        batch = [self.sched.submit_as(BATCH, time.sleep, 0.1) for _ in range(5)]
+        started = time.perf_counter()
+        self.sched.submit_as(INTERACTIVE, lambda: None).result()
+        self.assertLess(time.perf_counter() - started, 0.05)
+        stats = self.sched.stats()
+        self.assertEqual(stats[BATCH]["running"], 1)
+        self.assertGreaterEqual(stats[BATCH]["queued"], 3)
+        self.assertGreaterEqual(stats[BATCH]["max_queued"], 4)
+        for fut in batch:
+            fut.result()
+        self.assertEqual(self.sched.stats()[BATCH]["completed"], 5)
+
+    def test_more_urgent_class_is_served_first(self):
+        sched = PriorityScheduler(1)
+        self.addCleanup(sched.shutdown)
+        gate = threading.Event()
+        order = []
+        sched.submit(gate.wait)
+        futures = [sched.submit_as(p, order.append, p) for p in (BATCH, BACKGROUND, INTERACTIVE)]
+        gate.set()
+        for fut in futures:
+            fut.result()
+        self.assertEqual(order, [INTERACTIVE, BACKGROUND, BATCH])
+
+    def test_run_in_executor_uses_ambient_class(self):
+        async def run():
+            with priority_scope(BACKGROUND):
+                return await asyncio.get_running_loop().run_in_executor(self.sched, running_priority)
+
+        self.assertEqual(asyncio.run(run()), BACKGROUND)
+        self.assertEqual(self.sched.stats()[BACKGROUND]["completed"], 1)
+
+
+class TestAssistantScheduling(unittest.TestCase):
+    def test_batch_runs_in_batch_class(self):
+        before = assistant.get_scheduler_stats()[BATCH]["submitted"]
+        results = assistant.run_features_batch(["mấy giờ rồi", "tính 2 + 3"], max_concurrency=2)
+        self.assertEqual([r.status for r in results], ["ok", "ok"])
+        self.assertEqual(assistant.get_scheduler_stats()[BATCH]["submitted"], before + 2)
+
+    def test_nested_batch_from_saturated_workers_runs_inline(self):
+        # Every worker holds an interactive task that runs a batch: the lanes
+        # must not wait for a free worker that never comes
+        sched = PriorityScheduler(2, {BATCH: 1})
+        self.addCleanup(sched.shutdown, cancel_futures=True)
+        barrier = threading.Barrier(2)
+
+        def interactive():
+            barrier.wait(timeout=5)
+            return [r.status for r in assistant.run_features_batch(["mấy giờ rồi", "tính 2 + 3"])]
+
+        with mock.patch.object(assistant, "executor", sched):
+            futures = [sched.submit_as(INTERACTIVE, interactive) for _ in range(2)]
+            for fut in futures:
+                self.assertEqual(fut.result(timeout=10), ["ok", "ok"])
+        self.assertEqual(sched.stats()[BATCH]["submitted"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from taught_store import TaughtStore
+
+
+class TestTaughtStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "taught.json")
+
+    def _write(self, data, mtime):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_earliest_taught_pattern_wins(self):
+        self._write({"chao": "A", "xin chao": "B"}, 1000)
+        store = TaughtStore(self.path, check_interval=0)
+        self.assertEqual(store.lookup("xin chao ban"), "A")
+        self.assertIsNone(store.lookup("tam biet"))
+
+    def test_reloads_only_when_mtime_changes(self):
+        self._write({"a": "1"}, 1000)
+        store = TaughtStore(self.path, check_interval=0)
+        store.lookup("a")
+        store.lookup("a")
+        self.assertEqual(store.reloads, 1)
+        self._write({"b": "2"}, 2000)
+        self.assertEqual(store.lookup("b"), "2")
+        self.assertIsNone(store.lookup("a"))
+        self.assertEqual(store.reloads, 2)
+
+    def test_teach_is_debounced_into_one_atomic_write(self):
+        store = TaughtStore(self.path, debounce=0.05, check_interval=0)
+        store.teach("mot", "1")
+        store.teach("hai", "2")
+        self.assertEqual(store.lookup("so hai"), "2")  # visible before the write
+        self.assertFalse(os.path.exists(self.path))
+        time.sleep(0.2)
+        self.assertEqual(store.writes, 1)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"mot": "1", "hai": "2"})
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        store.lookup("mot")
+        self.assertEqual(store.reloads, 1)  # our own write does not trigger a reload
+
+    def test_failed_write_is_logged(self):
+        store = TaughtStore(os.path.join(self.tmp.name, "missing", "taught.json"), debounce=60)
+        store.teach("mot", "1")
+        with self.assertLogs("assistant.taught_store", "WARNING") as logs:
+            store.flush()
+        self.assertIn("Could not save taught replies", logs.output[0])
+        self.assertEqual(store.writes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
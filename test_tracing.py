@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import assistant
+import tracing
+from deadline import Deadline
+
+
+class TestTracer(unittest.TestCase):
+    def test_ring_buffer_is_bounded(self):
+        tracer = tracing.Tracer(capacity=3)
+        for i in range(5):
+            tracer.record(tracing.SpanRecord(f"s{i}", None, i, 1, 0, None))
+        self.assertEqual([r.name for r in tracer.spans()], ["s2", "s3", "s4"])
+
+    def test_summary_and_exports(self):
+        spans = [tracing.SpanRecord("route", "r1", 0, d * 1000000, 1, None) for d in range(1, 101)]
+        summary = tracing.summarize(spans)["route"]
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p95"], 95.0, delta=1.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            self.assertEqual(tracing.export_chrome_trace(path, spans[:2]), 2)
+            with open(path, encoding="utf-8") as f:
+                event = json.load(f)["traceEvents"][0]
+            self.assertEqual((event["ph"], event["args"]["request_id"]), ("X", "r1"))
+            path = os.path.join(tmp, "trace.jsonl")
+            tracing.export_jsonl(path, spans[:2])
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+
+class TestPipelineSpans(unittest.TestCase):
+    def test_stages_share_the_request_id(self):
+        tracing.get_tracer().clear()
+        assistant.clear_response_cache()  # a cached clock reply would skip the handler
+        with mock.patch.object(assistant, "_enhance", side_effect=lambda r, c, s: r):
+            with tracing.request_scope() as rid:
+                assistant._handle_command("mấy giờ rồi", Deadline())
+        names = [r.name for r in tracing.get_tracer().spans() if r.request_id == rid]
+        for stage in ("tokenize", "taught", "route", "handler", "request"):
+            self.assertIn(stage, names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+import assistant
+import vi_tokenizer
+from vi_tokenizer import MaxMatchTokenizer, build_dictionary
+
+
+class TestMaxMatchTokenizer(unittest.TestCase):
+    def test_longest_dictionary_word_wins(self):
+        tok = MaxMatchTokenizer(["thời tiết", "xử lý", "xử lý ngôn ngữ tự nhiên", "ngôn ngữ"])
+        self.assertEqual(tok.tokenize("Xem Thời tiết"), ["xem", "thời tiết"])
+        self.assertEqual(tok.tokenize("xử lý ngôn ngữ tự nhiên đi"), ["xử lý ngôn ngữ tự nhiên", "đi"])
+        self.assertEqual(tok.tokenize("xử lý ngôn ngữ"), ["xử lý", "ngôn ngữ"])
+        self.assertEqual(tok.tokenize(""), [])
+
+    def test_dictionary_from_keywords_and_patterns(self):
+        words = build_dictionary(["giờ", "hệ thống"], ["thời tiết ở ...", "^tự\\s+động", "... cộng ... bằng mấy"])
+        self.assertEqual(words, {"hệ thống", "thời tiết ở", "bằng mấy"})
+
+    def test_router_uses_builtin_tokenizer_without_underthesea(self):
+        if assistant.TOKENIZER_BACKEND == "builtin":
+            self.assertEqual(vi_tokenizer.underthesea_state(), "idle")  # never imported
+        self.assertIn("hệ thống", assistant.preprocess_text("kiểm tra hệ thống"))
+
+
+if __name__ == "__main__":
+    unittest.main()
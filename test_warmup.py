@@ -0,0 +1,49 @@
+import datetime
+import unittest
+
+import assistant
+from warmup import WarmupPlanner, rank_commands
+
+NOW = datetime.datetime(2025, 9, 1, 12, 0)
+
+
+def _history(command, days_ago):
+    return {"command": command, "timestamp": (NOW - datetime.timedelta(days=days_ago)).isoformat()}
+
+
+class TestRankCommands(unittest.TestCase):
+    def test_recent_usage_outranks_stale_usage(self):
+        data = {
+            "usage_patterns": {"thông tin hệ thống": 50, "mấy giờ rồi": 20, "Mấy  giờ rồi": 1, "cũ": 0},
+            "command_history": [_history("thông tin hệ thống", 42), _history("mấy giờ rồi", 1)],
+        }
+        ranked = rank_commands(data, limit=5, now=NOW)
+        # 50 halved three times (6.25) < 20 decayed one day + 1 for the other spelling
+        self.assertEqual([cmd for cmd, _ in ranked], ["mấy giờ rồi", "thông tin hệ thống"])
+
+
+class TestWarmupPlanner(unittest.TestCase):
+    def test_budget_stops_warmup_and_hits_are_counted(self):
+        loaded = []
+        planner = WarmupPlanner(tokenize=lambda c: c, route=lambda c, n: None, load=loaded.append,
+                                time_budget=0.0)
+        self.assertTrue(planner.run(["a", "b"])["budget_exhausted"])
+
+        planner = WarmupPlanner(tokenize=lambda c: c, route=lambda c, n: None, load=loaded.append)
+        stats = planner.run(["Mấy giờ rồi", "thời tiết"])
+        self.assertEqual(stats["warmed"], 2)
+        planner.note_request("mấy  giờ rồi")
+        planner.note_request("mở nhạc")
+        self.assertEqual(planner.stats()["hit_rate"], 0.5)
+
+    def test_assistant_warmup_routes_and_imports(self):
+        planner = WarmupPlanner(assistant.normalize_command,
+                                lambda c, n: assistant._resolve_feature(c, n),
+                                assistant._warm_feature_module)
+        stats = planner.run(["mấy giờ rồi", "tính 2 + 3"])
+        self.assertEqual((stats["warmed"], stats["errors"]), (2, 0))
+        self.assertGreaterEqual(stats["modules"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
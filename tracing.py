@@ -0,0 +1,199 @@
+"""Lightweight per-stage latency spans for the command pipeline.
+
+Each request gets an id (:func:`request_scope`); stages wrapped in
+:func:`span` record ``(name, request id, start, duration, thread, args)`` into
+a bounded ring buffer, so tracing costs one ``perf_counter_ns`` pair and a
+deque append per stage and never grows memory. The buffer can be dumped as a
+Chrome trace (open in ``chrome://tracing`` or Perfetto) or as JSONL, and
+:func:`summarize` reports per-stage percentiles to see which stage dominates
+tail latency.
+
+Set ``ASSISTANT_TRACE=0`` to disable recording.
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional
+
+
+class SpanRecord(NamedTuple):
+    name: str
+    request_id: Optional[str]
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    args: Optional[Dict[str, Any]]
+
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar("assistant_request_id", default=None)
+_request_counter = itertools.count(1)
+
+
+def new_request_id() -> str:
+    return f"r{next(_request_counter)}"
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class Tracer:
+    """Ring buffer of finished spans."""
+
+    def __init__(self, capacity: int = 10000, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._spans: Deque[SpanRecord] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._spans.maxlen or 0
+
+    def record(self, rec: SpanRecord) -> None:
+        # deque.append is atomic; the lock only guards snapshot/clear
+        self._spans.append(rec)
+
+    def spans(self) -> List[SpanRecord]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+_tracer = Tracer(enabled=os.environ.get("ASSISTANT_TRACE", "1") != "0")
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: Optional[Dict[str, Any]]) -> None:
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        _tracer.record(SpanRecord(self.name, _request_id.get(), self.start, end - self.start,
+                                  threading.get_ident(), self.args))
+
+    def set(self, **args: Any) -> None:
+        """Attach details known only after the stage ran (e.g. the chosen feature)."""
+        self.args = dict(self.args or {}, **args)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, **args: Any) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **args: Any):
+    """Time the enclosed block as stage ``name`` of the current request."""
+    if not _tracer.enabled:
+        return _NO_SPAN
+    return _Span(name, args or None)
+
+
+@contextmanager
+def request_scope(request_id: Optional[str] = None, name: str = "request") -> Iterator[str]:
+    """Give the enclosed work a request id and record an overall span for it."""
+    rid = request_id or new_request_id()
+    token = _request_id.set(rid)
+    try:
+        with span(name):
+            yield rid
+    finally:
+        _request_id.reset(token)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def summarize(spans: Optional[List[SpanRecord]] = None) -> Dict[str, Dict[str, float]]:
+    """Per-stage count and p50/p95/p99/max latency in milliseconds."""
+    by_stage: Dict[str, List[float]] = {}
+    for rec in spans if spans is not None else _tracer.spans():
+        by_stage.setdefault(rec.name, []).append(rec.duration_ns / 1e6)
+    out: Dict[str, Dict[str, float]] = {}
+    for name, values in by_stage.items():
+        values.sort()
+        out[name] = {
+            "count": len(values),
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1],
+        }
+    return out
+
+
+def _event(rec: SpanRecord) -> Dict[str, Any]:
+    args = dict(rec.args or {})
+    if rec.request_id:
+        args["request_id"] = rec.request_id
+    return {
+        "name": rec.name,
+        "cat": "assistant",
+        "ph": "X",
+        "ts": rec.start_ns / 1000.0,
+        "dur": rec.duration_ns / 1000.0,
+        "pid": os.getpid(),
+        "tid": rec.thread_id,
+        "args": args,
+    }
+
+
+def export_chrome_trace(path: str, spans: Optional[List[SpanRecord]] = None) -> int:
+    """Write spans in Chrome trace-event format; returns the number written."""
+    events = [_event(rec) for rec in (spans if spans is not None else _tracer.spans())]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(events)
+
+
+def export_jsonl(path: str, spans: Optional[List[SpanRecord]] = None) -> int:
+    """Write one JSON object per span; returns the number written."""
+    recs = spans if spans is not None else _tracer.spans()
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in recs:
+            f.write(json.dumps({
+                "name": rec.name,
+                "request_id": rec.request_id,
+                "start_us": rec.start_ns / 1000.0,
+                "duration_ms": rec.duration_ns / 1e6,
+                "thread": rec.thread_id,
+                "args": rec.args or {},
+            }, ensure_ascii=False) + "\n")
+    return len(recs)
@@ -0,0 +1,121 @@
+"""Dependency-free Vietnamese word segmentation for routing.
+
+Vietnamese words are runs of space-separated syllables ("thời tiết",
+"khởi động"). :class:`MaxMatchTokenizer` groups syllables by forward maximal
+matching against a dictionary of multi-syllable words, so a command tokenizes
+with a few dict lookups per syllable and no model load. The dictionary is
+compiled from the phrases the router already knows: feature keywords and
+patterns plus the ``tokens`` of the routing rules (see :func:`build_dictionary`).
+
+underthesea stays available as an optional backend: :func:`warm_underthesea`
+imports it on a background thread and :func:`underthesea_tokenize` returns
+None until it is ready, so no command ever waits for the import.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Pattern fragments that look like regexes are not dictionary words
+_REGEX_CHARS = re.compile(r"[\\^$\[\]()|*+?{}]")
+_PLACEHOLDER = re.compile(r"\.\.\.|…")
+
+
+def _syllables(text: str) -> List[str]:
+    return unicodedata.normalize("NFC", text).lower().split()
+
+
+class MaxMatchTokenizer:
+    """Forward maximal-matching segmenter over a multi-syllable word set."""
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        # first syllable -> candidate lengths, longest first
+        self._lengths: Dict[str, List[int]] = {}
+        self._words: Set[Tuple[str, ...]] = set()
+        for word in words:
+            syl = tuple(_syllables(word))
+            if len(syl) < 2 or syl in self._words:
+                continue
+            self._words.add(syl)
+            lengths = self._lengths.setdefault(syl[0], [])
+            if len(syl) not in lengths:
+                lengths.append(len(syl))
+                lengths.sort(reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def tokenize(self, text: str) -> List[str]:
+        syl = _syllables(text)
+        out: List[str] = []
+        i, n = 0, len(syl)
+        while i < n:
+            step = 1
+            for length in self._lengths.get(syl[i], ()):
+                if i + length <= n and tuple(syl[i:i + length]) in self._words:
+                    step = length
+                    break
+            out.append(" ".join(syl[i:i + step]) if step > 1 else syl[i])
+            i += step
+        return out
+
+
+def build_dictionary(keywords: Iterable[str] = (), patterns: Iterable[str] = ()) -> Set[str]:
+    """Multi-syllable words from feature keywords and ``"... x ..."`` style patterns."""
+    words: Set[str] = set()
+    for kw in keywords:
+        if isinstance(kw, str) and len(kw.split()) > 1:
+            words.add(" ".join(_syllables(kw)))
+    for pattern in patterns:
+        if not isinstance(pattern, str) or _REGEX_CHARS.search(pattern):
+            continue
+        for fragment in _PLACEHOLDER.split(pattern):
+            if len(fragment.split()) > 1:
+                words.add(" ".join(_syllables(fragment)))
+    return words
+
+
+# --- Optional underthesea backend ---
+
+_ut_tokenize: Optional[Callable[[str], List[str]]] = None
+_ut_state = "idle"  # idle | loading | ready | missing
+_ut_lock = threading.Lock()
+
+
+def _load_underthesea() -> None:
+    global _ut_tokenize, _ut_state
+    try:
+        from underthesea import word_tokenize
+        word_tokenize("khởi động")  # load the model now, not on the first command
+        _ut_tokenize = word_tokenize
+        _ut_state = "ready"
+    except Exception:
+        _ut_state = "missing"
+
+
+def warm_underthesea() -> Optional[threading.Thread]:
+    """Start importing underthesea in the background (no-op if already started)."""
+    global _ut_state
+    with _ut_lock:
+        if _ut_state != "idle":
+            return None
+        _ut_state = "loading"
+    thread = threading.Thread(target=_load_underthesea, daemon=True)
+    thread.start()
+    return thread
+
+
+def underthesea_state() -> str:
+    return _ut_state
+
+
+def underthesea_tokenize(text: str) -> Optional[List[str]]:
+    """Tokens from underthesea, or None while it is not (yet) available."""
+    tokenize = _ut_tokenize
+    if tokenize is None:
+        return None
+    try:
+        return tokenize(text)
+    except Exception:
+        return None
@@ -0,0 +1,188 @@
+"""Startup warmup planner driven by recorded usage.
+
+The planner reads the usage snapshot written by features/ai_enhancements.py
+(``assistant_data.json``) and ranks commands by decayed usage. The score is
+the stored ``usage_patterns`` weight, decayed again by how long ago
+``command_history`` last saw the command, with the same half-life as the
+AI data (14 days). It then warms the top N commands in order, within a
+wall-clock and CPU budget:
+
+- tokenize/normalize (interns the NormalizedCommand)
+- route (fills the routing cache)
+- import the routed feature module
+
+Requests are checked against the warmed set afterwards (case and spacing
+ignored), so the warm-cache hit rate can be reported once the assistant has
+been in use for a while.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from applog import get_logger
+from normalization import collapse
+
+log = get_logger("warmup")
+
+USAGE_SNAPSHOT = "assistant_data.json"
+HALF_LIFE_DAYS = 14.0
+# Used before any usage has been recorded (first run)
+DEFAULT_SEEDS = (
+    "mấy giờ rồi", "thời gian", "mở notepad", "mở ghi chú",
+    "thời tiết", "thông tin hệ thống", "tính toán",
+)
+
+
+def load_usage(path: Optional[str] = None) -> Dict[str, Any]:
+    """Usage snapshot as a dict ({} when missing or unreadable)."""
+    candidates = [path] if path else [
+        USAGE_SNAPSHOT, os.path.join(os.path.dirname(os.path.abspath(__file__)), USAGE_SNAPSHOT),
+    ]
+    for p in candidates:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except Exception:
+            continue
+    return {}
+
+
+def _last_seen(history: Iterable[Any]) -> Dict[str, datetime.datetime]:
+    seen: Dict[str, datetime.datetime] = {}
+    for item in history or ():
+        if not isinstance(item, dict):
+            continue
+        cmd = item.get("command")
+        try:
+            ts = datetime.datetime.fromisoformat(item.get("timestamp"))
+        except (TypeError, ValueError):
+            continue
+        if isinstance(cmd, str) and (cmd not in seen or ts > seen[cmd]):
+            seen[cmd] = ts
+    return seen
+
+
+def rank_commands(data: Dict[str, Any], limit: int = 20,
+                  now: Optional[datetime.datetime] = None,
+                  half_life_days: float = HALF_LIFE_DAYS) -> List[Tuple[str, float]]:
+    """Top ``limit`` commands by decayed usage, best first."""
+    now = now or datetime.datetime.now()
+    seen = _last_seen(data.get("command_history", ()))
+    scores: Dict[str, float] = {}
+    # Spellings of one command share a score; the most used one is warmed
+    # (the routing cache is keyed by the raw command)
+    raw: Dict[str, Tuple[float, str]] = {}
+    for cmd, weight in (data.get("usage_patterns") or {}).items():
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            continue
+        key = collapse(cmd) if isinstance(cmd, str) else ""
+        if not key or weight <= 0:
+            continue
+        last = seen.get(cmd)
+        if last is not None:
+            age_days = max(0.0, (now - last).total_seconds() / 86400.0)
+            weight *= 0.5 ** (age_days / max(0.1, half_life_days))
+        scores[key] = scores.get(key, 0.0) + weight
+        if key not in raw or weight > raw[key][0]:
+            raw[key] = (weight, cmd)
+    ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+    return [(raw[key][1], score) for key, score in ranked]
+
+
+class WarmupPlanner:
+    """Plan and run the startup warmup, then track how many requests it covered.
+
+    ``tokenize(command)`` returns the normalized form, ``route(command,
+    normalized)`` the routed feature (or None) and ``load(feature)`` imports
+    its module; the assistant supplies all three.
+    """
+
+    def __init__(self, tokenize: Callable[[str], Any], route: Callable[[str, Any], Any],
+                 load: Callable[[Any], Any], top_n: int = 20,
+                 time_budget: float = 2.0, cpu_budget: float = 1.0,
+                 usage_path: Optional[str] = None, report_after: int = 50):
+        self.tokenize = tokenize
+        self.route = route
+        self.load = load
+        self.top_n = top_n
+        self.time_budget = time_budget
+        self.cpu_budget = cpu_budget
+        self.usage_path = usage_path
+        self.report_after = report_after
+        self._warmed: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "planned": 0, "warmed": 0, "modules": 0, "errors": 0,
+            "elapsed_ms": 0.0, "cpu_ms": 0.0, "budget_exhausted": False, "done": False,
+            "hits": 0, "misses": 0,
+        }
+
+    def plan(self, data: Optional[Dict[str, Any]] = None) -> List[str]:
+        data = load_usage(self.usage_path) if data is None else data
+        ranked = [cmd for cmd, _ in rank_commands(data, self.top_n)]
+        return ranked or list(DEFAULT_SEEDS[:self.top_n])
+
+    def run(self, commands: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Warm ``commands`` (default: :meth:`plan`) until done or out of budget."""
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        commands = self.plan() if commands is None else commands
+        loaded: Set[int] = set()
+        warmed = errors = 0
+        exhausted = False
+        for cmd in commands:
+            if (time.perf_counter() - started > self.time_budget
+                    or time.thread_time() - cpu_started > self.cpu_budget):
+                exhausted = True
+                break
+            try:
+                normalized = self.tokenize(cmd)
+                feature = self.route(cmd, normalized)
+                if feature is not None and id(feature.handler) not in loaded:
+                    self.load(feature)
+                    loaded.add(id(feature.handler))
+            except Exception as e:
+                errors += 1
+                log.debug("Warmup of %r failed: %s", cmd, e)
+                continue
+            with self._lock:
+                self._warmed.add(collapse(cmd))
+            warmed += 1
+        with self._lock:
+            self._stats.update(
+                planned=len(commands), warmed=warmed, modules=len(loaded), errors=errors,
+                elapsed_ms=(time.perf_counter() - started) * 1000.0,
+                cpu_ms=(time.thread_time() - cpu_started) * 1000.0,
+                budget_exhausted=exhausted, done=True,
+            )
+            stats = dict(self._stats)
+        log.info("Warmup: %d/%d commands, %d modules in %.0f ms%s", warmed, len(commands),
+                 len(loaded), stats["elapsed_ms"], " (budget exhausted)" if exhausted else "")
+        return stats
+
+    def note_request(self, command: str) -> None:
+        """Count whether an incoming command was covered by the warmup."""
+        key = collapse(command or "")
+        with self._lock:
+            if not self._stats["done"]:
+                return
+            self._stats["hits" if key in self._warmed else "misses"] += 1
+            seen = self._stats["hits"] + self._stats["misses"]
+            report = seen == self.report_after
+            hits = self._stats["hits"]
+        if report:
+            log.info("Warm-cache hit rate after %d requests: %.0f%%", seen, 100.0 * hits / seen)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        seen = out["hits"] + out["misses"]
+        out["hit_rate"] = out["hits"] / seen if seen else 0.0
+        return out